@@ -0,0 +1,63 @@
+import json
+import logging
+import sys
+
+from benchmarks.suite import compare, default_baseline, default_recording, record, run_suite
+
+
+def get_parser(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="benchmarks", description="offline benchmarks against a local mock node")
+    parser.add_argument("--debug", action="store_true")
+    actions = parser.add_subparsers(help='action', dest='action')
+    run = actions.add_parser('run', help='run the suite and compare with the baseline')
+    run.add_argument('--latency', type=float, default=0.002, help='seconds injected on every mock node request')
+    run.add_argument('--recording', default=default_recording, help='recorded responses for replay benchmarks')
+    run.add_argument('--baseline', default=default_baseline, help='baseline results file')
+    run.add_argument('--tolerance', type=float, default=0.5, help='allowed relative regression')
+    run.add_argument('--update-baseline', action="store_true", help="store results as the new baseline")
+    run.add_argument('--output', help='also write results to this file')
+    rec = actions.add_parser('record', help='record responses for replay benchmarks from a live node')
+    rec.add_argument('chain', help='chain to record')
+    rec.add_argument('--start', '-s', type=int, required=True, help='first block')
+    rec.add_argument('--count', '-c', type=int, default=20, help='blocks to record')
+    rec.add_argument('--output', '-o', default=default_recording, help='recording file')
+    rec.add_argument('--no-candidate-pool', action="store_true", help="do not record the candidate pool")
+    args = parser.parse_args(argv)
+    # Run is the default action
+    return parser.parse_args(["run"]) if args.action is None else args
+
+
+def main() -> int:
+    args = get_parser()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    if args.action == 'record':
+        record(args.chain, args.start, args.count, args.output, candidate_pool=not args.no_candidate_pool)
+        return 0
+    results = run_suite(latency=args.latency, recording_path=args.recording)
+    for result in results:
+        print(result)
+    data = {x.name: x.to_dict() for x in results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline stored in {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create it")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+from typing import List
+
+from subclient.context import SubstrateBlockContext
+
+staking_address = "0x0000000000000000000000000000000000000800"
+native_address = "0x0000000000000000000000000000000000000802"
+candidate = "0xaA795bB2c69B1419c4e0b56706777e9a68bac42b"
+# Well known test key, only used to sign synthetic transactions
+signer_key = "0x" + "11" * 32
+
+
+class RawItem:
+    """
+    Stand-in for the scale objects returned by substrateinterface, events are also reachable as item['event']
+    """
+
+    def __init__(self, value: dict):
+        self.value = value
+
+    def __getitem__(self, item):
+        return self if item == "event" else self.value[item]
+
+
+def _hex(value: bytes) -> str:
+    return "0x" + bytes(value).hex()
+
+
+def get_transfer_block(number: int, size: int) -> SubstrateBlockContext:
+    """Block with size Balances.transfer extrinsics"""
+    extrinsics = [RawItem({'call': {'call_module': 'Timestamp', 'call_function': 'set', 'call_args': [
+        {'name': 'now', 'type': 'Compact<Moment>', 'value': 1650000000000 + number}
+    ]}})]
+    for index in range(size):
+        extrinsics.append(RawItem({'address': f"0x{index:040x}", 'call': {
+            'call_module': 'Balances', 'call_function': 'transfer', 'call_args': [
+                {'name': 'dest', 'type': 'LookupSource', 'value': f"0x{index + 1:040x}"},
+                {'name': 'value', 'type': 'Balance', 'value': (index + 1) * 10 ** 18},
+            ]
+        }}))
+    events = [
+        RawItem({'extrinsic_idx': index, 'module_id': 'System', 'event_id': 'ExtrinsicSuccess', 'attributes': []})
+        for index in range(len(extrinsics))
+    ]
+    return SubstrateBlockContext(number=number, hash=_hex(number.to_bytes(32, "big")), extrinsics=extrinsics,
+                                 events_loader=lambda: events)
+
+
+def get_evm_block(number: int, size: int) -> SubstrateBlockContext:
+    """Block with size signed Ethereum.transact calls to the staking precompile"""
+    import rlp
+    from eth_abi import encode_abi
+    from eth_account import Account
+    from eth_utils import function_signature_to_4byte_selector
+    account = Account.from_key(signer_key)
+    data = function_signature_to_4byte_selector("delegator_bond_more(address,uint256)") + \
+        encode_abi(["address", "uint256"], [candidate, 21 * 10 ** 18])
+    extrinsics = []
+    events = []
+    for index in range(size):
+        signed = account.sign_transaction({
+            "nonce": number * size + index, "gasPrice": 1000000000, "gas": 50000, "to": staking_address, "value": 0,
+            "data": data, "chainId": 1284,
+        })
+        nonce, gas_price, gas, to, value, payload, v, r, s = rlp.decode(signed.rawTransaction)
+        extrinsics.append(RawItem({'call': {'call_module': 'Ethereum', 'call_function': 'transact', 'call_args': [
+            {'name': 'transaction', 'type': 'TransactionV2', 'value': {'Legacy': {
+                "nonce": number * size + index, "gas_price": 1000000000, "gas_limit": 50000,
+                "action": {"Call": _hex(to)}, "value": 0, "input": _hex(payload),
+                "signature": {"v": int.from_bytes(v, "big"), "r": _hex(r), "s": _hex(s)}
+            }}}
+        ]}}))
+        events.append(RawItem({'extrinsic_idx': index, 'module_id': 'Ethereum', 'event_id': 'Executed',
+                               'attributes': [account.address, staking_address, _hex(signed.hash),
+                                              {'Succeed': 'Returned'}]}))
+    return SubstrateBlockContext(number=number, hash=_hex(number.to_bytes(32, "big")), extrinsics=extrinsics,
+                                 events_loader=lambda: events)
+
+
+def get_rewards_block(number: int, size: int) -> SubstrateBlockContext:
+    """Round start block paying size staking rewards on initialize"""
+    extrinsics = [RawItem({'call': {'call_module': 'ParachainSystem', 'call_function': 'set_validation_data',
+                                    'call_args': []}})]
+    events = [
+        RawItem({'extrinsic_idx': None, 'module_id': 'ParachainStaking', 'event_id': 'Rewarded',
+                 'attributes': [f"0x{index:040x}", (index + 1) * 10 ** 16]})
+        for index in range(size)
+    ]
+    return SubstrateBlockContext(number=number, hash=_hex(number.to_bytes(32, "big")), extrinsics=extrinsics,
+                                 events_loader=lambda: events)
+
+
+def get_transfer_logs(start_block: int, end_block: int, per_block: int) -> List[dict]:
+    """eth_getLogs result with per_block native token transfers for every block of the range"""
+    from eth_abi import encode_abi
+    from subclient.decoders.evm_abi import get_selector_table
+    topic = get_selector_table().get_event_topics(["IERC20.Transfer"])[0]
+    address_topic = "0x" + "00" * 12 + candidate[2:].lower()
+    data = _hex(encode_abi(["uint256"], [7 * 10 ** 18]))
+    return [{
+        'blockNumber': hex(block), 'logIndex': hex(index), 'transactionIndex': hex(index),
+        'transactionHash': _hex(block.to_bytes(16, "big") + index.to_bytes(16, "big")), 'address': native_address,
+        'topics': [topic, address_topic, address_topic], 'data': data, 'removed': False
+    } for block in range(start_block, end_block + 1) for index in range(per_block)]
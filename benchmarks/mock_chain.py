@@ -0,0 +1,221 @@
+from hashlib import blake2b
+from typing import List
+
+from benchmarks.mock_node import MockRecording
+
+spec_version = 1300
+token_decimals = 18
+transfer_amount = 21 * 10 ** 18
+
+
+def _compact(value: int) -> bytes:
+    if value < 1 << 6:
+        return bytes([value << 2])
+    if value < 1 << 14:
+        return ((value << 2) | 1).to_bytes(2, "little")
+    if value < 1 << 30:
+        return ((value << 2) | 2).to_bytes(4, "little")
+    data = value.to_bytes((value.bit_length() + 7) // 8, "little")
+    return bytes([((len(data) - 4) << 2) | 3]) + data
+
+
+def _hex(value: bytes) -> str:
+    return "0x" + value.hex()
+
+
+def _storage_prefix(pallet: str, storage: str) -> str:
+    from substrateinterface.utils.hasher import xxh128
+    return "0x" + xxh128(pallet.encode()) + xxh128(storage.encode())
+
+
+def _account(index: int) -> bytes:
+    return blake2b(index.to_bytes(4, "big"), digest_size=20, person=b"account").digest()
+
+
+def _block_hash(number: int) -> str:
+    return _hex(blake2b(number.to_bytes(4, "big"), digest_size=32, person=b"block").digest())
+
+
+def _metadata() -> str:
+    """
+    Minimal V14 runtime metadata: System events, Balances transfers and the ParachainStaking candidate storage
+    """
+    from scalecodec.base import RuntimeConfigurationObject
+    from scalecodec.type_registry import load_type_registry_preset
+
+    def get_type(type_id: int, path: List[str], definition: dict) -> dict:
+        return {'id': type_id, 'type': {'path': path, 'params': [], 'def': definition, 'docs': []}}
+
+    def get_field(type_id: int, name: str = None, type_name: str = None) -> dict:
+        return {'name': name, 'type': type_id, 'typeName': type_name, 'docs': []}
+
+    def get_variant(name: str, index: int, fields: List[dict]) -> dict:
+        return {'name': name, 'fields': fields, 'index': index, 'docs': []}
+
+    def get_storage(name: str, value: int, key: int = None) -> dict:
+        storage_type = {'Plain': value} if key is None else \
+            {'Map': {'hashers': ['Twox64Concat'], 'key': key, 'value': value}}
+        return {'name': name, 'modifier': 'Optional', 'type': storage_type, 'default': '0x00', 'documentation': []}
+
+    types = [
+        get_type(0, [], {'primitive': 'u8'}),
+        get_type(1, [], {'array': {'len': 20, 'type': 0}}),
+        get_type(2, ['account', 'AccountId20'], {'composite': {'fields': [get_field(1, type_name='[u8; 20]')]}}),
+        get_type(3, [], {'primitive': 'u128'}),
+        get_type(4, [], {'compact': {'type': 3}}),
+        get_type(5, [], {'primitive': 'u32'}),
+        get_type(6, ['pallet_balances', 'pallet', 'Call'], {'variant': {'variants': [
+            get_variant('transfer', 0, [get_field(2, 'dest', 'T::AccountId'), get_field(4, 'value', 'T::Balance')])
+        ]}}),
+        get_type(7, ['pallet_balances', 'pallet', 'Event'], {'variant': {'variants': [
+            get_variant('Transfer', 2, [get_field(2, 'from', 'T::AccountId'), get_field(2, 'to', 'T::AccountId'),
+                                        get_field(3, 'amount', 'T::Balance')])
+        ]}}),
+        get_type(8, ['frame_system', 'pallet', 'Event'], {'variant': {'variants': [
+            get_variant('ExtrinsicSuccess', 0, []), get_variant('ExtrinsicFailed', 1, [])
+        ]}}),
+        get_type(9, ['moonbeam_runtime', 'Event'], {'variant': {'variants': [
+            get_variant('System', 0, [get_field(8)]), get_variant('Balances', 10, [get_field(7)])
+        ]}}),
+        get_type(10, ['frame_system', 'Phase'], {'variant': {'variants': [
+            get_variant('ApplyExtrinsic', 0, [get_field(5)]), get_variant('Finalization', 1, []),
+            get_variant('Initialization', 2, [])
+        ]}}),
+        get_type(11, [], {'array': {'len': 32, 'type': 0}}),
+        get_type(12, ['primitive_types', 'H256'], {'composite': {'fields': [get_field(11, type_name='[u8; 32]')]}}),
+        get_type(13, [], {'sequence': {'type': 12}}),
+        get_type(14, ['frame_system', 'EventRecord'], {'composite': {'fields': [
+            get_field(10, 'phase', 'Phase'), get_field(9, 'event', 'E'), get_field(13, 'topics', 'Vec<T>')
+        ]}}),
+        get_type(15, [], {'sequence': {'type': 14}}),
+        get_type(16, ['moonbeam_runtime', 'Call'], {'variant': {'variants': [get_variant('Balances', 10, [
+            get_field(6)
+        ])]}}),
+        get_type(17, ['pallet_parachain_staking', 'types', 'CollatorStatus'], {'variant': {'variants': [
+            get_variant('Active', 0, []), get_variant('Idle', 1, []), get_variant('Leaving', 2, [get_field(5)])
+        ]}}),
+        get_type(18, ['pallet_parachain_staking', 'types', 'CandidateMetadata'], {'composite': {'fields': [
+            get_field(3, 'bond', 'Balance'), get_field(5, 'delegation_count', 'u32'),
+            get_field(3, 'total_counted', 'Balance'), get_field(17, 'status', 'CollatorStatus')
+        ]}}),
+        get_type(19, ['pallet_parachain_staking', 'set', 'Bond'], {'composite': {'fields': [
+            get_field(2, 'owner', 'AccountId'), get_field(3, 'amount', 'Balance')
+        ]}}),
+        get_type(20, [], {'sequence': {'type': 19}}),
+        get_type(21, [], {'sequence': {'type': 2}}),
+    ]
+    pallets = [
+        {'name': 'System', 'storage': {'prefix': 'System', 'entries': [get_storage('Events', 15)]},
+         'calls': None, 'event': {'ty': 8}, 'constants': [], 'error': None, 'index': 0},
+        {'name': 'Balances', 'storage': None, 'calls': {'ty': 6}, 'event': {'ty': 7}, 'constants': [],
+         'error': None, 'index': 10},
+        {'name': 'ParachainStaking', 'storage': {'prefix': 'ParachainStaking', 'entries': [
+            get_storage('SelectedCandidates', 21), get_storage('CandidatePool', 20),
+            get_storage('CandidateInfo', 18, key=2)
+        ]}, 'calls': None, 'event': None, 'constants': [], 'error': None, 'index': 20},
+    ]
+    runtime_config = RuntimeConfigurationObject()
+    runtime_config.update_type_registry(load_type_registry_preset("metadata_types"))
+    metadata = runtime_config.create_scale_object("MetadataVersioned")
+    return str(metadata.encode(("0x6d657461", {'V14': {
+        'types': {'types': types},
+        'pallets': pallets,
+        'extrinsic': {'ty': 16, 'version': 4, 'signed_extensions': []},
+        'runtime_type': 16,
+    }})))
+
+
+def _transfer(sender: bytes, dest: bytes, nonce: int) -> str:
+    # Signed V4 extrinsic without signed extensions: signer, signature, immortal era, nonce, tip, Balances.transfer
+    data = b"\x84" + sender + bytes(65) + b"\x00" + _compact(nonce) + _compact(0) + \
+        b"\x0a\x00" + dest + _compact(transfer_amount)
+    return _hex(_compact(len(data)) + data)
+
+
+def _events(transfers: List[tuple]) -> str:
+    data = _compact(len(transfers) * 2)
+    for index, (sender, dest) in enumerate(transfers):
+        phase = b"\x00" + index.to_bytes(4, "little")
+        data += phase + b"\x0a\x02" + sender + dest + transfer_amount.to_bytes(16, "little") + b"\x00"
+        data += phase + b"\x00\x00" + b"\x00"
+    return _hex(data)
+
+
+def get_candidate_total(index: int) -> int:
+    """Total counted of the candidate at index, decreasing with the index"""
+    return (100000 - index * 37) * 10 ** token_decimals
+
+
+def get_mock_recording(start_block: int = 1000, count: int = 20, block_size: int = 20,
+                       candidates: int = 60, selected: int = 40) -> MockRecording:
+    """
+    Synthetic Moonbeam chain with real SCALE metadata, blocks of Balances.transfer extrinsics with their events and
+    the ParachainStaking candidate storage, for the replay benchmarks and tests when no recording is available
+    :param int start_block: first block
+    :param int count: number of blocks, the last one is the chain head
+    :param int block_size: transfers of every block
+    :param int candidates: candidates in CandidateInfo, every fifth one is idle and not in CandidatePool
+    :param int selected: SelectedCandidates, the first candidates by total
+    """
+    recording = MockRecording(meta={
+        'chain': "moonbeam",
+        'start_block': start_block,
+        'count': count,
+        'candidate_pool': candidates > 0
+    })
+    recording.add("system_chain", [], "Moonbeam")
+    recording.add("system_properties", [], {'ss58Format': 1284, 'tokenDecimals': token_decimals,
+                                            'tokenSymbol': "GLMR"})
+    head = start_block + count - 1
+    recording.add("chain_getHead", [], _block_hash(head))
+    recording.add("chain_getFinalisedHead", [], _block_hash(head))
+    recording.add("chain_getFinalizedHead", [], _block_hash(head))
+    metadata = _metadata()
+    events_key = _storage_prefix("System", "Events")
+    for number in range(start_block - 1, head + 1):
+        block_hash = _block_hash(number)
+        header = {'parentHash': _block_hash(number - 1), 'number': hex(number), 'stateRoot': "0x" + "00" * 32,
+                  'extrinsicsRoot': "0x" + "00" * 32, 'digest': {'logs': []}}
+        transfers = [(_account(number * block_size + x), _account(number * block_size + x + 1))
+                     for x in range(block_size)]
+        recording.add("chain_getBlockHash", [number], block_hash)
+        recording.add("chain_getHeader", [block_hash], header)
+        recording.add("chain_getRuntimeVersion", [block_hash], {
+            'specName': "moonbeam", 'implName': "moonbeam", 'authoringVersion': 3, 'specVersion': spec_version,
+            'implVersion': 0, 'apis': [], 'transactionVersion': 2, 'stateVersion': 0
+        })
+        recording.add("state_getMetadata", [block_hash], metadata)
+        recording.add("chain_getBlock", [block_hash], {'block': {
+            'header': header,
+            'extrinsics': [_transfer(sender, dest, number) for sender, dest in transfers]
+        }, 'justifications': None})
+        recording.add("state_getStorageAt", [events_key, block_hash], _events(transfers))
+    if candidates:
+        _add_candidates(recording, _block_hash(head), candidates, selected)
+    return recording
+
+
+def _add_candidates(recording: MockRecording, block_hash: str, candidates: int, selected: int):
+    from substrateinterface.utils.hasher import two_x64_concat
+    info_prefix = _storage_prefix("ParachainStaking", "CandidateInfo")
+    accounts = [_account(10 ** 6 + x) for x in range(candidates)]
+    keys = [info_prefix + two_x64_concat(x) for x in accounts]
+    values = []
+    pool = _compact(len([x for x in range(candidates) if x % 5 != 4]))
+    for index, account in enumerate(accounts):
+        total = get_candidate_total(index)
+        status = b"\x01" if index % 5 == 4 else b"\x00"
+        values.append(_hex(total.to_bytes(16, "little") + (3).to_bytes(4, "little") + total.to_bytes(16, "little") +
+                           status))
+        if index % 5 != 4:
+            pool += account + total.to_bytes(16, "little")
+    recording.add("state_getKeysPaged", [info_prefix, 100, info_prefix, block_hash], keys)
+    recording.add("state_queryStorageAt", [keys, block_hash], [{
+        'block': block_hash, 'changes': [list(x) for x in zip(keys, values)]
+    }])
+    for key, value in zip(keys, values):
+        recording.add("state_getStorageAt", [key, block_hash], value)
+    recording.add("state_getStorageAt", [_storage_prefix("ParachainStaking", "CandidatePool"), block_hash],
+                  _hex(pool))
+    recording.add("state_getStorageAt", [_storage_prefix("ParachainStaking", "SelectedCandidates"), block_hash],
+                  _hex(_compact(selected) + b"".join(accounts[:selected])))
@@ -0,0 +1,321 @@
+import json
+import socketserver
+from contextlib import contextmanager
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from subclient.utils import get_logger
+
+logger = get_logger("mocknode")
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class MockRecording:
+    """
+    JSON-RPC results keyed by method and params, recorded from a live node and replayed by MockSubstrateNode
+    """
+    meta: Dict[str, Any]
+    _responses: Dict[str, Any]
+
+    def __init__(self, meta: Dict[str, Any] = None) -> None:
+        super().__init__()
+        self.meta = meta if meta else {}
+        self._responses = {}
+
+    def __len__(self):
+        return len(self._responses)
+
+    @staticmethod
+    def _key(method: str, params) -> str:
+        return json.dumps([method, params if params else []], sort_keys=True, separators=(",", ":"))
+
+    def add(self, method: str, params, result: Any):
+        self._responses[self._key(method, params)] = result
+
+    def get(self, method: str, params) -> Tuple[bool, Any]:
+        key = self._key(method, params)
+        return key in self._responses, self._responses.get(key)
+
+    def record(self, api):
+        """
+        Wraps a SubstrateInterface rpc_request so every plain request result is added to the recording
+        """
+        rpc_request = api.rpc_request
+
+        def _rpc_request(method, params, result_handler=None):
+            response = rpc_request(method, params, result_handler=result_handler)
+            if result_handler is None and isinstance(response, dict) and 'result' in response:
+                self.add(method, params, response['result'])
+            return response
+
+        api.rpc_request = _rpc_request
+        return api
+
+    @staticmethod
+    def load(path: str) -> "MockRecording":
+        """
+        Reads a gzipped JSON lines recording, first line holds the recording meta
+        """
+        import gzip
+        recording = MockRecording()
+        with gzip.open(path, "rt") as f:
+            for index, line in enumerate(f):
+                item = json.loads(line)
+                if index == 0 and 'meta' in item:
+                    recording.meta = item['meta']
+                    continue
+                recording.add(item['method'], item['params'], item['result'])
+        return recording
+
+    def save(self, path: str):
+        import gzip
+        with gzip.open(path, "wt") as f:
+            f.write(json.dumps({'meta': self.meta}) + "\n")
+            for key, result in self._responses.items():
+                method, params = json.loads(key)
+                f.write(json.dumps({'method': method, 'params': params, 'result': result}) + "\n")
+
+
+def _ws_accept_key(key: str) -> str:
+    from base64 import b64encode
+    from hashlib import sha1
+    return b64encode(sha1((key + _WS_GUID).encode()).digest()).decode()
+
+
+def _ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    import struct
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 2 ** 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class _WebsocketHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal RFC 6455 server side, enough for JSON-RPC text messages from websocket-client
+    """
+    node: "MockSubstrateNode"
+
+    def _read_exactly(self, size: int) -> bytes:
+        data = self.rfile.read(size)
+        if len(data) < size:
+            raise ConnectionError("Connection closed")
+        return data
+
+    def _read_message(self) -> Optional[Tuple[int, bytes]]:
+        import struct
+        payload = b""
+        message_opcode = None
+        while True:
+            first, second = self._read_exactly(2)
+            opcode = first & 0x0f
+            length = second & 0x7f
+            if length == 126:
+                length = struct.unpack("!H", self._read_exactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._read_exactly(8))[0]
+            mask = self._read_exactly(4) if second & 0x80 else None
+            data = self._read_exactly(length)
+            if mask:
+                data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+            # Control frames can come between fragments
+            if opcode >= 0x8:
+                return opcode, data
+            if message_opcode is None:
+                message_opcode = opcode
+            payload += data
+            if first & 0x80:
+                return message_opcode, payload
+
+    def send(self, payload: bytes, opcode: int = 0x1):
+        with self._send_lock:
+            self.wfile.write(_ws_frame(payload, opcode))
+            self.wfile.flush()
+
+    def _handshake(self) -> bool:
+        headers = {}
+        self.rfile.readline()
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                break
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        if "sec-websocket-key" not in headers:
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return False
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {_ws_accept_key(headers['sec-websocket-key'])}\r\n\r\n"
+        ).encode())
+        self.wfile.flush()
+        return True
+
+    def _reply(self, request: dict):
+        from time import sleep
+        with self.node.serving():
+            if self.node.latency:
+                sleep(self.node.latency)
+            response = self.node.respond(request)
+        # noinspection PyBroadException
+        try:
+            self.send(json.dumps(response).encode())
+        except Exception:
+            pass
+
+    def handle(self):
+        self._send_lock = Lock()
+        if not self._handshake():
+            return
+        try:
+            while True:
+                opcode, data = self._read_message()
+                if opcode == 0x8:
+                    self.send(data[:2], opcode=0x8)
+                    return
+                elif opcode == 0x9:
+                    self.send(data, opcode=0xa)
+                elif opcode in (0x1, 0x2):
+                    # Answered concurrently, like a node would with pipelined requests
+                    Thread(target=self._reply, args=(json.loads(data),), daemon=True).start()
+        except (ConnectionError, OSError, ValueError):
+            pass
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MockSubstrateNode:
+    """
+    Local JSON-RPC stand-in for a node, answers over websocket (substrate) and HTTP (eth RPC) from a recording or
+    from handlers, every request is delayed by latency seconds. Websocket requests are answered concurrently so
+    pipelined clients see the latency once per batch, not once per request
+    """
+    request_count: int = 0
+    # Requests received and not answered yet, the most seen at once
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    def __init__(self,
+                 recording: MockRecording = None,
+                 latency: float = 0.0,
+                 handlers: Dict[str, Callable[[list], Any]] = None) -> None:
+        """
+        :param MockRecording recording: recorded results to replay
+        :param float latency: seconds added to every request
+        :param handlers: results computed from params by method, checked before the recording
+        """
+        super().__init__()
+        self.recording = recording if recording else MockRecording()
+        self.latency = latency
+        self.handlers = handlers if handlers else {}
+        self._lock = Lock()
+        self._ws_server = None
+        self._http_server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://127.0.0.1:{self._ws_server.server_address[1]}"
+
+    @property
+    def http_url(self) -> str:
+        return f"http://127.0.0.1:{self._http_server.server_address[1]}"
+
+    @contextmanager
+    def serving(self):
+        """
+        Counts a request in flight while answering it
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def respond(self, request: dict) -> dict:
+        with self._lock:
+            self.request_count += 1
+        method, params = request.get('method'), request.get('params')
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        # noinspection PyBroadException
+        try:
+            if method in self.handlers:
+                response['result'] = self.handlers[method](params)
+                return response
+            found, result = self.recording.get(method, params)
+        except Exception as e:
+            response['error'] = {'code': -32603, 'message': str(e)}
+            return response
+        if found:
+            response['result'] = result
+        else:
+            logger.debug(f"No recorded result for {method} {params}")
+            response['error'] = {'code': -32601, 'message': f"Method {method} not recorded"}
+        return response
+
+    def _http_handler(self):
+        import http.server
+        from time import sleep
+        node = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0"
+
+            def log_message(self, *args):
+                pass
+
+            # noinspection PyPep8Naming
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with node.serving():
+                    if node.latency:
+                        sleep(node.latency)
+                    if isinstance(request, list):
+                        response = [node.respond(x) for x in request]
+                    else:
+                        response = node.respond(request)
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return RequestHandler
+
+    def start(self) -> "MockSubstrateNode":
+        import http.server
+        self._ws_server = _ThreadingServer(("127.0.0.1", 0), type("WebsocketHandler", (_WebsocketHandler,), {
+            'node': self
+        }))
+        self._http_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._http_handler())
+        for server, name in ((self._ws_server, "ws"), (self._http_server, "http")):
+            Thread(target=server.serve_forever, name=f"mock-node-{name}", daemon=True).start()
+        logger.debug(f"Mock node serving {len(self.recording)} responses on {self.ws_url} and {self.http_url}")
+        return self
+
+    def stop(self):
+        for server in (self._ws_server, self._http_server):
+            if server:
+                server.shutdown()
+                server.server_close()
+        self._ws_server = None
+        self._http_server = None
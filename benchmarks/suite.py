@@ -0,0 +1,220 @@
+import os
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import fixtures
+from benchmarks.mock_node import MockRecording, MockSubstrateNode
+from subclient.utils import get_logger
+
+logger = get_logger("benchmarks")
+
+default_recording = os.path.join(os.path.dirname(__file__), "recordings", "moonbeam.jsonl.gz")
+default_baseline = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class BenchmarkResult:
+    """
+    Single benchmark measure, compared against the baseline in the direction given by higher_is_better
+    """
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool
+
+    def __init__(self, name: str, value: float, unit: str, higher_is_better: bool = True):
+        self.name = name
+        self.value = value
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+
+    def __str__(self):
+        return f"{self.name}: {self.value:.2f}{self.unit}"
+
+    def to_dict(self) -> dict:
+        return {'value': round(self.value, 2), 'unit': self.unit, 'higher_is_better': self.higher_is_better}
+
+    def regression(self, baseline: dict, tolerance: float) -> Optional[float]:
+        """
+        Relative regression against a baseline entry, None if within tolerance
+        """
+        base = baseline.get('value')
+        if not base:
+            return None
+        change = (base - self.value) / base if self.higher_is_better else (self.value - base) / base
+        return change if change > tolerance else None
+
+
+def _best_of(func: Callable[[], object], repeat: int = 3) -> float:
+    # Best run is the least noisy estimate of the actual cost
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_rpc_roundtrip(latency: float, requests: int = 200) -> List[BenchmarkResult]:
+    from substrateinterface import SubstrateInterface
+    recording = MockRecording()
+    recording.add("system_chain", [], "Moonbeam")
+    recording.add("system_health", [], {"peers": 10, "isSyncing": False, "shouldHavePeers": True})
+    with MockSubstrateNode(recording, latency=latency) as node:
+        api = SubstrateInterface(url=node.ws_url)
+        try:
+            elapsed = _best_of(lambda: [api.rpc_request("system_health", []) for _ in range(requests)])
+        finally:
+            api.close()
+    return [BenchmarkResult("rpc_roundtrip", requests / elapsed, " req/s")]
+
+
+def bench_decoders(blocks: int = 20, block_size: int = 50) -> List[BenchmarkResult]:
+    from subclient.decoders import SubstrateExtrinsicDecoder, SubstrateMoonbeamEVMExtrinsicDecoder, \
+        SubstrateMoonbeamValidationExtrinsicDecoder
+    cases = (
+        ("decode_transfer", SubstrateExtrinsicDecoder(), fixtures.get_transfer_block, 1),
+        ("decode_evm", SubstrateMoonbeamEVMExtrinsicDecoder(), fixtures.get_evm_block, 0),
+        ("decode_rewards", SubstrateMoonbeamValidationExtrinsicDecoder(), fixtures.get_rewards_block, 0),
+    )
+    result = []
+    for name, decoder, get_block, first_index in cases:
+        contexts = [get_block(number, block_size) for number in range(1, blocks + 1)]
+
+        def run():
+            decoded = 0
+            for context in contexts:
+                for index in range(first_index, len(context.extrinsics)):
+                    decoded += len(decoder.decode(context=context, index=index))
+            return decoded
+
+        count = run()
+        result.append(BenchmarkResult(name, count / _best_of(run), " ex/s"))
+    return result
+
+
+def bench_evm_log_scan(latency: float, blocks: int = 2000, per_block: int = 2) -> List[BenchmarkResult]:
+    from subclient.decoders import SubstrateMoonbeamEVMLogScanner
+
+    def get_logs(params):
+        query = params[0]
+        return fixtures.get_transfer_logs(int(query['fromBlock'], 16), int(query['toBlock'], 16), per_block)
+
+    with MockSubstrateNode(latency=latency, handlers={"eth_getLogs": get_logs}) as node:
+        def run():
+            scanner = SubstrateMoonbeamEVMLogScanner(node.http_url, chunk_size=250)
+            return sum(1 for _ in scanner.scan(1, blocks, events=["Transfer"]))
+
+        count = run()
+        elapsed = _best_of(run)
+    return [BenchmarkResult("evm_log_scan", count / elapsed, " logs/s")]
+
+
+def bench_cache(cache_path: str, calls: int = 500) -> List[BenchmarkResult]:
+    from subclient.cache import CacheWrapper, cache_call
+
+    class CachedClient:
+
+        def __init__(self):
+            self._cache = CacheWrapper(cache_path)
+
+        @cache_call(expire=3600)
+        def get_value(self, key: int) -> dict:
+            return {'key': key, 'values': list(range(20))}
+
+    client = CachedClient()
+    rounds = iter(range(10))
+
+    def miss():
+        # Fresh keys on every round so each call is a lookup miss and a write
+        offset = next(rounds) * calls
+        return [client.get_value(x) for x in range(offset, offset + calls)]
+
+    miss_elapsed = _best_of(miss)
+    hit_elapsed = _best_of(lambda: [client.get_value(x) for x in range(calls)])
+    return [
+        BenchmarkResult("cache_hit", hit_elapsed / calls * 1e6, " us/call", higher_is_better=False),
+        BenchmarkResult("cache_miss", miss_elapsed / calls * 1e6, " us/call", higher_is_better=False),
+    ]
+
+
+def bench_replay(recording_path: str, latency: float, cache_path: str) -> List[BenchmarkResult]:
+    """
+    get_extrinsics and get_candidate_pool against recorded Moonbeam responses, against the synthetic chain of
+    mock_chain when there is no recording
+    """
+    from benchmarks.mock_chain import get_mock_recording
+    from subclient import get_endpoint
+    from subclient.endpoint import SubstrateEndpoint
+    if os.path.exists(recording_path):
+        recording = MockRecording.load(recording_path)
+    else:
+        logger.info(f"No recording at {recording_path}, replaying the synthetic chain")
+        recording = get_mock_recording()
+    meta = recording.meta
+    registered = get_endpoint(meta['chain'])
+    result = []
+    with MockSubstrateNode(recording, latency=latency) as node:
+        endpoint = SubstrateEndpoint(chain_id=meta['chain'], wss_endpoints=[node.ws_url],
+                                     client_type=registered.client_type, options=registered.options)
+        client = endpoint.get_client(cache_path=cache_path)
+        try:
+            start_block, end_block = meta['start_block'], meta['start_block'] + meta['count'] - 1
+            blocks = end_block - start_block + 1
+            elapsed = _best_of(lambda: client.get_extrinsics(start_block=start_block, end_block=end_block), repeat=2)
+            result.append(BenchmarkResult("replay_get_extrinsics", blocks / elapsed, " blocks/s"))
+            if meta.get('candidate_pool'):
+                elapsed = _best_of(lambda: client.get_candidate_pool(skip_cache=True), repeat=2)
+                result.append(BenchmarkResult("replay_candidate_pool", elapsed * 1000, " ms", higher_is_better=False))
+        finally:
+            client.close()
+    return result
+
+
+def run_suite(latency: float, recording_path: str = default_recording) -> List[BenchmarkResult]:
+    import tempfile
+    with tempfile.TemporaryDirectory() as cache_path:
+        result = []
+        result += bench_rpc_roundtrip(latency)
+        result += bench_decoders()
+        result += bench_evm_log_scan(latency)
+        result += bench_cache(os.path.join(cache_path, "cache"))
+        result += bench_replay(recording_path, latency, os.path.join(cache_path, "replay"))
+    return result
+
+
+def record(chain_id: str, start_block: int, count: int, path: str, candidate_pool: bool = True):
+    """
+    Runs the replayed calls against a live node and saves every response
+    """
+    from subclient import get_client
+    client = get_client(chain_id=chain_id, cache_path=None)
+    recording = MockRecording(meta={
+        'chain': chain_id,
+        'start_block': start_block,
+        'count': count,
+        'candidate_pool': candidate_pool
+    })
+    recording.record(client._api)
+    client.get_extrinsics(start_block=start_block, end_block=start_block + count - 1)
+    if candidate_pool:
+        client.get_candidate_pool(skip_cache=True)
+    client.close()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    recording.save(path)
+    logger.info(f"Recorded {len(recording)} responses to {path}")
+
+
+def compare(results: List[BenchmarkResult], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Regressions against the baseline as readable lines, empty if none
+    """
+    regressions = []
+    for result in results:
+        if result.name not in baseline:
+            continue
+        change = result.regression(baseline[result.name], tolerance)
+        if change is not None:
+            regressions.append(f"{result.name} regressed {change:.0%}: {result.value:.2f}{result.unit} "
+                               f"baseline {baseline[result.name]['value']:.2f}{result.unit}")
+    return regressions
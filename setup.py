@@ -17,7 +17,13 @@ setup(
     license='MIT',
     long_description=__long_description__,
     long_description_content_type="text/markdown",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    package_data={
+        "subclient.decoders": ["abis/*.json"],
+    },
+    extras_require={
+        "export": ["pyarrow>=7.0.0", "numpy>=1.21.0"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -1,44 +1,65 @@
-from subclient.core import SubstrateClient, SubstrateEndpoint, T
-from subclient.moonbeam import MoonbeamClient
-from typing import List, Type
+from subclient.endpoint import SubstrateEndpoint, T
+from typing import List, Type, TYPE_CHECKING
 import logging
 
+# Clients pull in substrateinterface and friends, they are only imported when a client is created
+if TYPE_CHECKING:
+    from subclient.core import SubstrateClient
+    from subclient.moonbeam import MoonbeamClient
+    from subclient.aio import AsyncSubstrateClient, AsyncMoonbeamClient, get_async_client
+
+_lazy_exports = {
+    "SubstrateClient": "subclient.core",
+    "MoonbeamClient": "subclient.moonbeam",
+    "AsyncSubstrateClient": "subclient.aio",
+    "AsyncMoonbeamClient": "subclient.aio",
+    "get_async_client": "subclient.aio",
+}
+
+
+def __getattr__(name: str):
+    if name in _lazy_exports:
+        from importlib import import_module
+        return getattr(import_module(_lazy_exports[name]), name)
+    raise AttributeError(f"module {__name__} has no attribute {name}")
+
+
 # WSS Endpoints
 endpoints = [
-    SubstrateEndpoint[MoonbeamClient](
+    SubstrateEndpoint["MoonbeamClient"](
         chain_id="moonbase",
         wss_endpoints=[
             "wss.api.moonbase.moonbeam.network",
             "moonbeam-alpha.api.onfinality.io/public-ws"
         ],
-        client_type=MoonbeamClient,
+        client_type="subclient.moonbeam.MoonbeamClient",
         options={
             "rpc_endpoints": [
                 "https://rpc.api.moonbase.moonbeam.network"
             ]
         }
     ),
-    SubstrateEndpoint[MoonbeamClient](
+    SubstrateEndpoint["MoonbeamClient"](
         chain_id="moonbeam",
         wss_endpoints=[
             "wss.api.moonbeam.network",
             "moonbeam.api.onfinality.io/public-ws"
         ],
-        client_type=MoonbeamClient,
+        client_type="subclient.moonbeam.MoonbeamClient",
         options={
             "rpc_endpoints": [
                 "https://rpc.api.moonbeam.network"
             ]
         }
     ),
-    SubstrateEndpoint[MoonbeamClient](
+    SubstrateEndpoint["MoonbeamClient"](
         chain_id="moonriver",
         wss_endpoints=[
             "wss.moonriver.moonbeam.network",
             "moonbeam-rpc.dwellir.com",
             "moonriver.api.onfinality.io/public-ws"
         ],
-        client_type=MoonbeamClient,
+        client_type="subclient.moonbeam.MoonbeamClient",
         options={
             "rpc_endpoints": [
                 "https://rpc.api.moonriver.moonbeam.network"
@@ -60,18 +81,28 @@ def get_endpoint(chain_id: str) -> SubstrateEndpoint:
 
 
 # noinspection PyUnusedLocal
-def get_client(chain_id: str, cache_path: str, wss_endpoint: str = None, t: Type[T] = SubstrateClient) -> T:
+def get_client(chain_id: str,
+               cache_path: str,
+               wss_endpoint: str = None,
+               t: Type[T] = None,
+               archive_path: str = None,
+               archive_fallback: bool = False) -> T:
     """
     Will create a chain client
     :param str chain_id: the chain name, es: "polkadot", "kusama", "moonbeam"
     :param str cache_path: the cache path for the client
     :param str wss_endpoint: override wss uri client will connect to
     :param Type[T] t: force client type casting to T for type hints
+    :param str archive_path: read blocks from this local archive instead of the node
+    :param bool archive_fallback: ask the node for anything missing in the archive
     """
     endpoint = get_endpoint(chain_id)
     if wss_endpoint:
         endpoint.wss_endpoints = [wss_endpoint]
     client = endpoint.get_client(cache_path=cache_path)
+    if archive_path:
+        from subclient.archive import SubstrateArchive
+        client.use_archive(SubstrateArchive(archive_path), fallback=archive_fallback)
     return client
 
 
@@ -0,0 +1,392 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from substrateinterface import SubstrateInterface
+from substrateinterface.exceptions import SubstrateRequestException
+from subclient.endpoint import SubstrateEndpoint
+from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicFilter
+from subclient.identity import SubstrateIdentity
+from subclient.utils import get_logger
+from threading import local
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from subclient.core import SubstrateClient
+    from subclient.moonbeam import SubstrateStakingCandidate, SubstrateStakingDelegator
+
+logger = get_logger("aio")
+
+R = TypeVar('R')
+
+
+class AsyncJsonRpcConnection:
+    """
+    JSON-RPC over a single websocket, any number of requests can be in flight and responses are matched by id
+    """
+    url: str
+    _pending: Dict[int, asyncio.Future]
+
+    def __init__(self, url: str, max_in_flight: int = 512, timeout: float = 60.0) -> None:
+        """
+        :param str url: ws:// or wss:// node url
+        :param int max_in_flight: requests sent without a response before new ones wait
+        :param float timeout: seconds to wait for a single response
+        """
+        super().__init__()
+        self.url = url
+        self._max_in_flight = max_in_flight
+        self._timeout = timeout
+        self._pending = {}
+        self._request_id = 0
+        self._session = None
+        self._websocket = None
+        self._reader = None
+        self._slots = None
+        self._connect_lock = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self):
+        import aiohttp
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self._max_in_flight)
+        async with self._connect_lock:
+            if self._websocket is not None and not self._websocket.closed:
+                return
+            # Dropped connection, requests still waiting already failed
+            await self.close()
+            self._session = aiohttp.ClientSession()
+            self._websocket = await self._session.ws_connect(self.url, max_msg_size=0, heartbeat=30)
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+            logger.debug(f"Connected to {self.url}")
+
+    def _dispatch(self, message: dict):
+        future = self._pending.pop(message.get('id'), None)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    async def _read(self):
+        import aiohttp
+        error = ConnectionError(f"Connection to {self.url} closed")
+        try:
+            async for message in self._websocket:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    data = json.loads(message.data)
+                    for item in data if isinstance(data, list) else [data]:
+                        self._dispatch(item)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    error = ConnectionError(str(self._websocket.exception()))
+                    break
+        finally:
+            # Nothing will answer the requests still waiting
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def request(self, method: str, params: list) -> dict:
+        """
+        Sends a request without waiting for the previous ones, returns the whole response, errors included
+        """
+        if self._websocket is None or self._websocket.closed:
+            await self.connect()
+        async with self._slots:
+            self._request_id += 1
+            request_id = self._request_id
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            try:
+                await self._websocket.send_str(json.dumps({
+                    'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params
+                }))
+                return await asyncio.wait_for(future, self._timeout)
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader is not None:
+            await self._reader
+        if self._session is not None:
+            await self._session.close()
+        self._websocket = None
+        self._reader = None
+        self._session = None
+
+
+class PipelinedSubstrateInterface(SubstrateInterface):
+    """
+    SubstrateInterface sending its requests through an AsyncJsonRpcConnection running on another thread loop, so
+    blocking calls of many threads share one websocket. Responses fetched ahead by the async client are served
+    without a request
+    """
+    prefetched: Dict[str, dict]
+
+    def __init__(self, connection: AsyncJsonRpcConnection, loop: asyncio.AbstractEventLoop, **kwargs):
+        # Set before the base init, it already sends requests
+        self._connection = connection
+        self._loop = loop
+        self.prefetched = {}
+        super().__init__(url=f"pipelined+{connection.url}", **kwargs)
+
+    @staticmethod
+    def request_key(method: str, params: list) -> str:
+        return json.dumps([method, params], separators=(",", ":"))
+
+    def rpc_request(self, method, params, result_handler=None):
+        if result_handler is not None:
+            raise SubstrateRequestException({'code': -32601, 'message': f"Subscription {method} is not supported on "
+                                                                        f"pipelined connections"})
+        response = self.prefetched.pop(self.request_key(method, params), None)
+        if response is None:
+            response = asyncio.run_coroutine_threadsafe(self._connection.request(method, params), self._loop).result()
+        if 'error' in response:
+            raise SubstrateRequestException(response['error'])
+        return response
+
+    def close(self):
+        # The connection belongs to the async client
+        pass
+
+
+class AsyncSubstrateClient:
+    """
+    Coroutine client, all requests go through one pipelined websocket. Blocks are fetched ahead concurrently and
+    decoded by one shared client, other reads run on worker clients that reuse its type registry so connecting them
+    sends nothing, independent reads (accounts, storage) overlap on the wire
+    """
+    _endpoint: SubstrateEndpoint
+    _connection: Optional[AsyncJsonRpcConnection] = None
+    _client: Optional["SubstrateClient"] = None
+
+    def __init__(self, endpoint: SubstrateEndpoint, cache_path: Optional[str], workers: int = 32,
+                 max_in_flight: int = 512):
+        """
+        :param SubstrateEndpoint endpoint: chain endpoint
+        :param str cache_path: cache folder of the clients
+        :param int workers: blocking reads running at once besides block decoding
+        :param int max_in_flight: requests sent without a response before new ones wait
+        """
+        self._endpoint = endpoint
+        self._cache_path = cache_path
+        self._workers = workers
+        self._max_in_flight = max_in_flight
+        self._executor = None
+        self._decoder = None
+        self._clients = local()
+        self._loop = None
+        self._type_registry_preset = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def id(self) -> str:
+        return self._endpoint.chain_id
+
+    @property
+    def connection(self) -> AsyncJsonRpcConnection:
+        return self._connection
+
+    async def connect(self):
+        if self._connection is None:
+            self._loop = asyncio.get_running_loop()
+            self._connection = AsyncJsonRpcConnection(self._endpoint.random_wss_uri, max_in_flight=self._max_in_flight)
+            await self._connection.connect()
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix=f"aio-{self.id}")
+            # One thread, the shared client runtime is never switched by concurrent decodes
+            self._decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"aio-{self.id}-decoder")
+            self._client = self._endpoint.get_client(cache_path=self._cache_path)
+            self._client._api_factory = lambda: PipelinedSubstrateInterface(self._connection, self._loop)
+            # The shared interface discovers the chain type registry once
+            api = await self._loop.run_in_executor(self._decoder, lambda: self._client._api)
+            self._type_registry_preset = api.type_registry_preset
+
+    async def close(self):
+        for executor in (self._executor, self._decoder):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self._executor = None
+        self._decoder = None
+        self._client = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def _get_client(self) -> "SubstrateClient":
+        # One blocking client per worker thread, substrateinterface keeps per runtime state that can't be shared
+        client = getattr(self._clients, "client", None)
+        if client is None:
+            client = self._endpoint.get_client(cache_path=self._cache_path)
+            client._api_factory = lambda: PipelinedSubstrateInterface(
+                self._connection, self._loop, type_registry_preset=self._type_registry_preset, auto_discover=False
+            )
+            self._clients.client = client
+        return client
+
+    async def run(self, func: Callable[["SubstrateClient"], R]) -> R:
+        """
+        Runs func with a worker client, es: await client.run(lambda x: x.total_issuance)
+        """
+        if self._connection is None:
+            await self.connect()
+        return await self._loop.run_in_executor(self._executor, lambda: func(self._get_client()))
+
+    async def rpc_request(self, method: str, params: list) -> Any:
+        """
+        Raw request result, raises SubstrateRequestException on errors
+        """
+        if self._connection is None:
+            await self.connect()
+        response = await self._connection.request(method, params)
+        if 'error' in response:
+            raise SubstrateRequestException(response['error'])
+        return response['result']
+
+    async def last_block_number(self) -> int:
+        head = await self.rpc_request("chain_getFinalizedHead", [])
+        header = await self.rpc_request("chain_getHeader", [head])
+        return int(header['number'], 16)
+
+    async def get_block_hash(self, block_number: int) -> str:
+        return await self.rpc_request("chain_getBlockHash", [block_number])
+
+    async def _prefetch(self, api: PipelinedSubstrateInterface, requests: List[tuple]) -> List[str]:
+        """
+        Sends requests at once and keeps their responses for the shared interface, returns their keys
+        """
+        keys = [api.request_key(method, params) for method, params in requests]
+        responses = await asyncio.gather(*[self._connection.request(method, params) for method, params in requests])
+        api.prefetched.update(zip(keys, responses))
+        return keys
+
+    async def get_extrinsics(self,
+                             start_block: int = None,
+                             end_block: int = None,
+                             ex_filter: SubstrateExtrinsicFilter = None,
+                             prefetch_blocks: int = 16) -> List[SubstrateExtrinsic]:
+        """
+        Same as SubstrateClient.get_extrinsics, the node responses of the next blocks are fetched concurrently while
+        blocks are decoded in order by the shared client
+        :param int start_block: first block to look for, None for latest
+        :param int end_block: last block to look for, None for latest
+        :param SubstrateExtrinsicFilter ex_filter: only return matching extrinsics
+        :param int prefetch_blocks: blocks fetched ahead of the one being decoded
+        """
+        from collections import deque
+        from substrateinterface.utils.hasher import xxh128
+        if self._connection is None:
+            await self.connect()
+        last_nr = await self.last_block_number()
+        start_nr = start_block if start_block is not None and start_block <= last_nr else last_nr
+        end_nr = end_block if end_block is not None and end_block >= start_nr else last_nr
+        # Parents are needed for the runtime version of every block
+        numbers = list(range(max(0, start_nr - 1), end_nr + 1))
+        hashes = dict(zip(numbers, await asyncio.gather(*[self.get_block_hash(x) for x in numbers])))
+        api = await self._loop.run_in_executor(self._decoder, lambda: self._client._api)
+        events_key = "0x" + xxh128(b"System") + xxh128(b"Events")
+
+        def fetch(block_nr: int) -> asyncio.Task:
+            # Requests of SubstrateClient._get_block_context, those not fetched ahead are sent when decoding
+            block_hash = hashes[block_nr]
+            requests = [("chain_getHeader", [block_hash]), ("chain_getBlock", [block_hash]),
+                        ("state_getStorageAt", [events_key, block_hash])]
+            if block_nr - 1 in hashes:
+                requests.append(("chain_getRuntimeVersion", [hashes[block_nr - 1]]))
+            return self._loop.create_task(self._prefetch(api, requests))
+
+        blocks = iter(range(start_nr, end_nr + 1))
+        # Bounded look ahead, the next block is fetched once the oldest one is decoded
+        fetches = deque((x, fetch(x)) for _, x in zip(range(max(1, prefetch_blocks)), blocks))
+        result = []
+        try:
+            while fetches:
+                block_nr, task = fetches.popleft()
+                await task
+                result += await self._loop.run_in_executor(
+                    self._decoder,
+                    lambda nr=block_nr: self._client._decode_block(
+                        self._client._get_block_context(nr, hashes[nr]), ex_filter
+                    )
+                )
+                next_nr = next(blocks, None)
+                if next_nr is not None:
+                    fetches.append((next_nr, fetch(next_nr)))
+        finally:
+            for _, task in fetches:
+                task.cancel()
+            # Responses the decoding did not ask for, es: runtime version of a block with the current runtime
+            api.prefetched.clear()
+        return result
+
+    async def get_free_balance(self, address: str, skip_cache: bool = False) -> float:
+        return await self.run(lambda x: x.get_free_balance(address, skip_cache=skip_cache))
+
+    async def get_free_balances(self, addresses: Iterable[str], skip_cache: bool = False) -> Dict[str, float]:
+        addresses = list(addresses)
+        return await self.run(lambda x: x.get_free_balances(addresses, skip_cache=skip_cache))
+
+    async def get_identities(self, addresses: Iterable[str], skip_cache: bool = False) -> Dict[str, SubstrateIdentity]:
+        addresses = list(addresses)
+        return await self.run(lambda x: x.get_identities(addresses, skip_cache=skip_cache))
+
+    async def get_identity(self, address: str, skip_cache: bool = False) -> SubstrateIdentity:
+        return await self.run(lambda x: x.get_identity(address, skip_cache=skip_cache))
+
+
+class AsyncMoonbeamClient(AsyncSubstrateClient):
+    """
+    Coroutine staking reads of MoonbeamClient
+    """
+
+    async def get_candidate_pool(self, round_nr: int = 0, skip_cache: bool = False) \
+            -> List["SubstrateStakingCandidate"]:
+        return await self.run(lambda x: x.get_candidate_pool(round_nr=round_nr, skip_cache=skip_cache))
+
+    async def get_candidate(self, address: str, round_nr: int = 0, skip_cache: bool = False) \
+            -> Optional["SubstrateStakingCandidate"]:
+        pool = await self.get_candidate_pool(round_nr=round_nr, skip_cache=skip_cache)
+        for candidate in pool:
+            if candidate.address.lower() == address.lower():
+                return candidate
+        return None
+
+    async def get_delegator_state(self, address: str, block_nr: int = None, skip_cache: bool = False) \
+            -> Optional["SubstrateStakingDelegator"]:
+        return await self.run(lambda x: x.get_delegator_state(address, block_nr=block_nr, skip_cache=skip_cache))
+
+    async def get_delegator_states(self, addresses: Iterable[str], block_nr: int = None, skip_cache: bool = False) \
+            -> Dict[str, Optional["SubstrateStakingDelegator"]]:
+        addresses = list(addresses)
+        return await self.run(lambda x: x.get_delegator_states(addresses, block_nr=block_nr, skip_cache=skip_cache))
+
+    async def get_candidate_delegations(self, address: str, skip_cache: bool = False):
+        return await self.run(lambda x: x.get_candidate_delegations(address, skip_cache=skip_cache))
+
+    async def get_candidate_points(self, address: str, round_nr: int = 0) -> int:
+        return await self.run(lambda x: x.get_candidate_points(address, round_nr=round_nr))
+
+    async def get_evm_logs(self, start_block: int, end_block: int, addresses: List[str] = None,
+                           events: List[str] = None) -> List[SubstrateExtrinsic]:
+        return await self.run(lambda x: x.get_evm_logs(start_block, end_block, addresses=addresses, events=events))
+
+
+def get_async_client(chain_id: str, cache_path: Optional[str], **kwargs) -> AsyncSubstrateClient:
+    """
+    Async client for a chain, moonbeam based chains get an AsyncMoonbeamClient
+    :param str chain_id: the chain name
+    :param str cache_path: the cache path for the worker clients
+    """
+    from subclient import get_endpoint
+    from subclient.moonbeam import MoonbeamClient
+    endpoint = get_endpoint(chain_id)
+    client_type = AsyncMoonbeamClient if issubclass(endpoint.client_type, MoonbeamClient) else AsyncSubstrateClient
+    return client_type(endpoint=endpoint, cache_path=cache_path, **kwargs)
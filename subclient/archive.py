@@ -0,0 +1,304 @@
+import json
+import os
+import zlib
+from collections import OrderedDict
+from copy import deepcopy
+from substrateinterface import SubstrateInterface
+from substrateinterface.exceptions import SubstrateRequestException
+from subclient.utils import get_logger
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+from weakref import WeakSet
+
+logger = get_logger("archive")
+
+# Node responses as (method, params, result)
+ArchiveResponses = List[Tuple[str, list, Any]]
+
+
+class SubstrateArchiveMiss(SubstrateRequestException):
+    """
+    Request not found in the archive and no fallback endpoint
+    """
+    pass
+
+
+def _response_key(method: str, params) -> str:
+    return json.dumps([method, params if params else []], sort_keys=True, separators=(",", ":"))
+
+
+def _block_refs(method: str, params) -> Set:
+    """
+    Block hashes and, for chain_getBlockHash, block numbers a request refers to
+    """
+    refs = set()
+    for param in params if isinstance(params, list) else []:
+        if isinstance(param, str) and len(param) == 66 and param.startswith("0x"):
+            refs.add(param)
+        elif method == "chain_getBlockHash" and isinstance(param, int):
+            refs.add(param)
+    return refs
+
+
+class SubstrateArchive:
+    """
+    Local block archive: node responses needed to decode a block are stored as one zlib compressed record in
+    append-only segment files, index.jsonl maps block numbers and hashes to segment offsets. Responses not tied to
+    an archived block (es: state at the head) are kept as shared records, the last written value wins
+    """
+    path: str
+    _index: Dict[int, dict]
+    _hashes: Dict[str, int]
+    _shared: Dict[str, Any]
+    _loaded: "OrderedDict[int, Dict[str, Any]]"
+    _index_name: str = "index.jsonl"
+
+    def __init__(self, path: str, segment_size: int = 64 * 2 ** 20, loaded_blocks: int = 16) -> None:
+        """
+        :param str path: archive directory, created when missing
+        :param int segment_size: start a new segment file once the current one reaches this size in bytes
+        :param int loaded_blocks: decompressed block records kept in memory
+        """
+        super().__init__()
+        self.path = path
+        self._segment_size = segment_size
+        self._loaded_blocks = loaded_blocks
+        self._lock = Lock()
+        self._index = {}
+        self._hashes = {}
+        self._shared = {}
+        self._shared_entries = []
+        self._loaded = OrderedDict()
+        self._readers = {}
+        self._writer = None
+        self._index_writer = None
+        self._segment = 0
+        os.makedirs(path, exist_ok=True)
+        self._load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"segment_{segment:05d}.bin")
+
+    def _load_index(self):
+        index_path = os.path.join(self.path, self._index_name)
+        if not os.path.exists(index_path):
+            return
+        sizes = {}
+        with open(index_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash
+                    continue
+                segment = entry['segment']
+                if segment not in sizes:
+                    sizes[segment] = os.path.getsize(self._segment_path(segment)) \
+                        if os.path.exists(self._segment_path(segment)) else 0
+                if entry['offset'] + entry['length'] > sizes[segment]:
+                    continue
+                self._segment = max(self._segment, segment)
+                if entry['block'] is None:
+                    self._shared_entries.append(entry)
+                else:
+                    self._index[entry['block']] = entry
+                    self._hashes[entry['hash']] = entry['block']
+        for entry in self._shared_entries:
+            self._shared.update(self._read_record(entry)['responses'])
+
+    @property
+    def first_block(self) -> Optional[int]:
+        return min(self._index) if self._index else None
+
+    @property
+    def last_block(self) -> Optional[int]:
+        return max(self._index) if self._index else None
+
+    def has_block(self, block: int) -> bool:
+        return block in self._index
+
+    def _read_record(self, entry: dict) -> dict:
+        segment = entry['segment']
+        if segment not in self._readers:
+            self._readers[segment] = open(self._segment_path(segment), "rb")
+        reader = self._readers[segment]
+        reader.seek(entry['offset'])
+        return json.loads(zlib.decompress(reader.read(entry['length'])))
+
+    def _append(self, record: dict) -> dict:
+        data = zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+        if self._writer is None:
+            self._writer = open(self._segment_path(self._segment), "ab")
+            self._index_writer = open(os.path.join(self.path, self._index_name), "a")
+        if self._writer.tell() and self._writer.tell() + len(data) > self._segment_size:
+            self._writer.close()
+            self._segment += 1
+            self._writer = open(self._segment_path(self._segment), "ab")
+        entry = {
+            'block': record['block'],
+            'hash': record['hash'],
+            'segment': self._segment,
+            'offset': self._writer.tell(),
+            'length': len(data)
+        }
+        self._writer.write(data)
+        self._writer.flush()
+        # Index entry only after the record is written, a crash never leaves an entry without its data
+        self._index_writer.write(json.dumps(entry) + "\n")
+        self._index_writer.flush()
+        return entry
+
+    def write_block(self, block: int, block_hash: str, responses: ArchiveResponses):
+        """
+        Stores a block, responses referring to other blocks or to no block at all go to the shared record
+        :param int block: block number
+        :param str block_hash: block hash
+        :param responses: responses collected while fetching and decoding the block
+        """
+        own = {}
+        shared = {}
+        for method, params, result in responses:
+            refs = _block_refs(method, params)
+            target = own if block_hash in refs or block in refs else shared
+            target[_response_key(method, params)] = result
+        with self._lock:
+            entry = self._append({'block': block, 'hash': block_hash, 'responses': own})
+            self._index[block] = entry
+            self._hashes[block_hash] = block
+            self._loaded.pop(block, None)
+            if shared:
+                self._append_shared(shared)
+
+    def _append_shared(self, shared: Dict[str, Any]):
+        self._append({'block': None, 'hash': None, 'responses': shared})
+        self._shared.update(shared)
+
+    def write_shared(self, responses: ArchiveResponses):
+        """
+        Stores responses not tied to a block, es: chain name and properties read once by every interface
+        :param responses: responses to keep, replacing the archived ones of the same requests
+        """
+        with self._lock:
+            self._append_shared({_response_key(method, params): result for method, params, result in responses})
+
+    def get_block_hash(self, block: int) -> Optional[str]:
+        entry = self._index.get(block)
+        return entry['hash'] if entry else None
+
+    def _load_block(self, block: int) -> Dict[str, Any]:
+        if block in self._loaded:
+            self._loaded.move_to_end(block)
+            return self._loaded[block]
+        responses = self._read_record(self._index[block])['responses']
+        self._loaded[block] = responses
+        if len(self._loaded) > self._loaded_blocks:
+            self._loaded.popitem(last=False)
+        return responses
+
+    def get(self, method: str, params) -> Tuple[bool, Any]:
+        """
+        Archived result of a request, blocks it refers to are loaded on demand
+        """
+        key = _response_key(method, params)
+        with self._lock:
+            for ref in _block_refs(method, params):
+                block = ref if isinstance(ref, int) else self._hashes.get(ref)
+                if block in self._index:
+                    responses = self._load_block(block)
+                    if key in responses:
+                        return True, responses[key]
+            for responses in reversed(self._loaded.values()):
+                if key in responses:
+                    return True, responses[key]
+            if key in self._shared:
+                return True, self._shared[key]
+        return False, None
+
+    def close(self):
+        with self._lock:
+            for f in (self._writer, self._index_writer):
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+            self._writer = None
+            self._index_writer = None
+            for reader in self._readers.values():
+                reader.close()
+            self._readers = {}
+
+
+class SubstrateArchiveCapture:
+    """
+    Collects every plain request answered by a SubstrateInterface, used to write blocks to an archive
+    """
+    responses: ArchiveResponses
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.responses = []
+        self._apis = WeakSet()
+
+    def attach(self, api: SubstrateInterface) -> SubstrateInterface:
+        # Held weakly, an interface replaced after a reconnect can reuse the id of the old one
+        if api in self._apis:
+            return api
+        rpc_request = api.rpc_request
+
+        def _rpc_request(method, params, result_handler=None):
+            response = rpc_request(method, params, result_handler=result_handler)
+            if result_handler is None and isinstance(response, dict) and 'result' in response:
+                # Copied before substrateinterface replaces parts of it with decoded objects, es: block extrinsics
+                self.responses.append((method, params, deepcopy(response['result'])))
+            return response
+
+        api.rpc_request = _rpc_request
+        self._apis.add(api)
+        return api
+
+    def clear(self):
+        self.responses = []
+
+
+class SubstrateArchiveInterface(SubstrateInterface):
+    """
+    SubstrateInterface answering requests from a SubstrateArchive instead of a websocket, misses go to the fallback
+    endpoint when one is given
+    """
+
+    def __init__(self, archive: SubstrateArchive, fallback_url: str = None, **kwargs):
+        """
+        :param SubstrateArchive archive: archive to read from
+        :param str fallback_url: node to ask for requests not in the archive, misses raise SubstrateArchiveMiss if None
+        """
+        # Set before the base init, it already sends requests
+        self.archive = archive
+        self._fallback_url = fallback_url
+        self._fallback = None
+        super().__init__(url=f"archive://{archive.path}", **kwargs)
+
+    def rpc_request(self, method, params, result_handler=None):
+        if result_handler is None:
+            found, result = self.archive.get(method, params)
+            if found:
+                return {'jsonrpc': '2.0', 'id': None, 'result': result}
+        if not self._fallback_url:
+            raise SubstrateArchiveMiss({'code': -32601, 'message': f"{method} {params} not archived"})
+        if self._fallback is None:
+            logger.info(f"Archive miss for {method}, using {self._fallback_url}")
+            self._fallback = SubstrateInterface(url=self._fallback_url)
+        return self._fallback.rpc_request(method, params, result_handler=result_handler)
+
+    def close(self):
+        if self._fallback is not None:
+            self._fallback.close()
+            self._fallback = None
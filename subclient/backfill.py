@@ -0,0 +1,131 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from substrateinterface import SubstrateInterface
+from subclient.archive import _response_key
+from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicFilter
+from subclient.utils import get_logger
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from weakref import WeakSet
+
+if TYPE_CHECKING:
+    from subclient.core import SubstrateClient
+
+logger = get_logger("backfill")
+
+# Block number, block hash and the raw node responses needed to decode it
+BackfillBlock = Tuple[int, str, Dict[str, Any]]
+
+
+class SubstratePrefetch:
+    """
+    Answers the plain requests of the block being decoded with responses fetched by the parent process, anything
+    else (runtime metadata, state read by decoders) still goes to the node
+    """
+    responses: Dict[str, Any]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.responses = {}
+        self._apis = WeakSet()
+
+    def attach(self, api: SubstrateInterface) -> SubstrateInterface:
+        # Held weakly, an interface replaced after a reconnect can reuse the id of the old one
+        if api in self._apis:
+            return api
+        rpc_request = api.rpc_request
+
+        def _rpc_request(method, params, result_handler=None):
+            if result_handler is None:
+                key = _response_key(method, params)
+                if key in self.responses:
+                    return {'jsonrpc': '2.0', 'id': None, 'result': self.responses[key]}
+            return rpc_request(method, params, result_handler=result_handler)
+
+        api.rpc_request = _rpc_request
+        self._apis.add(api)
+        return api
+
+
+# Worker process state, set by the pool initializer
+_worker_client: Optional["SubstrateClient"] = None
+_worker_prefetch: Optional[SubstratePrefetch] = None
+
+
+def _init_worker(chain_id: str, wss_endpoints: List[str], cache_path: Optional[str], archive_path: Optional[str],
+                 archive_fallback: bool):
+    global _worker_client, _worker_prefetch
+    from subclient import get_endpoint
+    endpoint = get_endpoint(chain_id)
+    endpoint.wss_endpoints = wss_endpoints
+    _worker_client = endpoint.get_client(cache_path=cache_path)
+    if archive_path:
+        from subclient.archive import SubstrateArchive
+        _worker_client.use_archive(SubstrateArchive(archive_path), fallback=archive_fallback)
+    _worker_prefetch = SubstratePrefetch()
+
+
+def _decode_batch(batch: List[BackfillBlock],
+                  ex_filter: Optional[SubstrateExtrinsicFilter]) -> List[Tuple[int, List[SubstrateExtrinsic]]]:
+    from subclient.core import SubstrateBlockHeader
+    result = []
+    for block_nr, block_hash, responses in batch:
+        _worker_prefetch.responses = responses
+        # Attached again after a reconnect replaced the interface
+        _worker_prefetch.attach(_worker_client._api)
+        header = SubstrateBlockHeader(number=block_nr, hash=block_hash)
+        result.append((block_nr, _worker_client.get_block_extrinsics(header, ex_filter=ex_filter)))
+    _worker_prefetch.responses = {}
+    return result
+
+
+class SubstrateBackfill:
+    """
+    Decodes a block range in a pool of processes. The parent only fetches raw blocks and events, SCALE decoding
+    runs in workers each with its own client and runtime metadata, decoded batches come back in block order
+    """
+
+    def __init__(self, client: "SubstrateClient", processes: int = None, batch_size: int = 16,
+                 pending_batches: int = 2) -> None:
+        """
+        :param SubstrateClient client: client fetching raw blocks, workers get a client for the same chain
+        :param int processes: decoding processes, default one per core
+        :param int batch_size: blocks sent to a worker at once
+        :param int pending_batches: batches fetched ahead per process while decoded ones are handed out
+        """
+        import os
+        super().__init__()
+        self._client = client
+        self._processes = processes if processes else os.cpu_count() or 1
+        self._batch_size = batch_size
+        self._pending_batches = pending_batches
+
+    def _worker_args(self) -> tuple:
+        # noinspection PyProtectedMember
+        client = self._client
+        archive = client._archive
+        return (client.id, list(client._endpoint.wss_endpoints), client._cache._cache_path,
+                archive.path if archive else None, client._archive_fallback)
+
+    def iter_extrinsics(self,
+                        start_block: int,
+                        end_block: int,
+                        ex_filter: SubstrateExtrinsicFilter = None) -> Iterator[Tuple[int, List[SubstrateExtrinsic]]]:
+        """
+        Yields block number and decoded extrinsics one block at a time, in block order
+        :param int start_block: first block
+        :param int end_block: last block, included
+        :param SubstrateExtrinsicFilter ex_filter: only return matching extrinsics
+        """
+        logger.info(f"Decoding blocks {start_block}-{end_block} with {self._processes} processes")
+        with ProcessPoolExecutor(max_workers=self._processes, initializer=_init_worker,
+                                 initargs=self._worker_args()) as pool:
+            pending = deque()
+            for batch_start in range(start_block, end_block + 1, self._batch_size):
+                batch_end = min(batch_start + self._batch_size - 1, end_block)
+                batch = [(nr,) + self._client.get_raw_block(nr) for nr in range(batch_start, batch_end + 1)]
+                pending.append(pool.submit(_decode_batch, batch, ex_filter))
+                # Bounded look ahead, the oldest batch is handed out while workers decode the next ones
+                while len(pending) > self._processes * self._pending_batches:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
@@ -1,28 +1,59 @@
 from subclient.utils import get_logger
+from subclient.metrics import metrics
 from diskcache import Cache
 from functools import wraps
 from hashlib import md5
+import os
+from threading import Lock
+from typing import Dict, Tuple
 
 logger = get_logger("cache")
 
 
 class CacheWrapper:
+    """
+    Disk cache handle, clients of different chains in the same process share one Cache per path and keep their keys
+    apart with a namespace
+    """
     _cache: Cache
+    _caches: Dict[str, Cache] = {}
+    _lock: Lock = Lock()
 
-    def __init__(self, cache_path: str) -> None:
+    def __init__(self, cache_path: str, namespace: str = None) -> None:
+        """
+        :param str cache_path: cache folder, no caching if not provided
+        :param str namespace: prefix for all the keys, es: the chain id
+        """
         super().__init__()
         self._cache_path = cache_path
-        self._cache = Cache(cache_path) if cache_path else None
+        self._prefix = f"{namespace}:" if namespace else ""
+        self._cache = self._get_cache(cache_path) if cache_path else None
+
+    @classmethod
+    def _get_cache(cls, cache_path: str) -> Cache:
+        with cls._lock:
+            # A removed folder needs a new handle
+            if cache_path not in cls._caches or not os.path.isdir(cache_path):
+                cls._caches[cache_path] = Cache(cache_path)
+            return cls._caches[cache_path]
 
     def get(self, key: str):
-        return self._cache.get(key) if self._cache_path else None
+        return self._cache.get(self._prefix + key) if self._cache_path else None
 
     def set(self, key: str, value: object, expire=None, tag=None) -> bool:
-        write_result = self._cache.set(key, value, expire=expire, tag=tag) if self._cache_path else False
-        logger.debug(f"Cache set {key}={value} expire:{expire} tag:{tag} success:{write_result}")
+        write_result = self._cache.set(self._prefix + key, value, expire=expire, tag=tag) if self._cache_path else False
+        logger.debug(f"Cache set {self._prefix}{key}={value} expire:{expire} tag:{tag} success:{write_result}")
         return write_result
 
 
+def get_call_cache_key(func_name: str, args: tuple = (), kwargs: dict = None) -> Tuple[str, str]:
+    """
+    Cache key cache_call uses for a call, so bulk reads can fill the entries of the single ones, returns key and args
+    """
+    cache_args = "_".join([str(x) for x in args] + [f"{k}={v}" for k, v in (kwargs if kwargs else {}).items()])
+    return func_name.replace("get_", "") + "_" + md5(cache_args.encode()).hexdigest(), cache_args
+
+
 def cache_call(expire: int = 0):
     def cache_call_func(func):
         """
@@ -45,9 +76,11 @@ def cache_call(expire: int = 0):
             # Check for cache instance
             if hasattr(args[0], "_cache") and isinstance(args[0]._cache, CacheWrapper):
                 cache: CacheWrapper = args[0]._cache
-                cache_args = "_".join([str(x) for x in args[1:]] + [f"{k}={v}" for k, v in kwargs.items()])
-                cache_key = func.__name__.replace("get_", "") + "_" + md5(cache_args.encode()).hexdigest()
+                cache_key, cache_args = get_call_cache_key(func.__name__, args[1:], kwargs)
                 result = cache.get(key=cache_key)
+                if metrics.enabled:
+                    metrics.inc("subclient_cache_requests_total", cache="call", function=func.__name__,
+                                result="miss" if result is None else "hit")
                 if result is None:
                     result = func(*args, **kwargs)
                     cache.set(key=cache_key, value=result, expire=expire)
@@ -0,0 +1,109 @@
+from subclient.extrinsics import SubstrateExtrinsic
+from subclient.utils import get_logger
+from typing import List, Optional, Set
+
+logger = get_logger("checkpoint")
+
+
+class SubstrateCheckpoint:
+    """
+    Last fully processed block of a scan, saved atomically so a restarted scan resumes right after it. Extrinsics
+    emitted past that block are remembered too so a resumed scan can skip them instead of writing them twice
+    """
+    path: str
+    block: Optional[int] = None
+    hash: Optional[str] = None
+    _emitted: Set[str]
+    # Changed since the last save
+    _dirty: bool = False
+
+    def __init__(self, path: str) -> None:
+        """
+        :param str path: checkpoint file
+        """
+        super().__init__()
+        self.path = path
+        self._emitted = set()
+
+    def __str__(self):
+        return f"{self.path} #{self.block} hash:{self.hash} emitted:{len(self._emitted)}"
+
+    @staticmethod
+    def _key(extrinsic: SubstrateExtrinsic) -> str:
+        from hashlib import blake2b
+        # Decoders emit several rows with the same id, es: rewards or batch calls, so the row content is part of it
+        digest = blake2b("\n".join(f"{x.name}={x.text}" for x in extrinsic.params).encode(), digest_size=8)
+        return f"{extrinsic.block}:{extrinsic.ex_type}:{extrinsic.id}:{extrinsic.method}:{digest.hexdigest()}"
+
+    @staticmethod
+    def row_keys(extrinsics: List[SubstrateExtrinsic]) -> List[str]:
+        """
+        Identity of every row written for a block, identical rows are told apart by their occurrence
+        """
+        occurrences = {}
+        result = []
+        for extrinsic in extrinsics:
+            key = SubstrateCheckpoint._key(extrinsic)
+            occurrences[key] = occurrences.get(key, -1) + 1
+            result.append(f"{key}:{occurrences[key]}")
+        return result
+
+    def load(self) -> bool:
+        """
+        Reads the checkpoint file, False if there is none yet
+        """
+        import json
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.block = data['block']
+        self.hash = data.get('hash')
+        self._emitted = set(data.get('emitted', []))
+        logger.debug(f"Loaded checkpoint {self}")
+        return True
+
+    def save(self):
+        """
+        Writes to a temporary file and renames it, so a crash leaves either the old or the new checkpoint. Nothing is
+        written when it did not change since the last save
+        """
+        import json
+        import os
+        from time import time
+        if self.block is None or not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                'block': self.block,
+                'hash': self.hash,
+                'emitted': sorted(self._emitted),
+                'updated': int(time())
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def mark_block(self, block: int, block_hash: Optional[str] = None):
+        """
+        Moves the checkpoint to a fully processed block, forgetting emitted extrinsics up to it
+        """
+        self.block = block
+        self.hash = block_hash
+        self._emitted = set(x for x in self._emitted if int(x.split(":", 1)[0]) > block)
+        self._dirty = True
+
+    def mark_emitted(self, key: str):
+        """
+        :param str key: row identity from row_keys
+        """
+        self._emitted.add(key)
+        self._dirty = True
+
+    def is_emitted(self, key: str) -> bool:
+        return key in self._emitted
@@ -0,0 +1,72 @@
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SubstrateBlockContext:
+    """
+    Per block decoding context, holds what the block pipeline already fetched so decoders and enrichment hooks never
+    ask the node twice for the same block
+    """
+    number: int
+    hash: str
+    extrinsics: list
+    _events: Optional[list] = None
+    _events_by_index: Optional[Dict[Optional[int], list]] = None
+    _events_loader: Callable[[], list]
+    _extras: Dict[str, Any]
+
+    def __init__(self, number: int, hash: str, extrinsics: list, events_loader: Callable[[], list]):
+        """
+        :param int number: block number
+        :param str hash: block hash
+        :param list extrinsics: raw block extrinsics
+        :param events_loader: returns the raw block events, only called the first time events are needed
+        """
+        self.number = number
+        self.hash = hash
+        self.extrinsics = extrinsics
+        self._events_loader = events_loader
+        self._extras = {}
+
+    def __str__(self):
+        return f"#{self.number} hash:{self.hash} extrinsics:{len(self.extrinsics)}"
+
+    @property
+    def events(self) -> list:
+        if self._events is None:
+            self._events = self._events_loader()
+        return self._events
+
+    @property
+    def timestamp(self) -> Optional[int]:
+        """Block timestamp in milliseconds as set by the Timestamp inherent"""
+        for extrinsic in self.extrinsics:
+            call = extrinsic.value["call"]
+            if call["call_module"] == "Timestamp" and call["call_function"] == "set":
+                return int(call["call_args"][0]["value"])
+        return None
+
+    def get_extrinsic_events(self, index: int) -> List:
+        if self._events_by_index is None:
+            self._events_by_index = {}
+            for event in self.events:
+                self._events_by_index.setdefault(event.value.get('extrinsic_idx'), []).append(event)
+        return self._events_by_index.get(index, [])
+
+    def is_extrinsic_failed(self, index: int) -> bool:
+        for event in self.get_extrinsic_events(index):
+            if event.value['module_id'] == 'System' and event.value['event_id'] == 'ExtrinsicFailed':
+                return True
+        return False
+
+    def get_extra(self, key: str, loader: Callable[[], Any] = None) -> Any:
+        """
+        Lazily loaded block scoped values, loader is called only the first time a key is requested
+        """
+        if key not in self._extras:
+            if not loader:
+                return None
+            self._extras[key] = loader()
+        return self._extras[key]
+
+    def set_extra(self, key: str, value: Any):
+        self._extras[key] = value
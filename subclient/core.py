@@ -1,63 +1,119 @@
 from substrateinterface import SubstrateInterface, Keypair, KeypairType
 
-from subclient.cache import CacheWrapper, cache_call
-from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParamType
+from subclient.cache import CacheWrapper, cache_call, get_call_cache_key
+from subclient.endpoint import SubstrateEndpoint, T
+from subclient.context import SubstrateBlockContext
+from subclient.metadata import SubstrateMetadataCache
+from subclient.metrics import metrics, instrument_api
+from subclient.profiler import profiler
+from subclient.identity import SubstrateIdentity, SubstrateIdentityCache, identity_data_to_text, identity_display
+from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParamType, SubstrateExtrinsicFilter
 from subclient.utils import api_call, get_logger
 from subclient.decoders import SubstrateExtrinsicDecoder
+from subclient.submission import SubstrateSubmissionQueue, SubstrateSubmission
 from threading import Lock
-from typing import List, Optional, Tuple, Dict, TypeVar, Type, Generic, Any
+from time import perf_counter
+from typing import Any, List, Optional, Tuple, Dict, Iterator, Iterable, Callable, TYPE_CHECKING
 from abc import ABC, abstractmethod
 
-logger = get_logger("core")
-
-T = TypeVar('T', bound='subclient')
+if TYPE_CHECKING:
+    from subclient.archive import SubstrateArchive
 
+logger = get_logger("core")
 
-class SubstrateEndpoint(Generic[T]):
-    chain_id: str
-    wss_endpoints: List[str]
-    client_type: Type[T]
-    options: Dict
 
-    def __init__(self, chain_id: str, wss_endpoints: List[str], client_type: Type[T], options: Dict = None) -> None:
-        self.chain_id = chain_id
-        self.wss_endpoints = wss_endpoints
-        self.client_type = client_type
-        if options:
-            self.options = options
-        else:
-            self.options = {}
+def _storage_keys(api: SubstrateInterface,
+                  module: str,
+                  storage_function: str,
+                  params: List[list],
+                  block_hash: str) -> Tuple[List[str], Any]:
+    """
+    Storage keys of a storage function for every params, with the storage item to decode their values
+    """
+    api.init_runtime(block_hash=block_hash)
+    metadata_module = api.get_metadata_module(module, block_hash=block_hash)
+    storage_item = api.get_metadata_storage_function(module, storage_function, block_hash=block_hash)
+    if not metadata_module or not storage_item:
+        raise NameError(f"Storage function {module}.{storage_function} not found")
+    param_types = storage_item.get_params_type_string()
+    keys = []
+    for key_params in params:
+        encoded = [
+            api.runtime_config.create_scale_object(type_string=param_type).encode(
+                api.convert_storage_parameter(param_type, param)
+            )
+            for param_type, param in zip(param_types, key_params)
+        ]
+        keys.append(api.generate_storage_hash(
+            storage_module=metadata_module.value['storage']['prefix'],
+            storage_function=storage_function,
+            params=encoded,
+            hashers=storage_item.get_param_hashers()
+        ))
+    return keys, storage_item
 
-    def get_client(self, cache_path: str) -> T:
-        return self.client_type(endpoint=self, cache_path=cache_path)
 
-    @property
-    def random_wss_uri(self) -> str:
-        from random import choice
-        return f"wss://{choice(self.wss_endpoints)}"
+def _decode_storage(api: SubstrateInterface, storage_item, data: Optional[str]) -> Any:
+    """
+    Value of a raw storage entry, None for missing entries
+    """
+    from scalecodec import ScaleBytes
+    if data is None:
+        return None
+    obj = api.runtime_config.create_scale_object(
+        type_string=storage_item.get_value_type_string(),
+        data=ScaleBytes(data),
+        metadata=api.metadata_decoder
+    )
+    obj.decode()
+    return obj.value
 
 
 class SubstrateBlockHeader:
     number: int
     hash: str
+    parent_hash: Optional[str] = None
+
+    def __init__(self, number: int, hash: str, parent_hash: str = None):
+        self.number = number
+        self.hash = hash
+        self.parent_hash = parent_hash
 
     def __str__(self):
         return f"#{self.number} hash:{self.hash}"
 
 
-class SubstrateIdentity:
+class SubstrateBatchResult:
     """
-    Substrate identity
+    Outcome of a single chunk submitted by a batch call
     """
-    address: str
-    display: str
+    chunk: int
+    size: int
+    estimated_fee: float
+    extrinsic_hash: Optional[str] = None
+    block_hash: Optional[str] = None
+    fee: float = 0.0
+    error: Optional[str] = None
+
+    def __init__(self, chunk: int, size: int, estimated_fee: float):
+        self.chunk = chunk
+        self.size = size
+        self.estimated_fee = estimated_fee
 
-    def __init__(self, address, display):
-        self.address = address
-        self.display = display
+    @property
+    def success(self) -> bool:
+        return self.block_hash is not None and self.error is None
 
     def __str__(self):
-        return f"{self.display if self.display else self.address}"
+        status = f"block:{self.block_hash}" if self.success else f"error:{self.error}"
+        return f"#{self.chunk} calls:{self.size} fee:{self.fee:.4f}/{self.estimated_fee:.4f} {status}"
+
+
+def _weight_to_int(weight) -> int:
+    # Weights v2 are encoded as {ref_time, proof_size}, only ref time is comparable with v1 weights
+    if isinstance(weight, dict):
+        return int(weight['ref_time'])
+    return int(weight)
 
 
 class SubstrateClient(ABC):
@@ -67,23 +123,94 @@ class SubstrateClient(ABC):
     _cache: CacheWrapper
     _abi_cache: Dict[str, Optional[Tuple[str, dict]]] = {}
     _default_extrinsic_decoder = SubstrateExtrinsicDecoder()
+    # Upper bound for signature, address and signed extensions added on top of the call when signing
+    _signed_extrinsic_overhead: int = 128
+    _batch_shape_cache: Dict[str, Tuple[int, int, int, int]]
+    _block_limits: Optional[Tuple[int, int]] = None
+    _submission_queue: SubstrateSubmissionQueue = None
+    _identity_cache: SubstrateIdentityCache
+    _metadata_cache: SubstrateMetadataCache
+    # Keys sent in a single state_queryStorageAt call
+    _query_multi_size: int = 256
+    _archive: "SubstrateArchive" = None
+    _archive_fallback: bool = False
+    # Builds the node interface instead of a websocket connection, es: pipelined connections of async clients
+    _api_factory: Optional[Callable[[], SubstrateInterface]] = None
 
     def __init__(self, endpoint: SubstrateEndpoint, cache_path: str):
         self._endpoint = endpoint
-        self._cache = CacheWrapper(cache_path)
+        # Per client, connecting one client never waits for another
+        self._lock = Lock()
+        self._cache = CacheWrapper(cache_path, namespace=endpoint.chain_id)
+        self._batch_shape_cache = {}
+        self._identity_cache = SubstrateIdentityCache(self._cache)
+        self._metadata_cache = SubstrateMetadataCache(endpoint.chain_id, self._cache)
 
     @property
     def _api(self) -> SubstrateInterface:
         with self._lock:
             if not self._api_instance:
-                self._api_instance = SubstrateInterface(url=self._endpoint.random_wss_uri)
+                url = self._endpoint.random_wss_uri
+                if self._api_factory:
+                    api = self._api_factory()
+                elif self._archive:
+                    from subclient.archive import SubstrateArchiveInterface
+                    api = SubstrateArchiveInterface(self._archive, fallback_url=url if self._archive_fallback else None)
+                    url = "archive"
+                else:
+                    api = SubstrateInterface(url=url)
+                # Runtime metadata comes from the cache when the spec version did not change
+                self._api_instance = instrument_api(self._metadata_cache.attach(api), url)
             return self._api_instance
 
-    @cache_call
+    def use_archive(self, archive: "SubstrateArchive", fallback: bool = False):
+        """
+        Serve node requests from a local block archive instead of the websocket
+        :param SubstrateArchive archive: archive to read from
+        :param bool fallback: ask the endpoint for requests not in the archive, otherwise they fail
+        """
+        with self._lock:
+            self._archive = archive
+            self._archive_fallback = fallback
+            self._api_instance = None
+
     @api_call
-    def _get_block_hash(self, block_number) -> str:
+    def archive_blocks(self, archive: "SubstrateArchive", start_block: int, end_block: int) -> int:
+        """
+        Fetches and decodes blocks storing every node response in the archive, returns how many blocks were added.
+        Reads served by the client disk cache are not seen, use a client without cache path for a complete archive
+        :param SubstrateArchive archive: archive to write to
+        :param int start_block: first block
+        :param int end_block: last block, included
+        """
+        from subclient.archive import SubstrateArchiveCapture
+        capture = SubstrateArchiveCapture()
+        added = 0
+        for block_nr in range(start_block, end_block + 1):
+            if archive.has_block(block_nr):
+                continue
+            capture.attach(self._api)
+            capture.clear()
+            context = self._get_block_context(block_nr)
+            # Header and events are always kept, decoders added later might need them
+            self._api.rpc_request("chain_getHeader", [context.hash])
+            _ = context.events
+            self._decode_block(context)
+            archive.write_block(block_nr, context.hash, capture.responses)
+            added += 1
+        if added:
+            # Read when an interface connects, before any block, the archive finalized head is its last block
+            head = archive.get_block_hash(archive.last_block)
+            archive.write_shared([
+                (method, params, self._api.rpc_request(method, params)['result'])
+                for method, params in (("system_chain", []), ("system_properties", []))
+            ] + [("chain_getFinalisedHead", [], head)])
+        return added
+
+    @api_call
+    def get_block_hash(self, block_number) -> str:
         logger.debug(f"get_block_hash {block_number}")
-        return self._api.get_block_header(block_number=block_number)['header']['hash']
+        return self._api.get_block_hash(block_number)
 
     # noinspection PyUnusedLocal
     def _get_extrinsic_decoder(self, pallet: str, method: str) -> SubstrateExtrinsicDecoder:
@@ -93,17 +220,13 @@ class SubstrateClient(ABC):
     def _should_decode_extrinsic(self, pallet: str, method: str) -> bool:
         return pallet == "Balances"
 
-    def _on_extrinsic_decoded(self, ex: SubstrateExtrinsic, context: Dict[str, Any]):
+    def _on_extrinsic_decoded(self, ex: SubstrateExtrinsic, context: SubstrateBlockContext):
         for param in ex.params:
             if param.param_type == SubstrateExtrinsicParamType.AMOUNT:
                 param.value = self.token_humanize(param.value)
 
-    @api_call
-    def _execute_proxy_call(self, address, call_args, proxy_type: str):
-        keypair = self.get_keypair()
-        logger.info(f"Execute on behalf of {address} with proxy {keypair.ss58_address}")
-        # Change mapping
-        call = self._api.compose_call(
+    def _compose_proxy_call(self, address, call_args, proxy_type: str):
+        return self._api.compose_call(
             call_module='Proxy',
             call_function='proxy',
             call_params={
@@ -112,6 +235,44 @@ class SubstrateClient(ABC):
                 'call': call_args,
             }
         )
+
+    def _compose_batch_call(self, calls: list):
+        return self._api.compose_call(
+            call_module='Utility',
+            call_function='batch',
+            call_params={
+                'calls': [x.value for x in calls]
+            }
+        )
+
+    @property
+    def submission_queue(self) -> SubstrateSubmissionQueue:
+        with self._lock:
+            if not self._submission_queue:
+                self._submission_queue = SubstrateSubmissionQueue(
+                    endpoint=self._endpoint,
+                    metadata_cache=self._metadata_cache
+                )
+            return self._submission_queue
+
+    def _execute_proxy_call(self, address, call_args, proxy_type: str, wait: bool = True):
+        """
+        :param bool wait: block until included, otherwise return a SubstrateSubmission from the submission queue
+        """
+        if wait:
+            return self._execute_proxy_call_wait(address=address, call_args=call_args, proxy_type=proxy_type)
+        # Not retried on disconnect, the extrinsic might already be in the pool and would be submitted twice
+        keypair = self.get_keypair()
+        logger.info(f"Submit on behalf of {address} with proxy {keypair.ss58_address}")
+        call = self._compose_proxy_call(address=address, call_args=call_args, proxy_type=proxy_type)
+        return self.submission_queue.submit(call=call, keypair=keypair)
+
+    @api_call
+    def _execute_proxy_call_wait(self, address, call_args, proxy_type: str):
+        keypair = self.get_keypair()
+        logger.info(f"Execute on behalf of {address} with proxy {keypair.ss58_address}")
+        # Change mapping
+        call = self._compose_proxy_call(address=address, call_args=call_args, proxy_type=proxy_type)
         # Make and call
         extrinsic = self._api.create_signed_extrinsic(call=call, keypair=keypair)
         receipt = self._api.submit_extrinsic(extrinsic, wait_for_inclusion=True)
@@ -120,6 +281,73 @@ class SubstrateClient(ABC):
             receipt.block_hash,
             float(receipt.total_fee_amount) / (10 ** self._api.token_decimals)
         ))
+        return receipt
+
+    @api_call
+    def get_block_limits(self) -> Tuple[int, int]:
+        """
+        Max weight and length a single normal class extrinsic can take in a block
+        """
+        if self._block_limits:
+            return self._block_limits
+        weights = self._api.get_constant(module_name='System', constant_name='BlockWeights').value
+        normal = weights['per_class']['normal']
+        max_weight = normal.get('max_extrinsic') or normal.get('max_total') or weights['max_block']
+        length = self._api.get_constant(module_name='System', constant_name='BlockLength').value
+        self._block_limits = (_weight_to_int(max_weight), int(length['max']['normal']))
+        return self._block_limits
+
+    @api_call
+    def _estimate_batch_shape(self, address, call, proxy_type: str) -> Tuple[int, int, int, int]:
+        """
+        Estimates weight and fee of a proxied batch for a given call shape, returns base weight, weight per call,
+        base fee and fee per call. Estimation uses a batch of one and two calls so base costs are split out
+        """
+        shape = f"{proxy_type}:{call.value['call_module']}.{call.value['call_function']}"
+        if shape not in self._batch_shape_cache:
+            keypair = self.get_keypair()
+            estimates = [self._api.get_payment_info(
+                call=self._compose_proxy_call(
+                    address=address,
+                    call_args=self._compose_batch_call([call] * size).value,
+                    proxy_type=proxy_type
+                ),
+                keypair=keypair
+            ) for size in (1, 2)]
+            weights = [_weight_to_int(x['weight']) for x in estimates]
+            fees = [int(x['partialFee']) for x in estimates]
+            item_weight = max(weights[1] - weights[0], 0)
+            item_fee = max(fees[1] - fees[0], 0)
+            self._batch_shape_cache[shape] = (weights[0] - item_weight, item_weight, fees[0] - item_fee, item_fee)
+            logger.debug(f"Batch shape {shape} estimated as {self._batch_shape_cache[shape]}")
+        return self._batch_shape_cache[shape]
+
+    @staticmethod
+    def _split_batch(call_lengths: List[int],
+                     base_weight: int,
+                     item_weight: int,
+                     base_length: int,
+                     max_weight: int,
+                     max_length: int) -> List[Tuple[int, int]]:
+        """
+        Greedy split of a list of calls in [start, end) ranges that fit both max weight and max length, a single
+        call that does not fit will still get its own chunk
+        """
+        chunks = []
+        start = 0
+        weight = base_weight
+        length = base_length
+        for index, call_length in enumerate(call_lengths):
+            if index > start and (weight + item_weight > max_weight or length + call_length > max_length):
+                chunks.append((start, index))
+                start = index
+                weight = base_weight
+                length = base_length
+            weight += item_weight
+            length += call_length
+        if start < len(call_lengths):
+            chunks.append((start, len(call_lengths)))
+        return chunks
 
     @property
     @api_call
@@ -127,6 +355,23 @@ class SubstrateClient(ABC):
         head = self._api.get_chain_finalised_head()
         return self._api.get_block_number(block_hash=head)
 
+    @property
+    @api_call
+    def best_block_number(self) -> int:
+        """
+        Last imported block, ahead of the finalized head and might still be retracted by a reorg
+        """
+        return int(self._api.rpc_request("chain_getHeader", [])['result']['number'], 16)
+
+    @api_call
+    def get_block_header(self, block_number: int) -> SubstrateBlockHeader:
+        """
+        Hash and parent hash of the block at a height on the best chain
+        """
+        block_hash = self._api.get_block_hash(block_number)
+        header = self._api.rpc_request("chain_getHeader", [block_hash])['result']
+        return SubstrateBlockHeader(number=block_number, hash=block_hash, parent_hash=header['parentHash'])
+
     @property
     def block_duration(self) -> float:
         return 12.2
@@ -171,26 +416,96 @@ class SubstrateClient(ABC):
             params=[]
         ).value)
 
-    @cache_call(expire=3600)
     @api_call
-    def get_identity(self, address) -> SubstrateIdentity:
+    def _query_multi(self, module: str, storage_function: str, params: List[list], block_hash: str = None) -> list:
+        """
+        Reads many keys of a storage map with state_queryStorageAt, returns decoded values in params order and None
+        for keys not found
+        :param str module: storage module
+        :param str storage_function: storage function
+        :param list params: params of each key
+        :param str block_hash: block to read at, chain head if not provided
+        """
+        from substrateinterface.exceptions import SubstrateRequestException
+        api = self._api
+        block_hash = block_hash if block_hash else api.get_chain_head()
+        # Build all keys first
+        keys, storage_item = _storage_keys(api, module, storage_function, params, block_hash)
+        # Read them in chunks
+        changes = {}
+        for i in range(0, len(keys), self._query_multi_size):
+            response = api.rpc_request("state_queryStorageAt", [keys[i:i + self._query_multi_size], block_hash])
+            if 'error' in response:
+                raise SubstrateRequestException(response['error']['message'])
+            for change_set in response['result']:
+                for key, data in change_set['changes']:
+                    changes[key.lower()] = data
+        return [_decode_storage(api, storage_item, changes.get(key.lower())) for key in keys]
+
+    def _resolve_identities(self, addresses: List[str]) -> Dict[str, SubstrateIdentity]:
+        """
+        Resolves identities with a multi key read of IdentityOf, addresses without one are looked up in SuperOf and
+        named after their parent as parent/sub
+        """
+        displays = dict(zip(addresses, [
+            identity_display(x) for x in self._query_multi('Identity', 'IdentityOf', [[x] for x in addresses])
+        ]))
+        # Sub identities
+        subs = [x for x in addresses if not displays[x]]
+        parents = {}
+        if subs:
+            for address, value in zip(subs, self._query_multi('Identity', 'SuperOf', [[x] for x in subs])):
+                if value:
+                    parents[address] = (str(value[0]), identity_data_to_text(value[1]))
+        # Parents display, either resolved already or read together
+        parent_addresses = list(set(x[0] for x in parents.values() if x[0] not in displays))
+        if parent_addresses:
+            for parent, identity in self.get_identities(parent_addresses).items():
+                displays[parent] = identity.display if identity.display != parent else None
+        result = {}
+        for address in addresses:
+            display = displays[address]
+            if not display and address in parents:
+                parent, sub_name = parents[address]
+                parent_display = displays[parent]
+                if parent_display:
+                    display = f"{parent_display}/{sub_name}" if sub_name else parent_display
+                else:
+                    display = sub_name
+            result[address] = SubstrateIdentity(address=address, display=display if display else address)
+        return result
+
+    def get_identities(self, addresses: Iterable[str], skip_cache=False) -> Dict[str, SubstrateIdentity]:
+        """
+        Identities of many addresses, the ones not cached are resolved together
+        :param addresses: addresses to resolve
+        :param bool skip_cache: resolve all of them again
+        """
+        addresses = [str(x) for x in addresses]
+        missing = list(dict.fromkeys(addresses)) if skip_cache else self._identity_cache.missing(addresses)
+        if missing:
+            logger.debug(f"get_identities resolving {len(missing)} addresses")
+            try:
+                resolved = self._resolve_identities(missing)
+            # Chains without the identity pallet
+            except NameError as e:
+                logger.debug(f"Unable to resolve identities {e}")
+                resolved = {x: SubstrateIdentity(address=x, display=x) for x in missing}
+            for identity in resolved.values():
+                self._identity_cache.set(identity)
+        return {x: self._identity_cache.get(x) for x in addresses}
+
+    def get_identity(self, address, skip_cache=False) -> SubstrateIdentity:
         logger.debug(f"get_identity {address}")
-        result = None
-        try:
-            result = self._api.query(
-                module='Identity',
-                storage_function='IdentityOf',
-                params=[address]
-            ).value
-        # int object not subscriptable in library
-        except TypeError:
-            pass
-        if not result:
-            # Store a dummy value
-            result = {'info': {}}
-        return SubstrateIdentity(
-            address=address,
-            display=result['info']['display']['Raw'] if 'display' in result['info'] else address
+        return self.get_identities([address], skip_cache=skip_cache)[str(address)]
+
+    def resolve_identities(self, extrinsics: Iterable[SubstrateExtrinsic]) -> Dict[str, SubstrateIdentity]:
+        """
+        Resolves all address params of the given extrinsics at once, so printing them never waits on single reads
+        """
+        return self.get_identities(
+            param.value for extrinsic in extrinsics for param in extrinsic.params
+            if param.is_address and isinstance(param.value, str)
         )
 
     @api_call
@@ -225,29 +540,111 @@ class SubstrateClient(ABC):
         print(balance)
         return self.token_humanize(balance['free'] - balance['misc_frozen'])
 
+    def get_free_balances(self, addresses: Iterable[str], skip_cache=False) -> Dict[str, float]:
+        """
+        Free balances of many addresses, the ones not cached are read together and cached like get_free_balance
+        :param addresses: addresses to read
+        :param bool skip_cache: read all of them again
+        """
+        addresses = [str(x) for x in addresses]
+        result = {}
+        missing = []
+        for address in dict.fromkeys(addresses):
+            cached = None if skip_cache else self._cache.get(get_call_cache_key("get_free_balance", (address,))[0])
+            if cached is None:
+                missing.append(address)
+            else:
+                result[address] = cached
+        if missing:
+            logger.debug(f"get_free_balances reading {len(missing)} addresses")
+            for address, account in zip(missing, self._query_multi('System', 'Account', [[x] for x in missing])):
+                # Accounts never funded have no entry
+                balance = self.token_humanize(account['data']['free'] - account['data']['misc_frozen']) \
+                    if account else 0.0
+                self._cache.set(get_call_cache_key("get_free_balance", (address,))[0], balance, expire=60)
+                result[address] = balance
+        return {x: result[x] for x in addresses}
+
     def close(self):
         try:
             self._api.close()
         except Exception as e:
             logger.warning(f"Unable to close connection {e}")
             pass
+        if self._submission_queue:
+            self._submission_queue.close()
+
+    def _get_block_context(self, block_nr: int, block_hash: str = None) -> SubstrateBlockContext:
+        with profiler.stage("get_block"):
+            block_hash = block_hash if block_hash else self._api.get_block_hash(block_nr)
+            extrinsics = self._api.get_block(block_hash=block_hash)['extrinsics']
+
+        def events_loader():
+            with profiler.stage("get_events"):
+                return self._api.get_events(block_hash=block_hash)
+
+        return SubstrateBlockContext(
+            number=block_nr,
+            hash=block_hash,
+            extrinsics=extrinsics,
+            events_loader=events_loader
+        )
+
+    def _decode_block(self,
+                      context: SubstrateBlockContext,
+                      ex_filter: SubstrateExtrinsicFilter = None) -> List[SubstrateExtrinsic]:
+        """
+        Decodes and enriches all extrinsics of a block, when a filter is given non matching extrinsics are
+        discarded as early as possible: method before fetching events and decoding, address before enrichment
+        """
+        push_down = ex_filter is not None and ex_filter.can_push_down
+        result = []
+        for index, extrinsic in enumerate(context.extrinsics):
+            pallet = extrinsic.value["call"]["call_module"]
+            method = extrinsic.value["call"]["call_function"]
+            if not self._should_decode_extrinsic(pallet=pallet, method=method):
+                continue
+            decoder = self._get_extrinsic_decoder(pallet=pallet, method=method)
+            if push_down and not decoder.rewrites_method and \
+                    not ex_filter.match_method(f"{pallet}.{decoder.get_function_name(method)}"):
+                continue
+            # Only process events with no errors
+            if context.is_extrinsic_failed(index):
+                continue
+            start = perf_counter() if metrics.enabled else 0
+            with profiler.stage(f"decode:{type(decoder).__name__}"):
+                decoded = decoder.decode(context=context, index=index)
+            if metrics.enabled:
+                metrics.observe("subclient_decode_seconds", perf_counter() - start, decoder=type(decoder).__name__)
+            for decoded_extrinsic in decoded:
+                if push_down and not (ex_filter.match_method(decoded_extrinsic.method)
+                                      and ex_filter.match_address(decoded_extrinsic)):
+                    continue
+                with profiler.stage("enrich"):
+                    self._on_extrinsic_decoded(decoded_extrinsic, context)
+                if ex_filter is None or ex_filter.match(decoded_extrinsic):
+                    result.append(decoded_extrinsic)
+        return result
 
     @api_call
     def get_extrinsics(self,
                        start_block: int = None,
                        end_block: int = None,
-                       use_cache: bool = False
+                       use_cache: bool = False,
+                       ex_filter: SubstrateExtrinsicFilter = None
                        ) -> List[SubstrateExtrinsic]:
         """
         :param int start_block: first block to look for, None for latest
         :param int end_block: last block to look for, None for latest
         :param bool use_cache: use the internal cache, it might use a lot of space when monitoring
+        :param SubstrateExtrinsicFilter ex_filter: only return matching extrinsics, skipping work for the others
         """
         last_nr = self.last_block_number
         start_nr = start_block if start_block is not None and start_block <= last_nr else last_nr
         end_nr = end_block if end_block is not None and end_block >= start_nr else last_nr
+        # Filtered results cannot be shared
+        use_cache = use_cache and ex_filter is None
         result = []
-        decoding_context = {}
         for block_nr in range(start_nr, end_nr + 1):
             # Cache request
             if use_cache:
@@ -255,35 +652,107 @@ class SubstrateClient(ABC):
                 if cached_result:
                     return cached_result
             # Skip cache
-            block_hash = self._api.get_block_hash(block_nr)
-            extrinsics = self._api.get_block(block_hash=block_hash)['extrinsics']
-            for index, extrinsic in enumerate(extrinsics):
-                pallet = extrinsic.value["call"]["call_module"]
-                method = extrinsic.value["call"]["call_function"]
-                if self._should_decode_extrinsic(pallet=pallet, method=method):
-                    decoder = self._get_extrinsic_decoder(pallet=pallet, method=method)
-                    receipt = self._api.retrieve_extrinsic_by_identifier(f"{block_nr}-{index}")
-                    # Only process events with no errors
-                    if not receipt.error_message:
-                        decoded_extrinsics = decoder.decode(
-                            block_nr=block_nr,
-                            index=index,
-                            extrinsic=extrinsic.value,
-                            events=receipt.triggered_events
-                        )
-                        for decoded_extrinsic in decoded_extrinsics:
-                            self._on_extrinsic_decoded(decoded_extrinsic, decoding_context)
-                            result.append(decoded_extrinsic)
+            result += self._get_block_number_extrinsics(block_nr, ex_filter=ex_filter, last_nr=last_nr)
             # Store cache
             if use_cache:
                 self._cache.set(f"extrinsics_{block_nr}", result)
         return result
 
-    def transfer_batch(self, source: str, dest_value_map: List[Tuple[str, float]]):
+    @api_call
+    def _get_block_number_extrinsics(self,
+                                     block_nr: int,
+                                     ex_filter: SubstrateExtrinsicFilter = None,
+                                     last_nr: int = None,
+                                     block_hash: str = None) -> List[SubstrateExtrinsic]:
+        """
+        Decodes a block by number, without looking at the chain head
+        :param int last_nr: chain head, only used for the head lag metric
+        :param str block_hash: hash of the block if already known
+        """
+        start = perf_counter() if metrics.enabled else 0
+        with profiler.block(block_nr, chain=self.id):
+            result = self._decode_block(self._get_block_context(block_nr, block_hash), ex_filter=ex_filter)
+        if metrics.enabled:
+            metrics.observe("subclient_block_seconds", perf_counter() - start, chain=self.id)
+            metrics.inc("subclient_blocks_total", chain=self.id)
+            metrics.set("subclient_last_block", block_nr, chain=self.id)
+            if last_nr is not None:
+                metrics.set("subclient_head_lag_blocks", last_nr - block_nr, chain=self.id)
+        return result
+
+    def get_block_extrinsics(self,
+                             header: SubstrateBlockHeader,
+                             ex_filter: SubstrateExtrinsicFilter = None,
+                             last_nr: int = None) -> List[SubstrateExtrinsic]:
+        """
+        Extrinsics of exactly the given block, even if another block at the same height is now on the best chain
+        :param SubstrateBlockHeader header: block to decode
+        :param SubstrateExtrinsicFilter ex_filter: only return matching extrinsics
+        :param int last_nr: chain head, only used for the head lag metric
+        """
+        return self._get_block_number_extrinsics(header.number, ex_filter=ex_filter, last_nr=last_nr,
+                                                 block_hash=header.hash)
+
+    @api_call
+    def get_raw_block(self, block_number: int) -> Tuple[str, Dict[str, Any]]:
         """
+        Block hash and the undecoded node responses needed to decode the block: header, runtime version, block and
+        events, keyed like archive responses
+        """
+        from subclient.archive import _response_key
+        from substrateinterface.exceptions import SubstrateRequestException
+        responses = {}
+
+        def request(method: str, params: list):
+            response = self._api.rpc_request(method, params)
+            if 'error' in response:
+                raise SubstrateRequestException(response['error'])
+            responses[_response_key(method, params)] = response['result']
+            return response['result']
+
+        with profiler.stage("get_raw_block"):
+            block_hash = request("chain_getBlockHash", [block_number])
+            parent_hash = request("chain_getHeader", [block_hash])['parentHash']
+            # Runtime of a block is the one of its parent, like substrateinterface reads it
+            request("chain_getRuntimeVersion", [block_hash if int(parent_hash, 16) == 0 else parent_hash])
+            request("chain_getBlock", [block_hash])
+            request("state_getStorageAt", [self._api.generate_storage_hash("System", "Events"), block_hash])
+        return block_hash, responses
+
+    def iter_extrinsics(self,
+                        start_block: int,
+                        end_block: int,
+                        ex_filter: SubstrateExtrinsicFilter = None,
+                        processes: int = 0) -> Iterator[Tuple[int, List[SubstrateExtrinsic]]]:
+        """
+        Yields block number and decoded extrinsics one block at a time
+        :param int start_block: first block to look for
+        :param int end_block: last block to look for, included
+        :param SubstrateExtrinsicFilter ex_filter: only return matching extrinsics
+        :param int processes: decode in this many worker processes, blocks are still yielded in order
+        """
+        if processes > 1:
+            from subclient.backfill import SubstrateBackfill
+            yield from SubstrateBackfill(self, processes=processes).iter_extrinsics(start_block, end_block, ex_filter)
+            return
+        # Blocks are decoded straight away, get_extrinsics would read the chain head for every block
+        for block_nr in range(start_block, end_block + 1):
+            yield block_nr, self._get_block_number_extrinsics(block_nr, ex_filter=ex_filter)
+
+    def transfer_batch(self,
+                       source: str,
+                       dest_value_map: List[Tuple[str, float]],
+                       max_weight_ratio: float = 0.5,
+                       max_length_ratio: float = 0.5) -> List[SubstrateBatchResult]:
+        """
+        Transfers are split in as few batches as possible, each one fitting the given fraction of the max block
+        weight and length, chunks are then submitted back to back without waiting for inclusion
         :param str source: address to point proxy to
         :param dest_value_map: a list of address/amount tuples
+        :param float max_weight_ratio: fraction of the extrinsic max weight a single batch can use
+        :param float max_length_ratio: fraction of the block max length a single batch can use
         """
+        from substrateinterface.exceptions import SubstrateRequestException
         calls = [self._api.compose_call(
             call_module='Balances',
             call_function='transfer',
@@ -292,21 +761,74 @@ class SubstrateClient(ABC):
                 'value': f"{self.token_dehumanize(x[1])}"
             }
         ) for x in dest_value_map]
-        call_args = self._api.compose_call(
-            call_module='Utility',
-            call_function='batch',
-            call_params={
-                'calls': [x.value for x in calls]
-            }
-        ).value
-        logger.info(f"Transfer: {call_args}")
-        self._execute_proxy_call(address=source, call_args=call_args, proxy_type="Balances")
+        if not calls:
+            return []
+        # Split using estimates
+        base_weight, item_weight, base_fee, item_fee = self._estimate_batch_shape(
+            address=source,
+            call=calls[0],
+            proxy_type="Balances"
+        )
+        max_weight, max_length = self.get_block_limits()
+        base_length = len(self._compose_proxy_call(
+            address=source,
+            call_args=self._compose_batch_call([]).value,
+            proxy_type="Balances"
+        ).data) + self._signed_extrinsic_overhead
+        chunks = self._split_batch(
+            call_lengths=[len(x.data) for x in calls],
+            base_weight=base_weight,
+            item_weight=item_weight,
+            base_length=base_length,
+            max_weight=int(max_weight * max_weight_ratio),
+            max_length=int(max_length * max_length_ratio)
+        )
+        logger.info(f"Transfer: {len(calls)} calls in {len(chunks)} batches, estimated fee "
+                    f"{self.token_humanize(base_fee * len(chunks) + item_fee * len(calls)):.4f}{self.symbol}")
+        # Submit all chunks without waiting, nonces are tracked locally so they can land in the same block
+        result = []
+        submissions: List[Optional[SubstrateSubmission]] = []
+        for index, (start, end) in enumerate(chunks):
+            chunk_result = SubstrateBatchResult(
+                chunk=index,
+                size=end - start,
+                estimated_fee=self.token_humanize(base_fee + item_fee * (end - start))
+            )
+            call_args = self._compose_batch_call(calls[start:end]).value
+            logger.info(f"Transfer batch {index + 1}/{len(chunks)}: {call_args}")
+            submission = None
+            try:
+                submission = self._execute_proxy_call(
+                    address=source,
+                    call_args=call_args,
+                    proxy_type="Balances",
+                    wait=False
+                )
+                chunk_result.extrinsic_hash = submission.extrinsic_hash
+            except SubstrateRequestException as e:
+                chunk_result.error = str(e)
+            result.append(chunk_result)
+            submissions.append(submission)
+        # Collect
+        for chunk_result, submission in zip(result, submissions):
+            if submission:
+                try:
+                    submission.included.result()
+                    chunk_result.block_hash = submission.block_hash
+                    chunk_result.fee = self.token_humanize(submission.fee)
+                    if not submission.success:
+                        chunk_result.error = str(submission.error_message)
+                except TimeoutError as e:
+                    chunk_result.error = str(e)
+            logger.info(f"Transfer batch result {chunk_result}")
+        return result
 
-    def transfer(self, source: str, dest: str, amount: float):
+    def transfer(self, source: str, dest: str, amount: float, wait: bool = True) -> Optional[SubstrateSubmission]:
         """
         :param str source: address to point proxy to
         :param dest: destination address
         :param amount: amount to transfer
+        :param bool wait: block until included, otherwise return the queued submission
         """
         call = self._api.compose_call(
             call_module='Balances',
@@ -317,4 +839,5 @@ class SubstrateClient(ABC):
             }
         )
         logger.info(f"Transfer: {call.value}")
-        self._execute_proxy_call(address=source, call_args=call.value, proxy_type="Balances")
+        result = self._execute_proxy_call(address=source, call_args=call.value, proxy_type="Balances", wait=wait)
+        return None if wait else result
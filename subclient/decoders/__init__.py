@@ -1,3 +1,4 @@
 from subclient.decoders.core import SubstrateExtrinsicDecoder
 from subclient.decoders.moonbeam_evm import SubstrateMoonbeamEVMExtrinsicDecoder
 from subclient.decoders.moonbeam_validation import SubstrateMoonbeamValidationExtrinsicDecoder
+from subclient.decoders.moonbeam_evm_logs import SubstrateMoonbeamEVMLogScanner
@@ -1,4 +1,5 @@
 from typing import List
+from subclient.context import SubstrateBlockContext
 from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParam, SubstrateExtrinsicParamType
 
 
@@ -8,23 +9,39 @@ class SubstrateExtrinsicDecoder:
     def extrinsic_type(self) -> str:
         return "Substrate"
 
+    @property
+    def rewrites_method(self) -> bool:
+        """True if decoded extrinsics might get a different module or function than the raw call"""
+        return False
+
+    @staticmethod
+    def get_function_name(call_function: str) -> str:
+        return call_function.replace('_', ' ').title().replace(' ', '')
+
     # noinspection PyUnusedLocal,PyMethodMayBeStatic
-    def _decode_args(self, ex: SubstrateExtrinsic, args: list, events: list) -> List[SubstrateExtrinsic]:
+    def _decode_args(self,
+                     ex: SubstrateExtrinsic,
+                     args: list,
+                     events: list,
+                     context: SubstrateBlockContext,
+                     index: int) -> List[SubstrateExtrinsic]:
         return [ex]
 
-    def decode(self, block_nr: int, index: int, extrinsic, events: list) -> List[SubstrateExtrinsic]:
+    def decode(self, context: SubstrateBlockContext, index: int) -> List[SubstrateExtrinsic]:
+        block_nr = context.number
+        extrinsic = context.extrinsics[index].value
         module = extrinsic["call"]["call_module"]
         function = extrinsic["call"]["call_function"]
         ex = SubstrateExtrinsic(
             block=block_nr,
             id=f"{block_nr}-{index}",
             module=module,
-            function=function.replace('_', ' ').title().replace(' ', ''),
+            function=self.get_function_name(function),
             ex_type=self.extrinsic_type
         )
         # Signed from
         if 'address' in extrinsic:
-            ex.params.append(SubstrateExtrinsicParam(
+            ex.add_param(SubstrateExtrinsicParam(
                 name="from",
                 value=extrinsic['address'],
                 param_type=SubstrateExtrinsicParamType.ADDRESS)
@@ -37,10 +54,16 @@ class SubstrateExtrinsicDecoder:
             param_type = param['type']
             # Types that are amounts
             if param_type in ('Balance', 'BalanceOf') and str(value).isdigit():
-                ex.add_amount(name=name, value=float(value))
+                ex.add_amount(name=name, value=int(value))
             elif param_type in ('LookupSource',) or str(value).startswith("0x"):
                 ex.add_address(name=name, value=str(value))
             else:
                 ex.add_generic(name=name, value=value)
         # Decode specific args if any
-        return self._decode_args(ex=ex, args=args, events=events)
+        return self._decode_args(
+            ex=ex,
+            args=args,
+            events=context.get_extrinsic_events(index),
+            context=context,
+            index=index
+        )
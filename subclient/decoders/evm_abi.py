@@ -0,0 +1,216 @@
+from subclient.utils import get_logger
+from typing import Dict, List, Optional, Tuple
+
+logger = get_logger("evmabi")
+
+# Addresses bundled ABIs are deployed at, other ABI files can declare their own with an "address" key
+abi_map = {
+    "0x0000000000000000000000000000000000000800": "ParachainStaking",
+    "0x0000000000000000000000000000000000000802": "IERC20"
+}
+
+
+def _to_bytes(data) -> bytes:
+    if isinstance(data, str):
+        return bytes.fromhex(data[2:] if data.startswith("0x") else data)
+    return bytes(data)
+
+
+def _get_arg_types(inputs: list) -> List[str]:
+    from eth_utils.abi import collapse_if_tuple
+    return [collapse_if_tuple(x) for x in inputs]
+
+
+def _is_static(arg_type: str) -> bool:
+    return not (arg_type in ("string", "bytes") or arg_type.endswith("]") or arg_type.startswith("("))
+
+
+class EVMFunction:
+    """
+    ABI function with its arguments decoder built once
+    """
+    contract: str
+    name: str
+    arg_names: List[str]
+    arg_types: List[str]
+
+    def __init__(self, contract: str, name: str, arg_names: List[str], arg_types: List[str]):
+        from eth_abi.registry import registry
+        from eth_abi.decoding import TupleDecoder
+        self.contract = contract
+        self.name = name
+        self.arg_names = arg_names
+        self.arg_types = arg_types
+        self._decoder = TupleDecoder(decoders=[registry.get_decoder(x) for x in arg_types])
+
+    def __str__(self):
+        return f"{self.contract}.{self.name}({','.join(self.arg_types)})"
+
+    def decode(self, data: bytes) -> Dict[str, object]:
+        """
+        :param bytes data: call arguments, without the 4 bytes selector
+        """
+        from eth_abi.decoding import ContextFramesBytesIO
+        from eth_utils import to_checksum_address
+        values = self._decoder(ContextFramesBytesIO(data))
+        return {
+            name: to_checksum_address(value) if arg_type == "address" else value
+            for name, arg_type, value in zip(self.arg_names, self.arg_types, values)
+        }
+
+
+class EVMEvent:
+    """
+    ABI event with its data decoder built once, indexed arguments are read from topics
+    """
+    contract: str
+    name: str
+    arg_names: List[str]
+    arg_types: List[str]
+    arg_indexed: List[bool]
+
+    def __init__(self, contract: str, name: str, arg_names: List[str], arg_types: List[str], arg_indexed: List[bool]):
+        from eth_abi.registry import registry
+        from eth_abi.decoding import TupleDecoder
+        self.contract = contract
+        self.name = name
+        self.arg_names = arg_names
+        self.arg_types = arg_types
+        self.arg_indexed = arg_indexed
+        self._data_decoder = TupleDecoder(decoders=[
+            registry.get_decoder(x) for x, indexed in zip(arg_types, arg_indexed) if not indexed
+        ])
+        self._topic_decoders = [
+            registry.get_decoder(x) if indexed and _is_static(x) else None
+            for x, indexed in zip(arg_types, arg_indexed)
+        ]
+
+    def __str__(self):
+        return f"{self.contract}.{self.name}({','.join(self.arg_types)})"
+
+    def decode(self, topics: List[bytes], data: bytes) -> Dict[str, object]:
+        """
+        :param topics: log topics without the event signature topic
+        :param bytes data: log data
+        """
+        from eth_abi.decoding import ContextFramesBytesIO
+        from eth_utils import to_checksum_address
+        values = iter(self._data_decoder(ContextFramesBytesIO(data)))
+        topics = iter(topics)
+        result = {}
+        for name, arg_type, indexed, decoder in zip(
+                self.arg_names, self.arg_types, self.arg_indexed, self._topic_decoders):
+            if indexed:
+                topic = next(topics)
+                # Dynamic types are only available as their hash
+                value = decoder(ContextFramesBytesIO(topic)) if decoder else "0x" + topic.hex()
+            else:
+                value = next(values)
+            result[name] = to_checksum_address(value) if arg_type == "address" else value
+        return result
+
+
+class EVMSelectorTable:
+    """
+    Maps contract addresses to their ABI name, 4 bytes selectors to their functions and topics to their events
+    """
+    _contracts: Dict[str, str]
+    _functions: Dict[str, Dict[bytes, EVMFunction]]
+    _events: Dict[bytes, EVMEvent]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._contracts = {}
+        self._functions = {}
+        self._events = {}
+
+    def add_abi(self, name: str, abi: list, addresses: List[str] = None):
+        from eth_utils import function_abi_to_4byte_selector, event_abi_to_log_topic
+        functions = self._functions.setdefault(name, {})
+        for item in abi:
+            if item.get('type') == 'function':
+                functions[function_abi_to_4byte_selector(item)] = EVMFunction(
+                    contract=name,
+                    name=item['name'],
+                    arg_names=[x['name'] for x in item['inputs']],
+                    arg_types=_get_arg_types(item['inputs'])
+                )
+            elif item.get('type') == 'event' and not item.get('anonymous'):
+                # Events are matched by topic only so logs from any contract sharing the ABI can be decoded
+                self._events.setdefault(event_abi_to_log_topic(item), EVMEvent(
+                    contract=name,
+                    name=item['name'],
+                    arg_names=[x['name'] for x in item['inputs']],
+                    arg_types=_get_arg_types(item['inputs']),
+                    arg_indexed=[bool(x.get('indexed')) for x in item['inputs']]
+                ))
+        for address in addresses or []:
+            self._contracts[address.lower()] = name
+
+    def get_contract_name(self, address: str) -> Optional[str]:
+        return self._contracts.get(str(address).lower())
+
+    def decode(self, address: str, data) -> Optional[Tuple[EVMFunction, Dict[str, object]]]:
+        """
+        Decodes call input for a known contract, None if contract or selector are unknown
+        :param str address: contract address
+        :param data: call input as bytes or hex string
+        """
+        data = _to_bytes(data)
+        name = self.get_contract_name(address)
+        function = self._functions[name].get(bytes(data[:4])) if name else None
+        if not function:
+            return None
+        return function, function.decode(bytes(data[4:]))
+
+    def get_event_topics(self, names: List[str] = None) -> List[str]:
+        """
+        Topic hashes of known events, optionally only the ones matching "Event" or "Contract.Event" names
+        """
+        return [
+            "0x" + topic.hex() for topic, event in self._events.items()
+            if not names or event.name in names or f"{event.contract}.{event.name}" in names
+        ]
+
+    def decode_log(self, topics: list, data) -> Optional[Tuple[EVMEvent, Dict[str, object]]]:
+        """
+        Decodes a log, None if its event is unknown
+        :param list topics: log topics as bytes or hex strings
+        :param data: log data as bytes or hex string
+        """
+        topics = [_to_bytes(x) for x in topics]
+        event = self._events.get(topics[0]) if topics else None
+        if not event or len(topics) - 1 != sum(event.arg_indexed):
+            return None
+        return event, event.decode(topics[1:], _to_bytes(data))
+
+
+_selector_table: Optional[EVMSelectorTable] = None
+
+
+def get_selector_table() -> EVMSelectorTable:
+    """
+    Selector table for all ABI files shipped in the abis package folder, built on first use
+    """
+    global _selector_table
+    if _selector_table is None:
+        import json
+        from importlib.resources import files
+        table = EVMSelectorTable()
+        addresses = {}
+        for address, name in abi_map.items():
+            addresses.setdefault(name, []).append(address)
+        for resource in sorted(files("subclient.decoders").joinpath("abis").iterdir(), key=lambda x: x.name):
+            if not resource.name.endswith(".json"):
+                continue
+            name = resource.name[:-len(".json")]
+            try:
+                data = json.loads(resource.read_text())
+            except (IOError, ValueError) as e:
+                logger.warning(f"Unable to read abi {resource.name}: {e}")
+                continue
+            declared = data.get('address')
+            declared = [declared] if isinstance(declared, str) else (declared or [])
+            table.add_abi(name=name, abi=data['abi'], addresses=addresses.get(name, []) + declared)
+        _selector_table = table
+    return _selector_table
@@ -0,0 +1,104 @@
+from typing import List, Optional
+
+
+def _to_int(value) -> int:
+    # U256 might come as a list of little endian u64 limbs
+    if isinstance(value, (list, tuple)):
+        return sum(int(x) << (64 * i) for i, x in enumerate(value))
+    return int(value)
+
+
+def _to_bytes(value) -> bytes:
+    if value is None:
+        return b""
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+class EVMTransaction:
+    """
+    Signed ethereum transaction as carried by Ethereum.transact call args, sender is recovered from the signature
+    so no eth RPC is needed to decode it
+    """
+    tx_type: str
+    chain_id: Optional[int]
+    nonce: int
+    gas_limit: int
+    to: Optional[str]
+    value: int
+    input: bytes
+    _fields: dict
+    _sender: Optional[str] = None
+
+    def __init__(self, tx_type: str, fields: dict):
+        from eth_utils import to_checksum_address
+        self.tx_type = tx_type
+        self._fields = fields
+        self.nonce = _to_int(fields['nonce'])
+        self.gas_limit = _to_int(fields['gas_limit'])
+        self.value = _to_int(fields['value'])
+        self.input = _to_bytes(fields['input'])
+        action = fields['action']
+        call = action.get('Call') if isinstance(action, dict) else None
+        self.to = to_checksum_address(call) if call else None
+        if tx_type == "Legacy":
+            v = _to_int(fields['signature']['v'])
+            self.chain_id = (v - 35) // 2 if v >= 35 else None
+        else:
+            self.chain_id = _to_int(fields['chain_id'])
+
+    @staticmethod
+    def from_call_args(transaction: dict) -> "EVMTransaction":
+        """
+        :param dict transaction: the decoded transaction arg, either a TransactionV2 enum or a bare legacy transaction
+        """
+        if len(transaction) == 1:
+            tx_type, fields = list(transaction.items())[0]
+            if tx_type in ("Legacy", "EIP2930", "EIP1559"):
+                return EVMTransaction(tx_type=tx_type, fields=fields)
+        return EVMTransaction(tx_type="Legacy", fields=transaction)
+
+    def _access_list(self) -> List[list]:
+        return [
+            [_to_bytes(x['address']), [_to_bytes(k) for k in x['storage_keys']]]
+            for x in self._fields.get('access_list') or []
+        ]
+
+    def _signing_hash(self) -> bytes:
+        import rlp
+        from eth_utils import keccak
+        f = self._fields
+        to = _to_bytes(self.to)
+        if self.tx_type == "Legacy":
+            items = [self.nonce, _to_int(f['gas_price']), self.gas_limit, to, self.value, self.input]
+            if self.chain_id is not None:
+                items += [self.chain_id, 0, 0]
+            return keccak(rlp.encode(items))
+        elif self.tx_type == "EIP2930":
+            items = [self.chain_id, self.nonce, _to_int(f['gas_price']), self.gas_limit, to, self.value, self.input,
+                     self._access_list()]
+            return keccak(b"\x01" + rlp.encode(items))
+        items = [self.chain_id, self.nonce, _to_int(f['max_priority_fee_per_gas']), _to_int(f['max_fee_per_gas']),
+                 self.gas_limit, to, self.value, self.input, self._access_list()]
+        return keccak(b"\x02" + rlp.encode(items))
+
+    def _vrs(self):
+        f = self._fields
+        if self.tx_type == "Legacy":
+            v = _to_int(f['signature']['v'])
+            recovery_id = v - 35 - 2 * self.chain_id if self.chain_id is not None else v - 27
+            r, s = f['signature']['r'], f['signature']['s']
+        else:
+            recovery_id = int(bool(f['odd_y_parity']))
+            r, s = f['r'], f['s']
+        return recovery_id, int.from_bytes(_to_bytes(r), "big"), int.from_bytes(_to_bytes(s), "big")
+
+    @property
+    def sender(self) -> str:
+        """Checksum address recovered from the transaction signature"""
+        if self._sender is None:
+            from eth_keys import keys
+            signature = keys.Signature(vrs=self._vrs())
+            self._sender = signature.recover_public_key_from_msg_hash(self._signing_hash()).to_checksum_address()
+        return self._sender
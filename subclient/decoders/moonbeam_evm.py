@@ -1,17 +1,14 @@
 from typing import List
+from subclient.context import SubstrateBlockContext
 from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParam, SubstrateExtrinsicParamType
 from subclient.decoders import SubstrateExtrinsicDecoder
-from subclient.utils import get_logger, api_call
-from typing import Dict, Optional
-from web3 import Web3
+from subclient.decoders.evm_abi import get_selector_table, abi_map
+from subclient.decoders.evm_transaction import EVMTransaction
+from subclient.utils import get_logger
+from typing import Optional
 
 logger = get_logger("moonbeamevmdecoder")
 
-abi_map = {
-    "0x0000000000000000000000000000000000000800": "ParachainStaking",
-    "0x0000000000000000000000000000000000000802": "IERC20"
-}
-
 
 def is_evm_address(address):
     addr = str(address)
@@ -19,8 +16,6 @@ def is_evm_address(address):
 
 
 class SubstrateMoonbeamEVMExtrinsicDecoder(SubstrateExtrinsicDecoder):
-    _transaction_index_cache: Dict[int, int] = {}
-    _abi_cache: Dict[str, Optional[dict]] = {}
     _supported_evm_modules = (
         'Balances',
         'ParachainStaking',
@@ -29,68 +24,67 @@ class SubstrateMoonbeamEVMExtrinsicDecoder(SubstrateExtrinsicDecoder):
         'Transact',
     )
 
-    def __init__(self, rpc_uri: str):
-        self._rcp_uri = rpc_uri
-
     @property
     def extrinsic_type(self) -> str:
         return "EVM"
 
-    def _get_abi(self, contract_address: str) -> Optional[dict]:
-        import json
-        from os import path
-        if contract_address not in self._abi_cache.keys():
-            abi_name = abi_map[contract_address] if contract_address in abi_map else None
-            abi_path = f"abis/{abi_name}.json"
-            if abi_name and path.exists(abi_path):
-                try:
-                    with open(abi_path) as f:
-                        self._abi_cache[contract_address] = json.loads(f.read())
-                except IOError as e:
-                    logger.warning(f"Unable to read abi from {abi_path}: {e}")
-                    self._abi_cache[contract_address] = None
-            else:
-                self._abi_cache[contract_address] = None
-        return self._abi_cache[contract_address]
+    @property
+    def rewrites_method(self) -> bool:
+        return True
+
+    @staticmethod
+    def _get_transaction_index(context: SubstrateBlockContext, index: int) -> int:
+        """Ethereum transactions are indexed in the order they are applied in the block"""
+        return sum(
+            1 for x in context.extrinsics[:index]
+            if x.value["call"]["call_module"] == "Ethereum" and x.value["call"]["call_function"] == "transact"
+        )
 
-    @api_call
-    def _decode_args(self, ex: SubstrateExtrinsic, args: list, events: list) -> List[SubstrateExtrinsic]:
+    @staticmethod
+    def _get_executed_event(events: list) -> Optional[dict]:
+        for event in events:
+            if event.value['module_id'] == 'Ethereum' and event.value['event_id'] == 'Executed':
+                attributes = event.value['attributes']
+                if isinstance(attributes, dict):
+                    return attributes
+                return dict(zip(('from', 'to', 'transaction_hash', 'exit_reason'), attributes))
+        return None
+
+    def _decode_args(self,
+                     ex: SubstrateExtrinsic,
+                     args: list,
+                     events: list,
+                     context: SubstrateBlockContext,
+                     index: int) -> List[SubstrateExtrinsic]:
         # Method is not supported
         if ex.function not in self._supported_functions:
             return []
-        # Increase TX counter
-        self._transaction_index_cache[ex.block] = self._transaction_index_cache.setdefault(ex.block, -1) + 1
-        # Go on
-        w3 = Web3(Web3.HTTPProvider(self._rcp_uri))
-        # Try to get transaction
-        try:
-            transaction = w3.eth.get_transaction_by_block(ex.block, self._transaction_index_cache[ex.block])
-        except (KeyError, ValueError):
+        transaction_arg = next((x['value'] for x in args if x['name'] == 'transaction'), None)
+        if not transaction_arg:
+            return []
+        transaction = EVMTransaction.from_call_args(transaction_arg)
+        # Only known precompiles can be decoded
+        table = get_selector_table()
+        if not transaction.to or not table.get_contract_name(transaction.to):
+            return []
+        # Reverted transactions are still included as successful extrinsics
+        executed = self._get_executed_event(events)
+        if executed and 'Succeed' not in str(executed.get('exit_reason')):
+            logger.debug(f"Discared reverted EVM transaction: {executed.get('transaction_hash')}")
             return []
-        # Get ABI
-        abi_data = None
-        contract_address = None
-        if 'to' in transaction.keys():
-            contract_address = transaction['to']
-            abi_data = self._get_abi(contract_address=contract_address)
-            if not abi_data:
-                return []
         # Get from first
-        if 'from' in transaction.keys():
-            ex.params.append(SubstrateExtrinsicParam(
-                name="from",
-                value=transaction['from'],
-                param_type=SubstrateExtrinsicParamType.ADDRESS
-            ))
-        # Check abi
-        abi = abi_data['abi']
-        name = abi_map[contract_address]
-        input = transaction['input']
-        contract = w3.eth.contract(address=contract_address, abi=abi)
+        ex.add_param(SubstrateExtrinsicParam(
+            name="from",
+            value=transaction.sender,
+            param_type=SubstrateExtrinsicParamType.ADDRESS
+        ))
         # Decode input and replace it on EX
-        func_obj, func_params = contract.decode_function_input(input)
-        ex.module = name
-        ex.function = func_obj.function_identifier.replace('_', ' ').title().replace(' ', '')
+        decoded = table.decode(transaction.to, transaction.input)
+        if not decoded:
+            return []
+        func_obj, func_params = decoded
+        ex.module = func_obj.contract
+        ex.function = func_obj.name.replace('_', ' ').title().replace(' ', '')
         # Check module support
         if ex.module not in self._supported_evm_modules:
             logger.debug(f"Discared EVM module: {ex.module}")
@@ -102,8 +96,10 @@ class SubstrateMoonbeamEVMExtrinsicDecoder(SubstrateExtrinsicDecoder):
         elif ex.module == "Balances" and ex.function != "Transfer":
             logger.debug(f"Discared EVM module: {ex.module}")
             return []
-        # Add transaction index
-        ex.add_generic(name="evmTransactionIndex", value=str(transaction['transactionIndex']))
+        # Add transaction index and hash
+        ex.add_generic(name="evmTransactionIndex", value=str(self._get_transaction_index(context, index)))
+        if executed:
+            ex.add_generic(name="evmTransactionHash", value=str(executed['transaction_hash']))
         # Functional params
         ex.rm_param("transaction")
         for key in func_params:
@@ -113,5 +109,5 @@ class SubstrateMoonbeamEVMExtrinsicDecoder(SubstrateExtrinsicDecoder):
                 ptype = SubstrateExtrinsicParamType.AMOUNT
             elif is_evm_address(value):
                 ptype = SubstrateExtrinsicParamType.ADDRESS
-            ex.params.append(SubstrateExtrinsicParam(name=key, value=value, param_type=ptype))
+            ex.add_param(SubstrateExtrinsicParam(name=key, value=value, param_type=ptype))
         return [ex]
@@ -0,0 +1,147 @@
+from typing import Iterator, List, Optional
+from subclient.decoders.evm_abi import get_selector_table, abi_map
+from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParamType
+from subclient.profiler import profiler
+from subclient.utils import get_logger
+
+logger = get_logger("moonbeamevmlogs")
+
+
+class EVMLogsRequestError(Exception):
+    pass
+
+
+_session = None
+
+
+def _get_session():
+    # One pooled HTTP session for every scanner of the process, chains watched together reuse its connections
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
+
+
+class SubstrateMoonbeamEVMLogScanner:
+    """
+    Scans eth_getLogs over block ranges, chunks shrink when the node refuses or times out and grow back while
+    responses stay small, logs are decoded by topic with the bundled ABIs
+    """
+    extrinsic_type = "EVM"
+    # Only the native token precompile is known to use the chain decimals
+    _amount_contracts = tuple(k.lower() for k, v in abi_map.items() if v == "IERC20")
+
+    def __init__(self,
+                 rpc_uri: str,
+                 chunk_size: int = 1000,
+                 min_chunk_size: int = 1,
+                 max_chunk_size: int = 10000,
+                 target_logs: int = 2000,
+                 timeout: float = 30.0):
+        """
+        :param str rpc_uri: eth HTTP RPC endpoint
+        :param int chunk_size: initial blocks per eth_getLogs call
+        :param int min_chunk_size: smallest chunk before giving up on a range
+        :param int max_chunk_size: biggest chunk the scanner can grow to
+        :param int target_logs: chunks grow only while responses have less logs than this
+        :param float timeout: HTTP timeout for a single call
+        """
+        self._rpc_uri = rpc_uri
+        self._chunk_size = chunk_size
+        self._min_chunk_size = min_chunk_size
+        self._max_chunk_size = max_chunk_size
+        self._target_logs = target_logs
+        self._timeout = timeout
+        self._request_id = 0
+
+    def _get_logs(self, start_block: int, end_block: int, addresses: Optional[List[str]], topics: List[str]) -> list:
+        import requests
+        self._request_id += 1
+        query = {
+            'fromBlock': hex(start_block),
+            'toBlock': hex(end_block),
+            'topics': [topics],
+        }
+        if addresses:
+            query['address'] = addresses
+        try:
+            with profiler.stage("rpc:eth_getLogs"):
+                response = _get_session().post(self._rpc_uri, timeout=self._timeout, json={
+                    'jsonrpc': '2.0',
+                    'id': self._request_id,
+                    'method': 'eth_getLogs',
+                    'params': [query]
+                })
+                response.raise_for_status()
+                data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise EVMLogsRequestError(str(e))
+        if 'error' in data:
+            raise EVMLogsRequestError(str(data['error']))
+        return data['result']
+
+    def _to_extrinsic(self, log: dict) -> Optional[SubstrateExtrinsic]:
+        decoded = get_selector_table().decode_log(log['topics'], log['data'])
+        if not decoded:
+            return None
+        event, params = decoded
+        block = int(log['blockNumber'], 16)
+        ex = SubstrateExtrinsic(
+            # Own id namespace, log indexes would collide with the extrinsic ids of the same block
+            id=f"{block}-log{int(log['logIndex'], 16)}",
+            block=block,
+            module=event.contract,
+            function=event.name,
+            ex_type=self.extrinsic_type
+        )
+        ex.add_address(name="contract", value=log['address'])
+        ex.add_generic(name="evmTransactionIndex", value=str(int(log['transactionIndex'], 16)))
+        ex.add_generic(name="evmTransactionHash", value=log['transactionHash'])
+        is_native = log['address'].lower() in self._amount_contracts
+        for name, arg_type in zip(event.arg_names, event.arg_types):
+            value = params[name]
+            if arg_type == "address":
+                ex.add_address(name=name, value=value)
+            elif is_native and arg_type.startswith("uint") and name in ('value', 'amount'):
+                ex.add_amount(name=name, value=value)
+            else:
+                ex.add_generic(name=name, value=value)
+        return ex
+
+    def scan(self,
+             start_block: int,
+             end_block: int,
+             addresses: List[str] = None,
+             events: List[str] = None) -> Iterator[SubstrateExtrinsic]:
+        """
+        Yields decoded logs in block order
+        :param int start_block: first block, included
+        :param int end_block: last block, included
+        :param list addresses: only logs from these contracts, all contracts if not provided
+        :param list events: "Event" or "Contract.Event" names to look for, all known events if not provided
+        """
+        topics = get_selector_table().get_event_topics(events)
+        if not topics:
+            return
+        block = start_block
+        while block <= end_block:
+            chunk_end = min(end_block, block + self._chunk_size - 1)
+            try:
+                logs = self._get_logs(block, chunk_end, addresses, topics)
+            except EVMLogsRequestError as e:
+                if self._chunk_size <= self._min_chunk_size:
+                    raise
+                self._chunk_size = max(self._min_chunk_size, self._chunk_size // 2)
+                logger.debug(f"eth_getLogs {block}-{chunk_end} failed ({e}), chunk size now {self._chunk_size}")
+                continue
+            logger.debug(f"eth_getLogs {block}-{chunk_end}: {len(logs)} logs")
+            for log in logs:
+                if log.get('removed'):
+                    continue
+                ex = self._to_extrinsic(log)
+                if ex:
+                    yield ex
+            if len(logs) < self._target_logs // 2:
+                self._chunk_size = min(self._max_chunk_size, self._chunk_size * 2)
+            block = chunk_end + 1
@@ -1,35 +1,25 @@
 from typing import List
+from subclient.context import SubstrateBlockContext
 from subclient.extrinsics import SubstrateExtrinsic
 from subclient.decoders import SubstrateExtrinsicDecoder
-from subclient.utils import api_call
-from substrateinterface import SubstrateInterface
-from threading import Lock
 
 
 class SubstrateMoonbeamValidationExtrinsicDecoder(SubstrateExtrinsicDecoder):
-    _endpoint = None
-    _lock: Lock = Lock()
-    _api_instance: SubstrateInterface = None
-
-    # We cannot reference Endpoint type due to an issue in circular import
-    def __init__(self, endpoint) -> None:
-        super().__init__()
-        self._endpoint = endpoint
 
     @property
-    def _api(self) -> SubstrateInterface:
-        with self._lock:
-            if not self._api_instance:
-                self._api_instance = SubstrateInterface(url=self._endpoint.random_wss_uri)
-            return self._api_instance
+    def rewrites_method(self) -> bool:
+        return True
 
-    @api_call
-    def _decode_args(self, ex: SubstrateExtrinsic, args: list, events: list) -> List[SubstrateExtrinsic]:
-        block_hash = self._api.get_block_hash(ex.block)
-        receipt = self._api.get_events(block_hash=block_hash)
+    def _decode_args(self,
+                     ex: SubstrateExtrinsic,
+                     args: list,
+                     events: list,
+                     context: SubstrateBlockContext,
+                     index: int) -> List[SubstrateExtrinsic]:
+        # Rewards are paid on initialize so they are not bound to the extrinsic, look at all block events
         collator = None
         result = []
-        for r in receipt:
+        for r in context.events:
             event = r['event'].value
             pallet = event['module_id']
             function = event['event_id']
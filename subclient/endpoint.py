@@ -0,0 +1,43 @@
+from typing import List, Dict, TypeVar, Type, Generic, Union
+
+T = TypeVar('T', bound='subclient')
+
+
+class SubstrateEndpoint(Generic[T]):
+    """
+    Chain endpoint, client_type can be given as a "module.Class" path so registering endpoints never imports clients
+    """
+    chain_id: str
+    wss_endpoints: List[str]
+    options: Dict
+
+    def __init__(self,
+                 chain_id: str,
+                 wss_endpoints: List[str],
+                 client_type: Union[Type[T], str],
+                 options: Dict = None) -> None:
+        self.chain_id = chain_id
+        self.wss_endpoints = wss_endpoints
+        self._client_type = client_type
+        if options:
+            self.options = options
+        else:
+            self.options = {}
+
+    @property
+    def client_type(self) -> Type[T]:
+        if isinstance(self._client_type, str):
+            from importlib import import_module
+            module, name = self._client_type.rsplit(".", 1)
+            self._client_type = getattr(import_module(module), name)
+        return self._client_type
+
+    def get_client(self, cache_path: str) -> T:
+        return self.client_type(endpoint=self, cache_path=cache_path)
+
+    @property
+    def random_wss_uri(self) -> str:
+        from random import choice
+        uri = choice(self.wss_endpoints)
+        # Full urls are kept, es: a local ws:// node
+        return uri if "://" in uri else f"wss://{uri}"
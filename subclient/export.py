@@ -0,0 +1,204 @@
+from subclient.extrinsics import SubstrateExtrinsic
+from subclient.utils import get_logger
+from typing import Dict, Iterable, List, Optional
+
+logger = get_logger("export")
+
+export_columns = ("block", "index", "ex_type", "module", "function", "from", "amount", "params")
+export_formats = ("parquet", "npz")
+# Optional packages every format needs, installed with the "export" extra
+export_requirements = {"parquet": "pyarrow", "npz": "numpy"}
+
+
+def missing_export_requirement(format: str) -> Optional[str]:
+    """
+    Package the format needs that is not installed, None if it can be written
+    """
+    from importlib.util import find_spec
+    package = export_requirements[format]
+    return package if find_spec(package) is None else None
+
+
+def _get_index(extrinsic: SubstrateExtrinsic) -> int:
+    index = extrinsic.id.rsplit("-", 1)[-1]
+    return int(index) if index.isdigit() else -1
+
+
+def _get_sender(extrinsic: SubstrateExtrinsic) -> str:
+    sender = extrinsic.get_param("from")
+    return str(sender) if sender is not None else ""
+
+
+def extrinsic_to_dict(extrinsic: SubstrateExtrinsic) -> Dict[str, object]:
+    """
+    JSON ready dict with a fixed set of keys, amount params are floats and any other param its text so value types
+    never change between rows
+    """
+    return {
+        "id": extrinsic.id,
+        "block": extrinsic.block,
+        "index": _get_index(extrinsic),
+        "ex_type": extrinsic.ex_type,
+        "module": extrinsic.module,
+        "function": extrinsic.function,
+        "from": _get_sender(extrinsic),
+        "amount": extrinsic.amount,
+        "params": {x.name: float(x.value) if x.is_amount else x.text for x in extrinsic.params},
+    }
+
+
+def extrinsic_to_row(extrinsic: SubstrateExtrinsic) -> tuple:
+    """
+    Flat row matching export_columns, params are flattened to a JSON object of their text values
+    """
+    from json import dumps
+    return (
+        extrinsic.block,
+        _get_index(extrinsic),
+        extrinsic.ex_type,
+        extrinsic.module,
+        extrinsic.function,
+        _get_sender(extrinsic),
+        extrinsic.amount,
+        dumps({x.name: x.text for x in extrinsic.params}, separators=(",", ":")),
+    )
+
+
+class SubstrateExtrinsicExporter:
+    """
+    Buffers decoded extrinsics as rows and writes them as columnar row groups, use as a context manager or call
+    close to flush the last group
+    """
+    _rows: List[tuple]
+    _row_groups: int = 0
+    _total_rows: int = 0
+
+    def __init__(self, path: str, format: str = "parquet", row_group_size: int = 65536):
+        """
+        :param str path: output file
+        :param str format: "parquet" (needs pyarrow) or "npz" (needs numpy)
+        :param int row_group_size: rows buffered before a row group is written
+        """
+        if format not in export_formats:
+            raise NameError(f"Export format {format} not supported")
+        missing = missing_export_requirement(format)
+        if missing:
+            raise ImportError(f"Export format {format} needs {missing}, install substrate-cli-tools[export]")
+        self._path = path
+        self._format = format
+        self._row_group_size = row_group_size
+        self._rows = []
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def total_rows(self) -> int:
+        return self._total_rows + len(self._rows)
+
+    def write(self, extrinsics: Iterable[SubstrateExtrinsic]):
+        for extrinsic in extrinsics:
+            self._rows.append(extrinsic_to_row(extrinsic))
+        if len(self._rows) >= self._row_group_size:
+            self.flush()
+
+    def _columns(self) -> Dict[str, list]:
+        return {name: [row[i] for row in self._rows] for i, name in enumerate(export_columns)}
+
+    def _write_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columns = self._columns()
+        table = pa.table({
+            "block": pa.array(columns["block"], type=pa.int64()),
+            "index": pa.array(columns["index"], type=pa.int32()),
+            "ex_type": pa.array(columns["ex_type"], type=pa.string()).dictionary_encode(),
+            "module": pa.array(columns["module"], type=pa.string()).dictionary_encode(),
+            "function": pa.array(columns["function"], type=pa.string()).dictionary_encode(),
+            "from": pa.array(columns["from"], type=pa.string()),
+            "amount": pa.array(columns["amount"], type=pa.float64()),
+            "params": pa.array(columns["params"], type=pa.string()),
+        })
+        if not self._writer:
+            self._writer = pq.ParquetWriter(self._path, table.schema, compression="zstd")
+        self._writer.write_table(table)
+
+    def _write_npz(self):
+        import numpy as np
+        from zipfile import ZipFile, ZIP_DEFLATED
+        columns = self._columns()
+        arrays = {
+            "block": np.array(columns["block"], dtype=np.int64),
+            "index": np.array(columns["index"], dtype=np.int32),
+            "amount": np.array(columns["amount"], dtype=np.float64),
+        }
+        for name in ("ex_type", "module", "function", "from", "params"):
+            arrays[name] = np.array(columns[name], dtype=np.str_)
+        # Every row group is appended to the archive as its own set of arrays
+        with ZipFile(self._path, mode="a" if self._row_groups else "w", compression=ZIP_DEFLATED) as archive:
+            for name, array in arrays.items():
+                with archive.open(f"{self._row_groups:06d}_{name}.npy", mode="w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, array, allow_pickle=False)
+
+    def flush(self, force: bool = False):
+        """
+        :param bool force: write a row group even if empty, so the file always gets a schema
+        """
+        if not self._rows and not force:
+            return
+        if self._format == "parquet":
+            self._write_parquet()
+        else:
+            self._write_npz()
+        logger.debug(f"Row group {self._row_groups} with {len(self._rows)} rows written to {self._path}")
+        self._row_groups += 1
+        self._total_rows += len(self._rows)
+        self._rows = []
+
+    def close(self):
+        self.flush(force=not self._row_groups)
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+
+def read_npz_export(path: str) -> Dict[str, object]:
+    """
+    Loads a npz export concatenating its row groups, returns a numpy array per column
+    """
+    import numpy as np
+    groups: Dict[str, list] = {}
+    with np.load(path, allow_pickle=False) as data:
+        for key in sorted(data.files):
+            groups.setdefault(key.split("_", 1)[1], []).append(data[key])
+    return {name: np.concatenate(groups[name]) for name in export_columns if name in groups}
+
+
+def export_extrinsics(client,
+                      start_block: int,
+                      end_block: int,
+                      path: str,
+                      format: str = "parquet",
+                      row_group_size: int = 65536,
+                      ex_filter=None,
+                      processes: int = 0) -> int:
+    """
+    Streams decoded extrinsics of a block range into a columnar file, returns the number of rows written
+    :param client: the SubstrateClient to read blocks with
+    :param int start_block: first block
+    :param int end_block: last block, included
+    :param str path: output file
+    :param str format: "parquet" or "npz"
+    :param int row_group_size: rows per row group
+    :param ex_filter: optional SubstrateExtrinsicFilter
+    :param int processes: decoding processes, 0 to decode in this process
+    """
+    with SubstrateExtrinsicExporter(path=path, format=format, row_group_size=row_group_size) as exporter:
+        for block_nr, extrinsics in client.iter_extrinsics(start_block, end_block, ex_filter=ex_filter,
+                                                              processes=processes):
+            exporter.write(extrinsics)
+        return exporter.total_rows
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from enum import Enum
 import re
 
@@ -10,17 +10,48 @@ class SubstrateExtrinsicParamType(Enum):
 
 
 class SubstrateExtrinsicParam:
+    """
+    Extrinsic param keeping its typed value (planck int or float amounts, address strings, generic values), the text
+    form is only rendered when asked
+    """
+    __slots__ = ('name', 'key', 'param_type', '_value', '_text')
     name: str
-    value: str
+    key: str
     param_type: SubstrateExtrinsicParamType
 
     def __init__(self,
                  name: str,
-                 value: object,
+                 value: Any,
                  param_type: SubstrateExtrinsicParamType = SubstrateExtrinsicParamType.GENERIC):
         self.name = name
-        self.value = str(value)
+        self.key = name.lower()
         self.param_type = param_type
+        self._value = value
+        self._text = None
+
+    def __getstate__(self):
+        return self.name, self.param_type, self._value
+
+    def __setstate__(self, state):
+        self.__init__(name=state[0], param_type=state[1], value=state[2])
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def value(self) -> Any:
+        return self._value
+
+    @value.setter
+    def value(self, value: Any):
+        self._value = value
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = str(self._value)
+        return self._text
 
     @property
     def is_amount(self) -> bool:
@@ -39,12 +70,12 @@ class SubstrateExtrinsic:
     """
     Generic abstract substrate event
     """
+    __slots__ = ('id', 'block', 'module', 'function', 'ex_type', '_params', '_index', '_indexed')
     id: str
     block: int
     module: str
     function: str
     ex_type: str
-    params: List[SubstrateExtrinsicParam]
 
     def __init__(self,
                  id: str,
@@ -59,23 +90,48 @@ class SubstrateExtrinsic:
         self.ex_type = ex_type
         self.params = []
 
+    def __getstate__(self):
+        return self.id, self.block, self.module, self.function, self.ex_type, self._params
+
+    def __setstate__(self, state):
+        self.__init__(*state[:5])
+        self.params = state[5]
+
     def __str__(self):
         return f"#{self.id}:{self.ex_type}:" \
                f"{self.method}" \
-               f"({','.join(x.name + ':' + str(x.param_type).split('.')[1] + '=' + str(x.value) for x in self.params)})"
+               f"({','.join(x.name + ':' + x.param_type.name + '=' + x.text for x in self.params)})"
 
-    def get_param(self, key: str) -> Optional[str]:
-        for param in self.params:
-            if param.name.lower() == key.lower():
-                return param.value
-        return None
+    @property
+    def params(self) -> List[SubstrateExtrinsicParam]:
+        return self._params
+
+    @params.setter
+    def params(self, value: List[SubstrateExtrinsicParam]):
+        self._params = value
+        self._index = {}
+        self._indexed = 0
+
+    def _get_index(self) -> Dict[str, SubstrateExtrinsicParam]:
+        # Params might be appended directly to the list, index whatever was added since last time
+        if self._indexed != len(self._params):
+            for param in self._params[self._indexed:]:
+                self._index.setdefault(param.key, param)
+            self._indexed = len(self._params)
+        return self._index
+
+    def get_param(self, key: str) -> Optional[Any]:
+        param = self._get_index().get(key.lower())
+        return param.value if param else None
 
     def rm_param(self, key: str):
-        self.params = [i for i in self.params if i.name.lower() != key.lower()]
+        key = key.lower()
+        if key in self._get_index():
+            self.params = [i for i in self._params if i.key != key]
 
     @property
     def amount(self) -> float:
-        for param in self.params:
+        for param in self._params:
             if param.param_type == SubstrateExtrinsicParamType.AMOUNT:
                 return float(param.value)
         return 0.0
@@ -84,22 +140,25 @@ class SubstrateExtrinsic:
     def method(self) -> str:
         return f"{self.module}.{self.function}"
 
+    def add_param(self, param: SubstrateExtrinsicParam):
+        self._params.append(param)
+
     def add_amount(self, value: float, name: str = "amount"):
-        self.params.append(SubstrateExtrinsicParam(
+        self._params.append(SubstrateExtrinsicParam(
             name=name,
             value=value,
             param_type=SubstrateExtrinsicParamType.AMOUNT
         ))
 
     def add_address(self, value: str, name: str = "address"):
-        self.params.append(SubstrateExtrinsicParam(
+        self._params.append(SubstrateExtrinsicParam(
             name=name,
             value=value,
             param_type=SubstrateExtrinsicParamType.ADDRESS
         ))
 
-    def add_generic(self, value: str, name: str):
-        self.params.append(SubstrateExtrinsicParam(
+    def add_generic(self, value: Any, name: str):
+        self._params.append(SubstrateExtrinsicParam(
             name=name,
             value=value,
             param_type=SubstrateExtrinsicParamType.GENERIC
@@ -107,10 +166,16 @@ class SubstrateExtrinsic:
 
 
 class SubstrateExtrinsicFilter:
-    address_pattern: str = None
-    method_pattern: str = None
+    """
+    Patterns are compiled once when set, method and address predicates can be checked on their own so callers
+    can skip work for extrinsics that will never match
+    """
     min_amount: int = None
     match_all: bool = True
+    _address_pattern: str = None
+    _address_regex = None
+    _method_pattern: str = None
+    _method_regex = None
 
     def __init__(self,
                  address_pattern: str = None,
@@ -127,6 +192,24 @@ class SubstrateExtrinsicFilter:
         return f"[address:{self.address_pattern},method:{self.method_pattern}," \
                f"amount:{self.min_amount},all:{self.match_all}]"
 
+    @property
+    def address_pattern(self) -> Optional[str]:
+        return self._address_pattern
+
+    @address_pattern.setter
+    def address_pattern(self, value: Optional[str]):
+        self._address_pattern = value
+        self._address_regex = re.compile(value.lower()) if value else None
+
+    @property
+    def method_pattern(self) -> Optional[str]:
+        return self._method_pattern
+
+    @method_pattern.setter
+    def method_pattern(self, value: Optional[str]):
+        self._method_pattern = value
+        self._method_regex = re.compile(value, re.IGNORECASE) if value else None
+
     @property
     def is_flood_filter(self) -> bool:
         """True if filter will return a LOT of events"""
@@ -138,17 +221,26 @@ class SubstrateExtrinsicFilter:
             return False
         return True
 
+    @property
+    def can_push_down(self) -> bool:
+        """True if a single failing predicate is enough to discard an extrinsic"""
+        return self.match_all
+
+    def match_method(self, method: str) -> bool:
+        return not self._method_regex or self._method_regex.search(method) is not None
+
+    def match_address(self, extrinsic: SubstrateExtrinsic) -> bool:
+        if not self._address_regex:
+            return True
+        for param in extrinsic.params:
+            value = param.text.lower()
+            if value.startswith("0x") and self._address_regex.search(value):
+                return True
+        return False
+
+    def match_amount(self, extrinsic: SubstrateExtrinsic) -> bool:
+        return not self.min_amount or extrinsic.amount == 0 or extrinsic.amount > self.min_amount
+
     def match(self, extrinsic: SubstrateExtrinsic):
-        address_match = False
-        if not self.address_pattern:
-            address_match = True
-        else:
-            for param in extrinsic.params:
-                value = str(param.value).lower()
-                if value.startswith("0x") and re.search(self.address_pattern.lower(), value):
-                    address_match = True
-                    break
-        amount_match = not self.min_amount or extrinsic.amount == 0 or extrinsic.amount > self.min_amount
-        method_match = not self.method_pattern or re.search(self.method_pattern, extrinsic.method, re.IGNORECASE)
-        matches = (address_match, amount_match, method_match)
+        matches = (self.match_address(extrinsic), self.match_amount(extrinsic), self.match_method(extrinsic.method))
         return all(matches) if self.match_all else any(matches)
@@ -0,0 +1,107 @@
+from subclient.cache import CacheWrapper
+from subclient.metrics import metrics
+from subclient.utils import get_logger
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = get_logger("identity")
+
+
+class SubstrateIdentity:
+    """
+    Substrate identity
+    """
+    address: str
+    display: str
+
+    def __init__(self, address, display):
+        self.address = address
+        self.display = display
+
+    def __str__(self):
+        return f"{self.display if self.display else self.address}"
+
+
+def identity_data_to_text(data) -> Optional[str]:
+    """
+    Text of an identity Data field, None when empty or hashed
+    """
+    if isinstance(data, dict):
+        data = data.get('Raw')
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="replace")
+    return data if isinstance(data, str) and data else None
+
+
+def identity_display(registration) -> Optional[str]:
+    """
+    Display name of an IdentityOf registration, newer runtimes wrap it in a (registration, username) tuple
+    """
+    if isinstance(registration, (list, tuple)):
+        registration = registration[0] if registration else None
+    if not isinstance(registration, dict):
+        return None
+    return identity_data_to_text(registration.get('info', {}).get('display'))
+
+
+class SubstrateIdentityCache:
+    """
+    Resolved identities by address, kept in memory for the process and in the client disk cache across runs, both
+    expire after the same time
+    """
+    # Identity and when it was kept in memory
+    _identities: Dict[str, Tuple[float, SubstrateIdentity]]
+
+    def __init__(self, cache: CacheWrapper, expire: int = 3600, max_size: int = 100000) -> None:
+        """
+        :param CacheWrapper cache: disk cache, might have no path
+        :param int expire: cache expiration in seconds
+        :param int max_size: identities kept in memory, the oldest are dropped first
+        """
+        super().__init__()
+        self._cache = cache
+        self._expire = expire
+        self._max_size = max_size
+        self._identities = {}
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return f"identity_{address}"
+
+    def _keep(self, identity: SubstrateIdentity):
+        # Moved to the end, the dict stays ordered by time
+        self._identities.pop(identity.address, None)
+        self._identities[identity.address] = (monotonic(), identity)
+        while len(self._identities) > self._max_size:
+            del self._identities[next(iter(self._identities))]
+
+    def get(self, address: str) -> Optional[SubstrateIdentity]:
+        entry = self._identities.get(address)
+        if entry is not None:
+            if monotonic() - entry[0] < self._expire:
+                return entry[1]
+            del self._identities[address]
+        identity = self._cache.get(self._key(address))
+        if identity is not None:
+            self._keep(identity)
+        return identity
+
+    def set(self, identity: SubstrateIdentity):
+        self._keep(identity)
+        self._cache.set(self._key(identity.address), identity, expire=self._expire, tag="identity")
+
+    def missing(self, addresses: Iterable[str]) -> List[str]:
+        """
+        Addresses not resolved yet, without duplicates and in order
+        """
+        result = []
+        hits = 0
+        for address in dict.fromkeys(addresses):
+            if self.get(address) is None:
+                result.append(address)
+            else:
+                hits += 1
+        if metrics.enabled:
+            metrics.inc("subclient_cache_requests_total", hits, cache="identity", result="hit")
+            metrics.inc("subclient_cache_requests_total", len(result), cache="identity", result="miss")
+        return result
@@ -0,0 +1,201 @@
+from bisect import bisect_left, bisect_right
+from substrateinterface import SubstrateInterface
+from subclient.moonbeam import SubstrateStakingCandidate, rank_candidates
+from subclient.utils import get_logger
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from subclient.moonbeam import MoonbeamClient
+
+logger = get_logger("livepool")
+
+
+class SubstrateLiveCandidatePool:
+    """
+    Candidate pool kept current by a storage subscription on CandidatePool, SelectedCandidates and the CandidateInfo
+    of every candidate, candidates are the CandidateInfo entries as in get_candidate_pool. A change only moves the
+    changed candidates and rebuilds the ranks between their old and new position, the whole pool is rebuilt locally
+    when the selected set or the pool size changes and never loaded again from the node while the subscription runs
+    """
+    updates: int = 0
+    _snapshot: List[SubstrateStakingCandidate]
+    _by_address: Dict[str, SubstrateStakingCandidate]
+    _ranking: List[dict]
+    _totals: List[int]
+
+    def __init__(self, client: "MoonbeamClient", url: str = None, timeout: float = 60.0, retry_delay: float = 5.0):
+        """
+        :param MoonbeamClient client: client the pool belongs to, amounts are humanized with it
+        :param str url: node to subscribe to, one of the client endpoints if not provided
+        :param float timeout: seconds start waits for the first notification
+        :param float retry_delay: seconds before subscribing again after an error
+        """
+        # noinspection PyProtectedMember
+        self._url = url if url else client._endpoint.random_wss_uri
+        self._humanize = client.token_humanize
+        self._timeout = timeout
+        self._retry_delay = retry_delay
+        self._lock = Lock()
+        self._ready = Event()
+        self._stop = Event()
+        self._thread = None
+        self._api = None
+        self._info = {}
+        self._selected = []
+        self._ranking = []
+        self._totals = []
+        self._snapshot = []
+        self._by_address = {}
+
+    @property
+    def running(self) -> bool:
+        return self._ready.is_set() and not self._stop.is_set()
+
+    @property
+    def snapshot(self) -> List[SubstrateStakingCandidate]:
+        """Current pool sorted by rank, the list is replaced on updates and never changed in place"""
+        return self._snapshot
+
+    def get(self, address: str) -> Optional[SubstrateStakingCandidate]:
+        return self._by_address.get(address.lower())
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="live-candidate-pool", daemon=True)
+            self._thread.start()
+        if not self._ready.wait(self._timeout):
+            raise TimeoutError(f"No candidate pool notification from {self._url} in {self._timeout}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._api is not None:
+            # Unblocks the subscription read
+            # noinspection PyBroadException
+            try:
+                self._api.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            # noinspection PyBroadException
+            try:
+                self._subscribe()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Candidate pool subscription dropped, subscribing again: {e}")
+                # Snapshot is stale until the first notification of the new subscription
+                self._ready.clear()
+                self._api = None
+                self._stop.wait(self._retry_delay)
+
+    def _subscribe(self):
+        """
+        Subscribes to the keys of the current candidates, returns when candidates joined or left so the new key set
+        is subscribed to
+        """
+        from subclient.core import _decode_storage, _storage_keys
+        if self._api is None:
+            self._api = SubstrateInterface(url=self._url)
+        api = self._api
+        block_hash = api.get_chain_head()
+        pool_keys, pool_item = _storage_keys(api, 'ParachainStaking', 'CandidatePool', [[]], block_hash)
+        selected_keys, selected_item = _storage_keys(api, 'ParachainStaking', 'SelectedCandidates', [[]], block_hash)
+        pool = api.rpc_request("state_getStorageAt", [pool_keys[0], block_hash])['result']
+        pool = _decode_storage(api, pool_item, pool)
+        pool_members = [x['owner'] for x in pool] if pool else []
+        # Every CandidateInfo entry is ranked, offline candidates included, CandidatePool only signals joins and leaves
+        candidate_info = api.query_map(module='ParachainStaking', storage_function='CandidateInfo', params=[],
+                                       block_hash=block_hash).records
+        addresses = [x[0].value for x in candidate_info]
+        info_keys, info_item = _storage_keys(api, 'ParachainStaking', 'CandidateInfo', [[x] for x in addresses],
+                                             block_hash)
+        candidates_by_key = dict(zip([x.lower() for x in info_keys], addresses))
+        pool_key, selected_key = pool_keys[0].lower(), selected_keys[0].lower()
+        # Candidates that left while the previous subscription was down
+        departed = {x: None for x in set(self._info) - set(addresses)}
+
+        def result_handler(message, update_nr, subscription_id):
+            info = departed if update_nr == 0 else {}
+            selected = None
+            members = None
+            for key, data in message['params']['result']['changes']:
+                key = key.lower()
+                if key in candidates_by_key:
+                    info[candidates_by_key[key]] = _decode_storage(api, info_item, data)
+                elif key == selected_key:
+                    selected = _decode_storage(api, selected_item, data)
+                elif key == pool_key:
+                    value = _decode_storage(api, pool_item, data)
+                    members = [x['owner'] for x in value] if value else []
+            self.apply(info, selected=selected)
+            self._ready.set()
+            # Candidates joined or left, their keys need a new subscription
+            if self._stop.is_set() or (members is not None and set(members) != set(pool_members)):
+                return subscription_id
+            return None
+
+        logger.info(f"Subscribing to {len(addresses)} candidates on {self._url}")
+        keys = [pool_key, selected_key] + list(candidates_by_key)
+        subscription_id = api.rpc_request("state_subscribeStorage", [keys], result_handler=result_handler)
+        if not self._stop.is_set():
+            api.rpc_request("state_unsubscribeStorage", [subscription_id])
+
+    def _remove(self, address: str) -> Optional[int]:
+        old = self._info.pop(address, None)
+        if old is None:
+            return None
+        # Ranking is sorted by descending total, same totals are found by address
+        index = bisect_left(self._totals, -old['total_counted'])
+        while self._ranking[index]['id'] != address:
+            index += 1
+        del self._ranking[index]
+        del self._totals[index]
+        return index
+
+    def _insert(self, address: str, info: dict) -> int:
+        info = dict(info, id=address)
+        self._info[address] = info
+        index = bisect_right(self._totals, -info['total_counted'])
+        self._ranking.insert(index, info)
+        self._totals.insert(index, -info['total_counted'])
+        return index
+
+    def apply(self, info: Dict[str, Optional[dict]], selected: Optional[List[str]] = None):
+        """
+        Applies changed CandidateInfo values, None for candidates that left, and the selected set when it changed
+        :param dict info: changed CandidateInfo values by address
+        :param list selected: new SelectedCandidates, None if unchanged
+        """
+        with self._lock:
+            size = len(self._ranking)
+            last_selected = self._ranking[len(self._selected) - 1]['total_counted'] \
+                if self._selected and len(self._ranking) >= len(self._selected) else None
+            changed = []
+            for address, value in info.items():
+                old = self._remove(address)
+                new = self._insert(address, value) if value is not None else None
+                changed += [x for x in (old, new) if x is not None]
+            if selected is not None:
+                self._selected = list(selected)
+            if not self._ranking:
+                self._snapshot, self._by_address = [], {}
+                return
+            # Positions of several changes shift each other, only a single move is rebuilt in place
+            full = selected is not None or len(changed) > 2 or size != len(self._ranking) or not self._snapshot or \
+                len(self._ranking) < len(self._selected) or \
+                last_selected != self._ranking[len(self._selected) - 1]['total_counted']
+            if full:
+                snapshot = rank_candidates(self._ranking, self._selected, self._humanize)
+            elif changed:
+                # Ranks between the old and new positions moved, their neighbours' distances changed
+                start, end = max(0, min(changed) - 1), min(len(self._ranking) - 1, max(changed) + 1)
+                snapshot = list(self._snapshot)
+                snapshot[start:end + 1] = rank_candidates(self._ranking, self._selected, self._humanize, start, end)
+            else:
+                return
+            self._snapshot = snapshot
+            self._by_address = {x.address.lower(): x for x in snapshot}
+            self.updates += 1
@@ -0,0 +1,102 @@
+from subclient.cache import CacheWrapper
+from subclient.metrics import metrics
+from subclient.utils import get_logger
+from threading import Lock
+from typing import Any, Dict, Optional
+
+logger = get_logger("metadata")
+
+
+class SubstrateMetadataCache:
+    """
+    Runtime metadata store plugged into SubstrateInterface as its cache region, keyed by chain and spec version.
+    Decoded metadata is shared by every connection of the process, on disk only the raw SCALE metadata is kept as
+    decoded scale objects are built on dynamically created classes and can't be pickled, so a new process skips the
+    download and only decodes locally
+    """
+    # Decoded metadata by key, shared across connections and reconnects
+    _decoded: Dict[str, Any] = {}
+    _lock: Lock = Lock()
+    _metadata_type: str = "MetadataVersioned"
+
+    def __init__(self, chain_id: str, cache: CacheWrapper) -> None:
+        """
+        :param str chain_id: chain the metadata belongs to
+        :param CacheWrapper cache: disk cache, might have no path
+        """
+        super().__init__()
+        self._chain_id = chain_id
+        self._cache = cache
+
+    def attach(self, api):
+        """
+        Use as the given SubstrateInterface cache region, raw metadata is decoded with its runtime config. One cache
+        can be attached to any number of interfaces, es: the client, submission queue and tracker connections
+        """
+        api.cache_region = SubstrateMetadataRegion(self, api)
+        return api
+
+    def _key(self, key: str) -> str:
+        # substrateinterface asks for METADATA_<spec_version>
+        return f"metadata_{self._chain_id}_{key.split('_', 1)[-1]}"
+
+    def get(self, key: str, api=None) -> Optional[Any]:
+        """
+        :param str key: key asked by substrateinterface
+        :param SubstrateInterface api: interface whose runtime config decodes metadata read from disk, None for memory
+        """
+        from scalecodec.base import ScaleBytes
+        cache_key = self._key(key)
+        with self._lock:
+            decoded = self._decoded.get(cache_key)
+        if decoded is not None:
+            if metrics.enabled:
+                metrics.inc("subclient_cache_requests_total", cache="metadata", result="hit")
+            logger.debug(f"Metadata {cache_key} from memory")
+            return decoded
+        raw = self._cache.get(cache_key)
+        if metrics.enabled:
+            metrics.inc("subclient_cache_requests_total", cache="metadata", result="miss" if raw is None else "hit")
+        if raw is None or api is None:
+            return None
+        # noinspection PyBroadException
+        try:
+            decoded = api.runtime_config.create_scale_object(self._metadata_type, data=ScaleBytes(raw))
+            decoded.decode()
+        except Exception as e:
+            # Let the interface download it again
+            logger.warning(f"Unable to decode cached metadata {cache_key}: {e}")
+            return None
+        logger.debug(f"Metadata {cache_key} decoded from disk cache")
+        with self._lock:
+            self._decoded[cache_key] = decoded
+        return decoded
+
+    def set(self, key: str, value: Any):
+        cache_key = self._key(key)
+        with self._lock:
+            self._decoded[cache_key] = value
+        # Spec versions never change, no expiration
+        self._cache.set(cache_key, bytes(value.data.data), tag="metadata")
+
+
+class SubstrateMetadataRegion:
+    """
+    Cache region of a single SubstrateInterface, reads and writes the shared SubstrateMetadataCache
+    """
+    cache: SubstrateMetadataCache
+
+    def __init__(self, cache: SubstrateMetadataCache, api) -> None:
+        """
+        :param SubstrateMetadataCache cache: shared metadata cache
+        :param SubstrateInterface api: interface using the region
+        """
+        super().__init__()
+        self.cache = cache
+        self.api = api
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.cache.get(key, api=self.api)
+
+    def set(self, key: str, value: Any):
+        self.cache.set(key, value)
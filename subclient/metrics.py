@@ -0,0 +1,153 @@
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Tuple
+from subclient.profiler import profiler
+
+# Name, type and help of every exported metric
+metric_types = {
+    "subclient_rpc_seconds": ("histogram", "JSON-RPC request latency by method and endpoint"),
+    "subclient_rpc_errors_total": ("counter", "JSON-RPC requests that raised"),
+    "subclient_blocks_total": ("counter", "Blocks decoded, rate gives blocks per second"),
+    "subclient_block_seconds": ("histogram", "Time to fetch and decode a whole block"),
+    "subclient_decode_seconds": ("histogram", "Time spent decoding a single extrinsic by decoder"),
+    "subclient_head_lag_blocks": ("gauge", "Blocks between the last processed one and the finalized head"),
+    "subclient_last_block": ("gauge", "Last processed block"),
+    "subclient_cache_requests_total": ("counter", "Cache lookups by cache and result, hit or miss"),
+    "subclient_reconnects_total": ("counter", "Connections dropped and recreated"),
+}
+
+default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _label_key(name: str, labels: Dict[str, object]) -> _LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = None) -> str:
+    items = [f'{k}="{v}"'.replace("\n", " ") for k, v in labels]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class SubstrateMetrics:
+    """
+    Process wide counters, gauges and histograms rendered in Prometheus text format. Collection is off until enabled,
+    call sites check enabled first so a disabled registry costs a single attribute lookup
+    """
+    enabled: bool = False
+    _counters: Dict[_LabelKey, float]
+    _gauges: Dict[_LabelKey, float]
+    _histograms: Dict[_LabelKey, List]
+
+    def __init__(self, buckets: Tuple[float, ...] = default_buckets) -> None:
+        super().__init__()
+        self._buckets = buckets
+        self._lock = Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _label_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = _label_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(name, labels)
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Bucket counts, sum, count
+                histogram = self._histograms[key] = [[0] * len(self._buckets), 0.0, 0]
+            if index < len(self._buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def get(self, name: str, **labels) -> float:
+        """Current value of a counter or gauge, 0 if never set"""
+        key = _label_key(name, labels)
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0.0))
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+        lines = []
+        for name, (metric_type, description) in metric_types.items():
+            series = counters if metric_type == "counter" else gauges if metric_type == "gauge" else histograms
+            keys = sorted(x for x in series if x[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key in keys:
+                labels = key[1]
+                if metric_type != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(series[key])}")
+                    continue
+                buckets, total, count = series[key]
+                cumulative = 0
+                for bound, bucket_count in zip(self._buckets, buckets):
+                    cumulative += bucket_count
+                    bucket_labels = _format_labels(labels, 'le="%s"' % bound)
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                inf_labels = _format_labels(labels, 'le="+Inf"')
+                lines.append(f"{name}_bucket{inf_labels} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+metrics = SubstrateMetrics()
+
+
+def instrument_api(api, endpoint: str):
+    """
+    Wraps a SubstrateInterface rpc_request so every call is timed by method and endpoint for metrics and the
+    profiler, no op while both are disabled
+    """
+    rpc_request = api.rpc_request
+
+    def _rpc_request(method, params, *args, **kwargs):
+        if profiler.enabled:
+            with profiler.stage(f"rpc:{method}"):
+                return _timed_request(method, params, *args, **kwargs)
+        return _timed_request(method, params, *args, **kwargs)
+
+    def _timed_request(method, params, *args, **kwargs):
+        if not metrics.enabled:
+            return rpc_request(method, params, *args, **kwargs)
+        start = perf_counter()
+        try:
+            return rpc_request(method, params, *args, **kwargs)
+        except Exception:
+            metrics.inc("subclient_rpc_errors_total", method=method, endpoint=endpoint)
+            raise
+        finally:
+            metrics.observe("subclient_rpc_seconds", perf_counter() - start, method=method, endpoint=endpoint)
+
+    api.rpc_request = _rpc_request
+    return api
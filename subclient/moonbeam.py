@@ -1,16 +1,20 @@
-import random
-
 from substrateinterface import KeypairType
 
 from subclient.decoders import SubstrateExtrinsicDecoder
 from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParam
 from subclient.decoders import SubstrateMoonbeamEVMExtrinsicDecoder, SubstrateMoonbeamValidationExtrinsicDecoder
-from subclient import SubstrateEndpoint
+from subclient.decoders import SubstrateMoonbeamEVMLogScanner
+from subclient.extrinsics import SubstrateExtrinsicParamType
+from subclient.endpoint import SubstrateEndpoint
+from subclient.context import SubstrateBlockContext
 from subclient.core import SubstrateClient
-from typing import Optional, List, Dict, Any
+from typing import Callable, Dict, Iterable, Optional, List, TYPE_CHECKING
 from subclient.utils import get_logger, api_call
 from subclient.cache import cache_call
 
+if TYPE_CHECKING:
+    from subclient.livepool import SubstrateLiveCandidatePool
+
 logger = get_logger("moonbeam")
 
 
@@ -109,15 +113,47 @@ class SubstrateStakingCandidate:
         self.total_active = total_active
 
 
+def rank_candidates(pool: List[dict],
+                    selected: List[str],
+                    humanize: Callable[[int], float],
+                    start: int = 0,
+                    end: int = None) -> List[SubstrateStakingCandidate]:
+    """
+    Candidates at positions start to end of a pool of CandidateInfo values sorted by total_counted, ranks follow
+    the position
+    :param list pool: CandidateInfo values with their address as 'id'
+    :param list selected: SelectedCandidates addresses
+    :param humanize: raw amount to token amount
+    :param int start: first position
+    :param int end: last position, included, last of the pool if not provided
+    """
+    end = len(pool) - 1 if end is None else end
+    # Get last in ranking
+    candidate_last = pool[len(selected) - 1]
+    return [SubstrateStakingCandidate(
+        address=x['id'],
+        total_counted=humanize(x['total_counted']),
+        active=x['status'] == "Active",
+        selected=x['id'] in selected,
+        rank=i + 1,
+        rank_last_selected_at=humanize(x['total_counted'] - candidate_last['total_counted']),
+        rank_prev_at=humanize(x['total_counted'] - pool[max(0, i - 1)]['total_counted']),
+        rank_next_at=humanize(x['total_counted'] - pool[min(len(pool) - 1, i + 1)]['total_counted']),
+        total_selected=len(selected),
+        total_active=len(pool),
+    ) for i, x in ((i, pool[i]) for i in range(start, end + 1))]
+
+
 class MoonbeamClient(SubstrateClient):
     _evm_extrinsic_decoder: SubstrateMoonbeamEVMExtrinsicDecoder
     _validation_decoder: SubstrateMoonbeamValidationExtrinsicDecoder = None
+    _evm_log_scanner: SubstrateMoonbeamEVMLogScanner = None
+    _live_candidate_pool: Optional["SubstrateLiveCandidatePool"] = None
 
     def __init__(self, endpoint: SubstrateEndpoint, cache_path: str):
         super().__init__(endpoint, cache_path)
-        rcp_uri = random.choice(endpoint.options["rpc_endpoints"])
-        self._evm_extrinsic_decoder = SubstrateMoonbeamEVMExtrinsicDecoder(rcp_uri)
-        self._validation_decoder = SubstrateMoonbeamValidationExtrinsicDecoder(endpoint)
+        self._evm_extrinsic_decoder = SubstrateMoonbeamEVMExtrinsicDecoder()
+        self._validation_decoder = SubstrateMoonbeamValidationExtrinsicDecoder()
 
     def _get_extrinsic_decoder(self, pallet: str, method: str) -> SubstrateExtrinsicDecoder:
         if pallet == "Ethereum":
@@ -132,7 +168,8 @@ class MoonbeamClient(SubstrateClient):
         return super()._should_decode_extrinsic(pallet, method)
 
     @api_call
-    def _decode_delegator_state(self, data, block_hash) -> SubstrateStakingDelegator:
+    def _decode_delegator_state(self, data, block_hash, scheduled_requests: Dict[str, list] = None) \
+            -> SubstrateStakingDelegator:
         # First create delegator
         delegations = {}
         # Then get all delegations and store by collator
@@ -144,7 +181,10 @@ class MoonbeamClient(SubstrateClient):
             )
             # Get revokes
             cache_key = f"candidate_scheduled_requests_{delegation['owner']}_{block_hash}"
-            requests_data = self._cache.get(cache_key)
+            if scheduled_requests is not None and delegation['owner'] in scheduled_requests:
+                requests_data = scheduled_requests[delegation['owner']]
+            else:
+                requests_data = self._cache.get(cache_key)
             if requests_data is None:
                 try:
                     requests_data = self._api.query(
@@ -168,7 +208,7 @@ class MoonbeamClient(SubstrateClient):
         result.delegations = list(delegations.values())
         return result
 
-    def _on_extrinsic_decoded(self, ex: SubstrateExtrinsic, context: Dict[str, Any]):
+    def _on_extrinsic_decoded(self, ex: SubstrateExtrinsic, context: SubstrateBlockContext):
         super()._on_extrinsic_decoded(ex, context)
         # Delegation revoked, add amount
         amount = None
@@ -190,13 +230,15 @@ class MoonbeamClient(SubstrateClient):
                 skip_cache=True
             )
         if amount:
-            ex.params.append(SubstrateExtrinsicParam.from_amount(amount))
+            ex.add_param(SubstrateExtrinsicParam.from_amount(amount))
         # Add collator info
         candidate_id = ex.get_param("candidate")
         if candidate_id:
-            if "candidate_pool" not in context:
-                context['candidate_pool'] = self.get_candidate_pool(skip_cache=True)
-            candidate = next((x for x in context['candidate_pool'] if x.address.lower() == candidate_id.lower()), None)
+            if self._live_candidate_pool and self._live_candidate_pool.running:
+                candidate = self._live_candidate_pool.get(candidate_id)
+            else:
+                pool = context.get_extra("candidate_pool", lambda: self.get_candidate_pool(skip_cache=True))
+                candidate = next((x for x in pool if x.address.lower() == candidate_id.lower()), None)
             if candidate:
                 ex.add_amount(name="candidateBacking", value=candidate.total_counted)
                 ex.add_generic(name="candidatePoolSize", value=f"{candidate.total_selected}/{candidate.total_active}")
@@ -205,6 +247,33 @@ class MoonbeamClient(SubstrateClient):
                     value=f"{candidate.rank} {'selected' if candidate.selected else 'waiting'}"
                 )
 
+    @property
+    def evm_log_scanner(self) -> SubstrateMoonbeamEVMLogScanner:
+        from random import choice
+        if not self._evm_log_scanner:
+            self._evm_log_scanner = SubstrateMoonbeamEVMLogScanner(choice(self._endpoint.options["rpc_endpoints"]))
+        return self._evm_log_scanner
+
+    def get_evm_logs(self,
+                     start_block: int,
+                     end_block: int,
+                     addresses: List[str] = None,
+                     events: List[str] = None) -> List[SubstrateExtrinsic]:
+        """
+        Decoded EVM logs for a whole block range with a few eth_getLogs calls
+        :param int start_block: first block to look for
+        :param int end_block: last block to look for, included
+        :param list addresses: only logs emitted by these contracts
+        :param list events: "Event" or "Contract.Event" names, all known events if not provided
+        """
+        result = []
+        for ex in self.evm_log_scanner.scan(start_block, end_block, addresses=addresses, events=events):
+            for param in ex.params:
+                if param.param_type == SubstrateExtrinsicParamType.AMOUNT:
+                    param.value = self.token_humanize(param.value)
+            result.append(ex)
+        return result
+
     @property
     def total_inflation(self) -> float:
         return self.total_issuance * 0.05
@@ -300,6 +369,47 @@ class MoonbeamClient(SubstrateClient):
                 self._cache.set(key=cache_key, value=result, expire=3600)
         return result
 
+    def get_delegator_states(self,
+                             addresses: Iterable[str],
+                             block_nr: int = None,
+                             skip_cache: bool = False) -> Dict[str, Optional[SubstrateStakingDelegator]]:
+        """
+        Delegator states of many addresses, the ones not cached are read together with the scheduled requests of
+        their collators, None for addresses not delegating
+        :param addresses: delegator addresses
+        :param int block_nr: read at this block instead of the head, not cached
+        :param bool skip_cache: read all of them again
+        """
+        addresses = [str(x) for x in addresses]
+        result = {}
+        missing = []
+        for address in dict.fromkeys(addresses):
+            cached = None if skip_cache or block_nr else self._cache.get(f"delegator_state_{address}")
+            if cached is None:
+                missing.append(address)
+            else:
+                result[address] = cached
+        if missing:
+            logger.debug(f"get_delegator_states reading {len(missing)} addresses")
+            block_hash = self.get_block_hash(block_nr) if block_nr else None
+            states = dict(zip(missing, self._query_multi('ParachainStaking', 'DelegatorState',
+                                                         [[x] for x in missing], block_hash=block_hash)))
+            # Scheduled requests of every collator at once
+            collators = list(dict.fromkeys(x['owner'] for data in states.values() if data for x in data['delegations']))
+            scheduled = {}
+            if collators:
+                requests = self._query_multi('ParachainStaking', 'DelegationScheduledRequests',
+                                             [[x] for x in collators], block_hash=block_hash)
+                for collator, requests_data in zip(collators, requests):
+                    scheduled[collator] = requests_data if requests_data else []
+                    self._cache.set(f"candidate_scheduled_requests_{collator}_{block_hash}", scheduled[collator],
+                                    expire=300)
+            for address, data in states.items():
+                result[address] = self._decode_delegator_state(data, block_hash, scheduled) if data else None
+                if result[address] and not block_nr:
+                    self._cache.set(key=f"delegator_state_{address}", value=result[address], expire=3600)
+        return {x: result[x] for x in addresses}
+
     @property
     def crypto_type(self) -> KeypairType:
         return KeypairType.ECDSA
@@ -311,6 +421,8 @@ class MoonbeamClient(SubstrateClient):
         return 1.0 / total_staked * self.total_inflation / 2
 
     def get_candidate(self, address: str, round_nr: int = 0, skip_cache=False) -> Optional[SubstrateStakingCandidate]:
+        if round_nr == 0 and self._live_candidate_pool and self._live_candidate_pool.running:
+            return self._live_candidate_pool.get(address)
         pool = self.get_candidate_pool(round_nr=round_nr, skip_cache=skip_cache)
         for candidate in pool:
             if candidate.address.lower() == address.lower():
@@ -348,8 +460,34 @@ class MoonbeamClient(SubstrateClient):
         else:
             return []
 
+    def start_live_candidate_pool(self, timeout: float = 60.0) -> "SubstrateLiveCandidatePool":
+        """
+        Keeps the current candidate pool up to date from a storage subscription, get_candidate_pool, get_candidate
+        and enrichment then read it instead of loading the pool again
+        :param float timeout: seconds to wait for the first notification
+        """
+        if self._live_candidate_pool is None:
+            from subclient.livepool import SubstrateLiveCandidatePool
+            live_pool = SubstrateLiveCandidatePool(self, timeout=timeout)
+            try:
+                live_pool.start()
+            except Exception:
+                live_pool.stop()
+                raise
+            self._live_candidate_pool = live_pool
+        return self._live_candidate_pool
+
+    def close(self):
+        if self._live_candidate_pool:
+            self._live_candidate_pool.stop()
+            self._live_candidate_pool = None
+        super().close()
+
     @api_call
     def get_candidate_pool(self, round_nr: int = 0, skip_cache: bool = False) -> List[SubstrateStakingCandidate]:
+        # Current pool is kept by the subscription
+        if round_nr == 0 and self._live_candidate_pool and self._live_candidate_pool.running:
+            return self._live_candidate_pool.snapshot
         block_hash = None
         # Round has been provided calculate state at a given round
         expire = 300
@@ -382,27 +520,14 @@ class MoonbeamClient(SubstrateClient):
             ).value
             # Sort by amount and rank
             pool.sort(key=lambda x: x['total_counted'], reverse=True)
-            for position, candidate in enumerate(pool, start=1):
-                candidate['rank'] = position
-            # Get last in ranking
-            candidate_last = pool[len(selected) - 1]
-            # To object
-            result = [SubstrateStakingCandidate(
-                address=x['id'],
-                total_counted=self.token_humanize(x['total_counted']),
-                active=x['status'] == "Active",
-                selected=x['id'] in selected,
-                rank=x['rank'],
-                rank_last_selected_at=self.token_humanize(x['total_counted'] - candidate_last['total_counted']),
-                rank_prev_at=self.token_humanize(x['total_counted'] - pool[max(0, i - 1)]['total_counted']),
-                rank_next_at=self.token_humanize(x['total_counted'] - pool[min(len(pool) - 1, i + 1)]['total_counted']),
-                total_selected=len(selected),
-                total_active=len(pool),
-            ) for i, x in enumerate(pool)]
+            result = rank_candidates(pool, selected, self.token_humanize)
             self._cache.set(key=cache_key, value=result, expire=expire)
         return result
 
-    def delegator_bond_more(self, delegator: str, collator: str, amount: float):
+    def delegator_bond_more(self, delegator: str, collator: str, amount: float, wait: bool = True):
+        """
+        :param bool wait: block until included, otherwise return the queued submission
+        """
         call_args = {
             'call_module': 'ParachainStaking',
             'call_function': 'delegator_bond_more',
@@ -412,4 +537,5 @@ class MoonbeamClient(SubstrateClient):
             }
         }
         logger.info(f"DelegatorBondMore: {call_args}")
-        self._execute_proxy_call(address=delegator, call_args=call_args, proxy_type="Staking")
+        result = self._execute_proxy_call(address=delegator, call_args=call_args, proxy_type="Staking", wait=wait)
+        return None if wait else result
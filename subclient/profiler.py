@@ -0,0 +1,201 @@
+from threading import Lock, local, get_ident
+from time import perf_counter, thread_time
+from typing import Callable, Dict, List, Optional
+
+
+class SubstrateProfileRecord:
+    """
+    A finished pipeline stage, times are inclusive so a block stage also counts the RPC calls made inside it
+    """
+    stage: str
+    start: float
+    wall: float
+    cpu: float
+    block: Optional[int]
+    chain: Optional[str]
+    thread: int
+
+    def __init__(self, stage: str, start: float, wall: float, cpu: float, block: Optional[int],
+                 chain: Optional[str], thread: int):
+        self.stage = stage
+        self.start = start
+        self.wall = wall
+        self.cpu = cpu
+        self.block = block
+        self.chain = chain
+        self.thread = thread
+
+    def __str__(self):
+        return f"{self.stage} #{self.block} wall:{self.wall * 1000:.2f}ms cpu:{self.cpu * 1000:.2f}ms"
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_stage = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("_profiler", "_name", "_block", "_chain", "_start", "_cpu", "_previous")
+
+    def __init__(self, profiler: "SubstrateProfiler", name: str, block: int = None, chain: str = None):
+        self._profiler = profiler
+        self._name = name
+        self._block = block
+        self._chain = chain
+
+    def __enter__(self):
+        state = self._profiler._state
+        self._previous = (getattr(state, "block", None), getattr(state, "chain", None))
+        if self._block is not None:
+            state.block, state.chain = self._block, self._chain
+        self._start = perf_counter()
+        self._cpu = thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        wall = perf_counter() - self._start
+        cpu = thread_time() - self._cpu
+        state = self._profiler._state
+        self._profiler._record(SubstrateProfileRecord(
+            stage=self._name,
+            start=self._start,
+            wall=wall,
+            cpu=cpu,
+            block=getattr(state, "block", None),
+            chain=getattr(state, "chain", None),
+            thread=get_ident()
+        ))
+        if self._block is not None:
+            state.block, state.chain = self._previous
+        return False
+
+
+class SubstrateProfiler:
+    """
+    Wall and CPU time per pipeline stage and per RPC method, attributed to the block being processed. Off until
+    enabled, a disabled profiler hands out a shared no op context so call sites stay cheap
+    """
+    enabled: bool = False
+    # Keep every record for a Chrome trace, otherwise only totals are kept
+    trace: bool = False
+    _totals: Dict[str, List[float]]
+    _records: List[SubstrateProfileRecord]
+    _hooks: List[Callable[[SubstrateProfileRecord], None]]
+
+    def __init__(self, max_records: int = 1000000) -> None:
+        """
+        :param int max_records: records kept for the trace, later ones are only counted in totals
+        """
+        super().__init__()
+        self._max_records = max_records
+        self._lock = Lock()
+        self._state = local()
+        self._totals = {}
+        self._blocks = set()
+        self._records = []
+        self._hooks = []
+        self._origin = perf_counter()
+
+    def stage(self, name: str):
+        """
+        Context timing a stage of the block being processed, es: with profiler.stage("decode"): ...
+        """
+        return _Stage(self, name) if self.enabled else _null_stage
+
+    def block(self, number: int, chain: str = None):
+        """
+        Context for a whole block, stages inside it are attributed to the block
+        """
+        return _Stage(self, "block", block=number, chain=chain) if self.enabled else _null_stage
+
+    def add_hook(self, hook: Callable[[SubstrateProfileRecord], None]):
+        """
+        Called with every finished stage, from the thread that ran it
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[SubstrateProfileRecord], None]):
+        self._hooks.remove(hook)
+
+    def _record(self, record: SubstrateProfileRecord):
+        with self._lock:
+            # Calls, wall, cpu
+            totals = self._totals.get(record.stage)
+            if totals is None:
+                totals = self._totals[record.stage] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += record.wall
+            totals[2] += record.cpu
+            if record.block is not None:
+                self._blocks.add((record.chain, record.block))
+            if self.trace and len(self._records) < self._max_records:
+                self._records.append(record)
+        for hook in self._hooks:
+            hook(record)
+
+    @property
+    def blocks(self) -> int:
+        """Distinct blocks seen"""
+        return len(self._blocks)
+
+    def summary(self) -> List[tuple]:
+        """
+        Stage, calls, wall and cpu seconds sorted by wall time
+        """
+        with self._lock:
+            rows = [(k, int(v[0]), v[1], v[2]) for k, v in self._totals.items()]
+        return sorted(rows, key=lambda x: x[2], reverse=True)
+
+    def render_summary(self) -> str:
+        blocks = self.blocks
+        lines = [f"{'stage':<40} {'calls':>8} {'wall s':>10} {'cpu s':>10} {'ms/call':>9} {'ms/block':>9}"]
+        for stage, calls, wall, cpu in self.summary():
+            per_block = f"{wall / blocks * 1000:>9.2f}" if blocks else f"{'-':>9}"
+            lines.append(f"{stage[:40]:<40} {calls:>8} {wall:>10.3f} {cpu:>10.3f} {wall / calls * 1000:>9.2f} "
+                         f"{per_block}")
+        lines.append(f"{blocks} blocks")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path: str):
+        """
+        Writes the kept records as a Chrome trace, open it with chrome://tracing or Perfetto
+        """
+        from json import dump
+        with self._lock:
+            records = list(self._records)
+        events = []
+        for record in records:
+            args = {'cpu_ms': round(record.cpu * 1000, 3)}
+            if record.block is not None:
+                args['block'] = record.block
+            if record.chain:
+                args['chain'] = record.chain
+            events.append({
+                'name': record.stage,
+                'cat': record.stage.split(":", 1)[0],
+                'ph': "X",
+                'ts': (record.start - self._origin) * 1e6,
+                'dur': record.wall * 1e6,
+                'pid': 1,
+                'tid': record.thread,
+                'args': args
+            })
+        with open(path, "w") as f:
+            dump({'traceEvents': events, 'displayTimeUnit': "ms"}, f)
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+            self._blocks.clear()
+            self._records = []
+            self._origin = perf_counter()
+
+
+profiler = SubstrateProfiler()
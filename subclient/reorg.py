@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from subclient.extrinsics import SubstrateExtrinsic
+from subclient.utils import get_logger
+from typing import Callable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from subclient.core import SubstrateBlockHeader
+
+logger = get_logger("reorg")
+
+
+class SubstrateProcessedBlock:
+    """
+    Block processed on the best chain and what was emitted for it
+    """
+    header: "SubstrateBlockHeader"
+    extrinsics: List[SubstrateExtrinsic]
+
+    def __init__(self, header: "SubstrateBlockHeader", extrinsics: List[SubstrateExtrinsic]):
+        self.header = header
+        self.extrinsics = extrinsics
+
+    @property
+    def number(self) -> int:
+        return self.header.number
+
+    @property
+    def hash(self) -> str:
+        return self.header.hash
+
+
+class SubstrateReorgTracker:
+    """
+    Short window of blocks processed from the best head, a block whose parent hash doesn't match the processed block
+    below it means a reorg and the processed blocks no longer on the best chain are handed back as orphaned
+    """
+    _blocks: "OrderedDict[int, SubstrateProcessedBlock]"
+
+    def __init__(self, window: int = 64) -> None:
+        """
+        :param int window: processed blocks remembered, reorgs deeper than this are not detected
+        """
+        super().__init__()
+        self._window = window
+        self._blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def add(self, header: "SubstrateBlockHeader", extrinsics: List[SubstrateExtrinsic]):
+        self._blocks[header.number] = SubstrateProcessedBlock(header, extrinsics)
+        while len(self._blocks) > self._window:
+            self._blocks.popitem(last=False)
+
+    def orphaned(self,
+                 header: "SubstrateBlockHeader",
+                 get_block_hash: Callable[[int], str]) -> List[SubstrateProcessedBlock]:
+        """
+        Processed blocks retracted by the chain the given header is on, oldest first, they are forgotten so their
+        heights can be processed again
+        :param SubstrateBlockHeader header: next block to process
+        :param get_block_hash: best chain hash at a height
+        """
+        previous = self._blocks.get(header.number - 1)
+        if previous is None or previous.hash == header.parent_hash:
+            return []
+        # Walk back to the fork point, the block under it is still on the best chain
+        result = [x for x in self._blocks.values() if x.number >= header.number]
+        number = header.number - 1
+        while number in self._blocks and self._blocks[number].hash != get_block_hash(number):
+            result.append(self._blocks[number])
+            number -= 1
+        result.sort(key=lambda x: x.number)
+        for block in result:
+            del self._blocks[block.number]
+        if result:
+            logger.warning(f"Reorg at #{result[0].number}, {len(result)} processed blocks retracted")
+        return result
@@ -0,0 +1,219 @@
+import re
+from collections import Counter
+from subclient.extrinsics import SubstrateExtrinsic
+from subclient.utils import get_logger
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = get_logger("rules")
+
+
+class SubstrateWatchRule:
+    """
+    Named watch rule, every predicate given has to match: one of the addresses or the address pattern, the method
+    pattern and the min amount. Matches are routed to output, the default output if not provided
+    """
+    name: str
+    addresses: Set[str]
+    address_pattern: Optional[str] = None
+    method_pattern: Optional[str] = None
+    min_amount: Optional[float] = None
+    output: Optional[str] = None
+
+    def __init__(self,
+                 name: str,
+                 addresses: Iterable[str] = None,
+                 address_pattern: str = None,
+                 method_pattern: str = None,
+                 min_amount: float = None,
+                 output: str = None) -> None:
+        super().__init__()
+        self.name = name
+        self.addresses = set(x.lower() for x in addresses) if addresses else set()
+        self.address_pattern = address_pattern
+        self.method_pattern = method_pattern
+        self.min_amount = min_amount
+        self.output = output
+
+    def __str__(self) -> str:
+        return f"{self.name}[addresses:{len(self.addresses)},address:{self.address_pattern}," \
+               f"method:{self.method_pattern},amount:{self.min_amount},output:{self.output}]"
+
+    @property
+    def has_address(self) -> bool:
+        return bool(self.addresses) or bool(self.address_pattern)
+
+    def match_amount(self, extrinsic: SubstrateExtrinsic) -> bool:
+        return not self.min_amount or extrinsic.amount == 0 or extrinsic.amount > self.min_amount
+
+    @staticmethod
+    def from_dict(data: dict) -> "SubstrateWatchRule":
+        return SubstrateWatchRule(
+            name=data['name'],
+            addresses=data.get('addresses'),
+            address_pattern=data.get('address'),
+            method_pattern=data.get('method'),
+            min_amount=data.get('min_amount'),
+            output=data.get('output')
+        )
+
+
+class _RulePatterns:
+    """
+    Patterns of many rules. Literal patterns are found by looking up every substring of the value with a literal
+    length, so their cost does not grow with their number, other patterns are searched one by one
+    """
+
+    def __init__(self, patterns: Dict[str, List[int]], rules: List[SubstrateWatchRule], flags: int = 0) -> None:
+        """
+        :param dict patterns: rule indexes by pattern
+        :param list rules: rules the indexes refer to, named in errors
+        :param int flags: regex flags of every pattern
+        """
+        self._ignore_case = bool(flags & re.IGNORECASE)
+        self._literals: Dict[str, List[int]] = {}
+        self._regexes: List[Tuple[re.Pattern, List[int]]] = []
+        for pattern, indexes in patterns.items():
+            try:
+                compiled = re.compile(pattern, flags)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern {pattern} in rule {rules[indexes[0]].name}: {e}") from e
+            if re.escape(pattern) == pattern:
+                key = pattern.lower() if self._ignore_case else pattern
+                self._literals.setdefault(key, []).extend(indexes)
+            else:
+                self._regexes.append((compiled, indexes))
+        self._lengths = sorted(set(len(x) for x in self._literals))
+
+    def __len__(self):
+        return len(self._literals) + len(self._regexes)
+
+    def match(self, value: str, result: Set[int]):
+        """Adds the indexes of the rules with a pattern found in value to result"""
+        if self._literals:
+            text = value.lower() if self._ignore_case else value
+            for length in self._lengths:
+                for start in range(len(text) - length + 1):
+                    indexes = self._literals.get(text[start:start + length])
+                    if indexes:
+                        result.update(indexes)
+        for regex, indexes in self._regexes:
+            if regex.search(value):
+                result.update(indexes)
+
+
+class SubstrateWatchRuleSet:
+    """
+    Many rules matched together: exact addresses are looked up in a hash map, literal address and method patterns are
+    looked up by substring, other patterns searched one by one. Works as a SubstrateExtrinsicFilter matching when any
+    rule does, an empty set matches nothing
+    """
+    rules: List[SubstrateWatchRule]
+    match_all: bool = True
+    min_amount: Optional[float] = None
+
+    def __init__(self, rules: Iterable[SubstrateWatchRule]) -> None:
+        super().__init__()
+        self.rules = list(rules)
+        names = [x.name for x in self.rules]
+        duplicated = sorted(x for x, count in Counter(names).items() if count > 1)
+        if duplicated:
+            raise ValueError(f"Duplicated rule names {duplicated}")
+        self._by_address: Dict[str, List[int]] = {}
+        self._any_address: List[int] = []
+        address_patterns: Dict[str, List[int]] = {}
+        method_patterns: Dict[str, List[int]] = {}
+        for index, rule in enumerate(self.rules):
+            for address in rule.addresses:
+                self._by_address.setdefault(address, []).append(index)
+            if rule.address_pattern:
+                address_patterns.setdefault(rule.address_pattern.lower(), []).append(index)
+            if not rule.has_address:
+                self._any_address.append(index)
+            if rule.method_pattern:
+                method_patterns.setdefault(rule.method_pattern, []).append(index)
+        self._any_method = any(not x.method_pattern for x in self.rules)
+        self._address_patterns = _RulePatterns(address_patterns, self.rules)
+        self._method_patterns = _RulePatterns(method_patterns, self.rules, re.IGNORECASE)
+        logger.debug(f"Compiled {len(self.rules)} rules, {len(self._by_address)} addresses, "
+                     f"{len(self._address_patterns)} address and {len(self._method_patterns)} method patterns")
+
+    def __str__(self) -> str:
+        return f"[rules:{len(self.rules)}]"
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def outputs(self) -> Set[Optional[str]]:
+        return set(x.output for x in self.rules)
+
+    @property
+    def is_flood_filter(self) -> bool:
+        """True if a rule has no predicate at all"""
+        return any(not x.has_address and not x.method_pattern and not x.min_amount for x in self.rules)
+
+    @property
+    def can_push_down(self) -> bool:
+        # Method and address predicates are true when some rule could still match
+        return True
+
+    def _address_matches(self, extrinsic: SubstrateExtrinsic) -> Set[int]:
+        result = set(self._any_address)
+        for param in extrinsic.params:
+            value = param.text.lower()
+            if not value.startswith("0x"):
+                continue
+            result.update(self._by_address.get(value, ()))
+            self._address_patterns.match(value, result)
+        return result
+
+    def match_method(self, method: str) -> bool:
+        if self._any_method:
+            return True
+        methods = set()
+        self._method_patterns.match(method, methods)
+        return bool(methods)
+
+    def _candidates(self, extrinsic: SubstrateExtrinsic) -> List[int]:
+        # Rules matching address and method, amounts are only final once the extrinsic is enriched
+        candidates = self._address_matches(extrinsic)
+        if not candidates:
+            return []
+        methods = set()
+        self._method_patterns.match(extrinsic.method, methods)
+        return [x for x in sorted(candidates) if not self.rules[x].method_pattern or x in methods]
+
+    def match_address(self, extrinsic: SubstrateExtrinsic) -> bool:
+        """
+        True if a single rule matches both address and method, stricter than checking them apart
+        """
+        return bool(self._candidates(extrinsic))
+
+    def matching(self, extrinsic: SubstrateExtrinsic) -> List[SubstrateWatchRule]:
+        """
+        Rules matching the extrinsic, in rule order
+        """
+        return [self.rules[x] for x in self._candidates(extrinsic) if self.rules[x].match_amount(extrinsic)]
+
+    def match(self, extrinsic: SubstrateExtrinsic) -> bool:
+        return bool(self.matching(extrinsic))
+
+    def route(self, extrinsic: SubstrateExtrinsic) -> Set[Optional[str]]:
+        """
+        Outputs of the rules matching the extrinsic, None for the default one
+        """
+        return set(x.output for x in self.matching(extrinsic))
+
+
+def load_rules(path: str) -> SubstrateWatchRuleSet:
+    """
+    Loads rules from a JSON file, a list of rules or an object with a "rules" list, es:
+    [{"name": "whales", "addresses": ["0x..."], "method": "transfer", "min_amount": 1000, "output": "whales.ndjson"}]
+    """
+    import json
+    with open(path) as f:
+        data = json.load(f)
+    rules = data['rules'] if isinstance(data, dict) else data
+    if not rules:
+        raise ValueError(f"No rules in {path}")
+    return SubstrateWatchRuleSet(SubstrateWatchRule.from_dict(x) for x in rules)
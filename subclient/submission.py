@@ -0,0 +1,268 @@
+from substrateinterface import SubstrateInterface, Keypair, ExtrinsicReceipt
+from substrateinterface.exceptions import SubstrateRequestException
+from subclient.utils import get_logger
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Dict, Optional, Callable, List
+from websocket import WebSocketException
+
+logger = get_logger("submission")
+
+
+class SubstrateSubmission:
+    """
+    Extrinsic submitted without waiting, included and finalized futures resolve to the submission itself
+    """
+    address: str
+    nonce: int
+    extrinsic_hash: str
+    submitted_at: int
+    block_hash: Optional[str] = None
+    block_number: Optional[int] = None
+    extrinsic_idx: Optional[int] = None
+    success: Optional[bool] = None
+    error_message: Optional[dict] = None
+    fee: int = 0
+    included: Future
+    finalized: Future
+
+    def __init__(self, address: str, nonce: int, extrinsic_hash: str, submitted_at: int):
+        self.address = address
+        self.nonce = nonce
+        self.extrinsic_hash = extrinsic_hash
+        self.submitted_at = submitted_at
+        self.included = Future()
+        self.finalized = Future()
+
+    def __str__(self):
+        return f"{self.extrinsic_hash} from:{self.address} nonce:{self.nonce} block:{self.block_number} " \
+               f"success:{self.success}"
+
+
+def _on_success(callback: Callable[[SubstrateSubmission], None], submission: SubstrateSubmission):
+    return lambda f: callback(submission) if f.exception() is None else None
+
+
+class SubstrateSubmissionQueue:
+    """
+    Signs and submits extrinsics without waiting for inclusion, nonces are assigned locally per signer so many
+    extrinsics can be pushed in the same block. A background thread follows the best chain to resolve inclusion and
+    the finalized chain to resolve finality, callbacks are run from that thread
+    """
+    _endpoint = None
+    _lock: Lock
+    _api_instance: SubstrateInterface = None
+    _tracker_api: SubstrateInterface = None
+    _tracker: Optional[Thread] = None
+    _nonces: Dict[str, int]
+    _pending: Dict[str, SubstrateSubmission]
+    _included: Dict[str, SubstrateSubmission]
+    _last_block: Optional[int] = None
+
+    # We cannot reference Endpoint type due to an issue in circular import
+    def __init__(self, endpoint, poll_interval: float = 2.0, mortality: int = 64, metadata_cache=None) -> None:
+        """
+        :param endpoint: the endpoint to connect to
+        :param float poll_interval: seconds between head checks while tracking submissions
+        :param int mortality: blocks a submitted extrinsic stays valid, after that it is considered dropped
+        :param metadata_cache: optional SubstrateMetadataCache shared with the client connection
+        """
+        super().__init__()
+        self._endpoint = endpoint
+        self._poll_interval = poll_interval
+        self._mortality = mortality
+        self._metadata_cache = metadata_cache
+        self._lock = Lock()
+        self._nonces = {}
+        self._pending = {}
+        self._included = {}
+
+    def _connect(self) -> SubstrateInterface:
+        from subclient.metrics import instrument_api
+        url = self._endpoint.random_wss_uri
+        api = instrument_api(SubstrateInterface(url=url), url)
+        return self._metadata_cache.attach(api) if self._metadata_cache else api
+
+    @property
+    def _api(self) -> SubstrateInterface:
+        if not self._api_instance:
+            self._api_instance = self._connect()
+        return self._api_instance
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _next_nonce(self, address: str) -> int:
+        if address not in self._nonces:
+            # Account next index includes transactions already in the pool
+            self._nonces[address] = int(self._api.rpc_request('system_accountNextIndex', [address])['result'])
+        nonce = self._nonces[address]
+        self._nonces[address] = nonce + 1
+        return nonce
+
+    def reset_nonce(self, address: str):
+        """
+        Forget the local nonce for an address, next submission will read it again from the node
+        """
+        with self._lock:
+            self._nonces.pop(address, None)
+
+    def submit(self,
+               call,
+               keypair: Keypair,
+               on_included: Callable[[SubstrateSubmission], None] = None,
+               on_finalized: Callable[[SubstrateSubmission], None] = None) -> SubstrateSubmission:
+        """
+        :param call: the composed call to sign
+        :param Keypair keypair: the signer
+        :param on_included: called with the submission once included in a block
+        :param on_finalized: called with the submission once its block is finalized
+        """
+        address = keypair.ss58_address
+        with self._lock:
+            try:
+                nonce = self._next_nonce(address)
+                extrinsic = self._api.create_signed_extrinsic(
+                    call=call,
+                    keypair=keypair,
+                    nonce=nonce,
+                    era={'period': self._mortality}
+                )
+                extrinsic_hash = self._api.submit_extrinsic(extrinsic, wait_for_inclusion=False).extrinsic_hash
+                submitted_at = self._api.get_block_header()['header']['number']
+            except (SubstrateRequestException, OSError, WebSocketException):
+                # Nonce might be out of sync or the connection is gone, start again from the node
+                self._nonces.pop(address, None)
+                self._api_instance = None
+                raise
+            submission = SubstrateSubmission(
+                address=address,
+                nonce=nonce,
+                extrinsic_hash=extrinsic_hash,
+                submitted_at=submitted_at
+            )
+            # Dropped submissions resolve with an error and are not reported as included or finalized
+            if on_included:
+                submission.included.add_done_callback(_on_success(on_included, submission))
+            if on_finalized:
+                submission.finalized.add_done_callback(_on_success(on_finalized, submission))
+            self._pending[extrinsic_hash] = submission
+            if self._last_block is None or self._last_block >= submitted_at:
+                self._last_block = submitted_at - 1
+            if not self._tracker:
+                self._tracker = Thread(target=self._track, name="substrate-submission-tracker", daemon=True)
+                self._tracker.start()
+        logger.info(f"Submitted {submission}")
+        return submission
+
+    def wait(self, timeout: float = None) -> List[SubstrateSubmission]:
+        """
+        Blocks until all pending submissions are included or dropped
+        """
+        from concurrent.futures import wait
+        with self._lock:
+            futures = [x.included for x in self._pending.values()]
+        wait(futures, timeout=timeout)
+        return [x.result() for x in futures if x.done() and not x.exception()]
+
+    def _track(self):
+        from time import sleep
+        while True:
+            with self._lock:
+                if not self._pending and not self._included:
+                    self._tracker = None
+                    return
+            # noinspection PyBroadException
+            try:
+                if not self._tracker_api:
+                    self._tracker_api = self._connect()
+                self._track_inclusion()
+                self._track_finality()
+            except Exception as e:
+                logger.warning(f"Submission tracker failed {e} retrying")
+                self._tracker_api = None
+            sleep(self._poll_interval)
+
+    def _track_inclusion(self):
+        api = self._tracker_api
+        head = api.get_block_header()['header']['number']
+        while True:
+            with self._lock:
+                block_nr = self._last_block + 1
+            if block_nr > head:
+                break
+            block_hash = api.get_block_hash(block_nr)
+            extrinsics = api.get_block(block_hash=block_hash)['extrinsics']
+            for index, extrinsic in enumerate(extrinsics):
+                with self._lock:
+                    submission = self._pending.pop(extrinsic.value.get('extrinsic_hash'), None)
+                if submission:
+                    self._on_included(submission, block_nr, block_hash, index)
+            # A new submission or a retraction might have moved the scan back meanwhile
+            with self._lock:
+                if self._last_block == block_nr - 1:
+                    self._last_block = block_nr
+        # Anything older than its mortality will never make it
+        with self._lock:
+            dropped = [x for x in self._pending.values() if x.submitted_at + self._mortality < head]
+            for submission in dropped:
+                del self._pending[submission.extrinsic_hash]
+                self._nonces.pop(submission.address, None)
+        for submission in dropped:
+            logger.warning(f"Submission dropped {submission}")
+            error = TimeoutError(f"Extrinsic {submission.extrinsic_hash} not included in {self._mortality} blocks")
+            # Retracted submissions were already included once
+            if not submission.included.done():
+                submission.included.set_exception(error)
+            submission.finalized.set_exception(error)
+
+    def _on_included(self, submission: SubstrateSubmission, block_nr: int, block_hash: str, index: int):
+        receipt = ExtrinsicReceipt(
+            substrate=self._tracker_api,
+            extrinsic_hash=submission.extrinsic_hash,
+            block_hash=block_hash,
+            block_number=block_nr,
+            extrinsic_idx=index
+        )
+        submission.block_hash = block_hash
+        submission.block_number = block_nr
+        submission.extrinsic_idx = index
+        submission.success = receipt.is_success
+        submission.error_message = receipt.error_message
+        submission.fee = receipt.total_fee_amount
+        with self._lock:
+            self._included[submission.extrinsic_hash] = submission
+        logger.info(f"Included {submission}")
+        if not submission.included.done():
+            submission.included.set_result(submission)
+
+    def _track_finality(self):
+        api = self._tracker_api
+        finalized_nr = api.get_block_number(api.get_chain_finalised_head())
+        with self._lock:
+            candidates = [x for x in self._included.values() if x.block_number <= finalized_nr]
+        for submission in candidates:
+            canonical_hash = api.get_block_hash(submission.block_number)
+            with self._lock:
+                del self._included[submission.extrinsic_hash]
+                # Block got retracted, look for it again from there
+                if canonical_hash != submission.block_hash:
+                    logger.warning(f"Block {submission.block_hash} retracted, tracking again {submission}")
+                    # Included stays resolved with the retracted block, finalized resolves once included again
+                    # or with an error when dropped
+                    self._pending[submission.extrinsic_hash] = submission
+                    self._last_block = min(self._last_block, submission.block_number - 1)
+                    continue
+            logger.info(f"Finalized {submission}")
+            submission.finalized.set_result(submission)
+
+    def close(self):
+        for api in (self._api_instance, self._tracker_api):
+            # noinspection PyBroadException
+            try:
+                if api:
+                    api.close()
+            except Exception as e:
+                logger.warning(f"Unable to close connection {e}")
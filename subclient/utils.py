@@ -1,6 +1,7 @@
 from functools import wraps
 from json import JSONDecodeError
 from websocket import WebSocketException
+from subclient.metrics import metrics
 
 
 def get_logger(name: str):
@@ -28,6 +29,8 @@ def api_call(func):
             import traceback
             # traceback.print_exc()
             logger.warning(f"#### Endpoing disconnected {e} retrying")
+            if metrics.enabled:
+                metrics.inc("subclient_reconnects_total", function=func.__name__)
             # Close websocket
             # Clear instance so its recreated
             if hasattr(args[0], "_api_instance"):
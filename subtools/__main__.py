@@ -1,18 +1,32 @@
 from subclient import setup_logging
-from subtools.cli import Cli
+from subtools.cli import Cli, run_profiled
 from subtools import __app__
 from subclient import get_endpoint_ids
 import logging
 
 
+def chain_list(value: str) -> str:
+    import argparse
+    for chain in value.split(","):
+        if chain not in get_endpoint_ids():
+            raise argparse.ArgumentTypeError(f"invalid chain {chain} (choose from {', '.join(get_endpoint_ids())})")
+    return value
+
+
 # noinspection DuplicatedCode
 def get_parser():
     import argparse
     parser = argparse.ArgumentParser(prog=__app__)
-    parser.add_argument("chain", choices=get_endpoint_ids(), help="chain to use")
+    parser.add_argument("chain", type=chain_list, help=f"chain to use, event-watch also accepts a comma separated "
+                                                       f"list: {','.join(get_endpoint_ids())}")
     parser.add_argument("--debug", action="store_true")
     parser.add_argument("--cache-path", help="cache path", default="/tmp/cache")
     parser.add_argument("--no-cache", action="store_true", help="disable cache entirely")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port", default=None)
+    parser.add_argument("--from-archive", help="read blocks from a local archive instead of the node", default=None)
+    parser.add_argument("--archive-fallback", action="store_true", help="ask the node for reads not in the archive")
+    parser.add_argument("--profile", action="store_true", help="print wall and cpu time per pipeline stage at exit")
+    parser.add_argument("--profile-output", help="write a Chrome trace (.json) or cProfile stats (.pstats)")
     actions = parser.add_subparsers(help='action', dest='action', required=True)
     # Block dumper
     block = actions.add_parser('block', help='dump block or round info as json')
@@ -24,9 +38,46 @@ def get_parser():
     watch.add_argument('--min-amount', '-m', type=int, help='filter events with an amount lower')
     watch.add_argument('--tail', '-f', action="store_true", help="poll and keep watching for events")
     watch.add_argument('--count', '-c', type=int, help='how many blocks to look back', default=300)
-    watch.add_argument('--format', help='output format', default='text', choices=['text', 'json'])
+    watch.add_argument('--format', help='output format, json is written as NDJSON', default='text',
+                       choices=['text', 'json', 'ndjson', 'csv'])
+    watch.add_argument('--output', '-o', help='output file, default stdout', default=None)
+    watch.add_argument('--rotate-size', type=int, help='start a new output file part every N MB', default=0)
+    watch.add_argument('--checkpoint', help='checkpoint name or file, resume after the last processed block')
+    watch.add_argument('--dedupe', action="store_true", help="skip events already written before a restart")
+    watch.add_argument('--evm-logs', action="store_true", help="also scan EVM logs (ERC20 transfers, approvals)")
+    watch.add_argument('--rules', help='JSON file of named watch rules, each one optionally with its own output')
+    watch.add_argument('--best-head', action="store_true",
+                       help="follow the best head instead of the finalized one, reorged events are retracted")
+    # Columnar export
+    export = actions.add_parser('export', help='export decoded extrinsics of a block range to a columnar file')
+    export.add_argument('--start', '-s', type=int, required=True, help='first block')
+    export.add_argument('--end', '-e', type=int, help='last block, default last')
+    export.add_argument('--output', '-o', required=True, help='output file')
+    export.add_argument('--format', default='parquet', choices=['parquet', 'npz'])
+    export.add_argument('--address', '-a', help='filter by name or address regexp')
+    export.add_argument('--method', '-m', help='filter method name or id with a regular expression', default=None)
+    export.add_argument('--row-group-size', type=int, default=65536, help='rows per row group')
+    export.add_argument('--processes', '-p', type=int, default=0,
+                        help='decode blocks in this many processes, 0 to decode in the main one')
+    archive = actions.add_parser('archive', help='store a block range in a local archive for offline decoding')
+    archive.add_argument('--start', '-s', type=int, required=True, help='first block')
+    archive.add_argument('--end', '-e', type=int, help='last block, default last')
+    archive.add_argument('--output', '-o', required=True, help='archive directory')
     # Done
-    return parser.parse_args()
+    args = parser.parse_args()
+    if "," in args.chain and (args.action != "event-watch" or args.from_archive):
+        parser.error("several chains can only be used with event-watch on live nodes")
+    if getattr(args, "best_head", False) and (args.evm_logs or args.from_archive):
+        parser.error("--best-head can't be used with --evm-logs or --from-archive")
+    if getattr(args, "rules", None) and (args.address or args.method or args.min_amount):
+        parser.error("--rules can't be used with --address, --method or --min-amount")
+    if args.action == "export":
+        from subclient.export import missing_export_requirement
+        missing = missing_export_requirement(args.format)
+        if missing:
+            parser.error(f"--format {args.format} needs {missing}, install it with "
+                         f"pip install substrate-cli-tools[export]")
+    return args
 
 
 if __name__ == "__main__":
@@ -34,6 +85,14 @@ if __name__ == "__main__":
     setup_logging(__app__, logging.DEBUG if args.pop('debug') else logging.INFO)
     cli = Cli(
         chain=args.pop('chain'),
-        cache_path=None if args.pop('no_cache') else args.pop('cache_path')
+        cache_path=None if args.pop('no_cache') else args.pop('cache_path'),
+        metrics_port=args.pop('metrics_port'),
+        archive_path=args.pop('from_archive'),
+        archive_fallback=args.pop('archive_fallback')
     )
-    getattr(cli, args.pop('action').replace("-", "_"))(**args)
+    action = getattr(cli, args.pop('action').replace("-", "_"))
+    profile, profile_output = args.pop('profile'), args.pop('profile_output')
+    if profile or profile_output:
+        run_profiled(lambda: action(**args), output=profile_output)
+    else:
+        action(**args)
@@ -1,14 +1,16 @@
 import os
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from subclient import get_client
-from subclient.core import SubstrateClient, SubstrateExtrinsic
 from subtools import get_logger
 
+if TYPE_CHECKING:
+    from subclient.core import SubstrateClient, SubstrateExtrinsic
+
 logger = get_logger("cli")
 
 
-def chain_extrinsic_to_text(client: SubstrateClient, extrinsic: SubstrateExtrinsic):
+def chain_extrinsic_to_text(client: "SubstrateClient", extrinsic: "SubstrateExtrinsic"):
     msg = f'#{extrinsic.id}:{extrinsic.ex_type}:{extrinsic.method}('
     params = []
     for param in extrinsic.params:
@@ -17,7 +19,7 @@ def chain_extrinsic_to_text(client: SubstrateClient, extrinsic: SubstrateExtrins
         elif param.is_address:
             value = str(client.get_identity(param.value))
         else:
-            value = param.value
+            value = param.text
         params.append(f'{param.name}="{value}"')
     msg += ",".join(params)
     return msg + ")"
@@ -42,15 +44,100 @@ def handler_from(directory):
                 {'__init__': _init, 'directory': directory})
 
 
+def metrics_handler():
+    import http.server
+    from subclient.metrics import metrics
+
+    class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, *args):
+            a = list(args)
+            a.pop()
+            # Scraped every few seconds, keep it out of the info log
+            logger.debug(" - ".join([str(x) for x in a]))
+
+        # noinspection PyPep8Naming
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return MetricsRequestHandler
+
+
+def serve_metrics(port: int):
+    """
+    Enables metrics collection and serves them in Prometheus format from a background thread
+    """
+    import http.server
+    from threading import Thread
+    from subclient.metrics import metrics
+    metrics.enabled = True
+    server = http.server.ThreadingHTTPServer(("", port), metrics_handler())
+    Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on port {port}")
+    return server
+
+
+def run_profiled(func, output: Optional[str] = None):
+    """
+    Runs func with the stage profiler on and prints a stage summary at exit, even when interrupted
+    :param func: callable to run
+    :param str output: also write a Chrome trace (.json) or cProfile stats (any other extension) to this file
+    """
+    import sys
+    from subclient.profiler import profiler
+    profile = None
+    profiler.enabled = True
+    profiler.trace = bool(output) and output.endswith(".json")
+    if output and not profiler.trace:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        return func()
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(output)
+        elif profiler.trace:
+            profiler.write_chrome_trace(output)
+        profiler.enabled = False
+        print(profiler.render_summary(), file=sys.stderr)
+        if output:
+            logger.info(f"Profile written to {output}")
+
+
 class Cli:
 
-    def __init__(self, chain: str, cache_path: str):
+    def __init__(self,
+                 chain: str,
+                 cache_path: str,
+                 metrics_port: Optional[int] = None,
+                 archive_path: Optional[str] = None,
+                 archive_fallback: bool = False):
         # Init cache
         self.cache_path = cache_path
         if not os.path.exists(cache_path):
             os.mkdir(cache_path)
-        # Init chain client
-        self.chain = chain
+        # Init chain client, several comma separated chains can be watched together
+        self.chains = chain.split(",")
+        self.chain = self.chains[0]
+        self.archive_path = archive_path
+        self.archive_fallback = archive_fallback
+        if metrics_port:
+            serve_metrics(metrics_port)
+
+    def _get_client(self, chain: Optional[str] = None):
+        return get_client(chain_id=chain if chain else self.chain, cache_path=self.cache_path,
+                          archive_path=self.archive_path, archive_fallback=self.archive_fallback)
 
     def block(self, block: Optional[int]):
         """
@@ -60,7 +147,7 @@ class Cli:
         from humanize import precisedelta
         from datetime import datetime, timedelta
         from json import dumps
-        client = get_client(chain_id=self.chain, cache_path=self.cache_path)
+        client = self._get_client()
         last_block = client.last_block_number
         # Calculate block
         if not block:
@@ -77,43 +164,191 @@ class Cli:
         print(dumps(result, indent=2))
 
     # noinspection SpellCheckingInspection
-    def event_watch(self, address: str, method: str, min_amount: int, tail: bool, count: int, format: str):
+    def _get_checkpoint_path(self, name: str, chain: Optional[str] = None) -> str:
+        # Plain names live in the cache folder, anything looking like a path is used as is
+        chain = chain if chain else self.chain
+        if os.sep in name or name.endswith(".json") or not self.cache_path:
+            if len(self.chains) == 1:
+                return name
+            # One checkpoint per chain next to the given file
+            root, ext = os.path.splitext(name)
+            return f"{root}_{chain}{ext}"
+        return os.path.join(self.cache_path, "checkpoints", f"{chain}_{name}.json")
+
+    def event_watch(self,
+                    address: str,
+                    method: str,
+                    min_amount: int,
+                    tail: bool,
+                    count: int,
+                    format: str,
+                    evm_logs: bool = False,
+                    output: Optional[str] = None,
+                    rotate_size: int = 0,
+                    checkpoint: Optional[str] = None,
+                    dedupe: bool = False,
+                    best_head: bool = False,
+                    rules: Optional[str] = None):
         """
         :param str address: address to look for
         :param str method: method to look for
         :param int min_amount: min amount for transaction
         :param bool tail: keep watching and poll
         :param int count: how many blocks to look back
+        :param str format: text, json/ndjson or csv
+        :param bool evm_logs: also scan the whole range for EVM logs
+        :param str output: output file, stdout if not provided
+        :param int rotate_size: rotate output file after this many MB, 0 to disable
+        :param str checkpoint: checkpoint name or file, scan resumes after the last processed block
+        :param bool dedupe: skip extrinsics already written before a restart
+        :param bool best_head: follow the best head instead of the finalized one, reorgs retract what was written
+        :param str rules: JSON rules file, used instead of address, method and min_amount, matches go to the output
+                          of their rules
+        """
+        from subclient.checkpoint import SubstrateCheckpoint
+        from subclient.extrinsics import SubstrateExtrinsicFilter
+        from subtools.sinks import RoutedOutputSink, get_sink
+        from subtools.watcher import ChainWatcher
+        from threading import Event, Lock, Thread
+        if rules:
+            from subclient.rules import load_rules
+            ex_filter = load_rules(rules)
+            logger.info(f"Loaded {len(ex_filter)} watch rules from {rules}")
+        else:
+            ex_filter = SubstrateExtrinsicFilter()
+            ex_filter.address_pattern = address.strip() if address else None
+            ex_filter.min_amount = min_amount if min_amount else 0
+            ex_filter.method_pattern = method.strip() if method else None
+        # Every chain has its own client and pipeline, output and checkpoints are shared
+        clients = {chain: self._get_client(chain) for chain in self.chains}
+        # Tailing enriches every staking event, keep the candidate pool current instead of loading it again
+        if tail and not self.archive_path:
+            for chain, client in clients.items():
+                if hasattr(client, "start_live_candidate_pool"):
+                    # noinspection PyBroadException
+                    try:
+                        client.start_live_candidate_pool()
+                    except Exception as e:
+                        logger.warning(f"{chain} live candidate pool not available, loading it on demand: {e}")
+        checkpoints = {}
+        if checkpoint:
+            for chain in self.chains:
+                checkpoints[chain] = SubstrateCheckpoint(self._get_checkpoint_path(checkpoint, chain))
+        on_flush = (lambda: [x.save() for x in checkpoints.values()]) if checkpoints else None
+        # Rules with their own output get their own sink, the checkpoint is saved once all of them are flushed
+        outputs = set(x for x in ex_filter.outputs if x) if rules else set()
+        sinks = {target: get_sink(
+            format=format,
+            formatter=lambda x, chain: chain_extrinsic_to_text(clients[chain if chain else self.chain], x),
+            path=output if target is None else target,
+            rotate_size=rotate_size * 1024 * 1024 if rotate_size else 0,
+            append=bool(checkpoints),
+            on_flush=None if outputs else on_flush,
+            tag_chain=len(self.chains) > 1,
+            tag_retracted=best_head
+        ) for target in [None] + sorted(outputs)}
+        sink = RoutedOutputSink(sinks, route=ex_filter.route, on_flush=on_flush) if outputs else sinks[None]
+        lock = Lock()
+        stop = Event()
+        watchers = {chain: ChainWatcher(
+            chain=chain,
+            client=client,
+            sink=sink,
+            ex_filter=ex_filter,
+            checkpoint=checkpoints.get(chain),
+            lock=lock,
+            stop=stop,
+            tag=chain if len(self.chains) > 1 else None,
+            evm_logs=evm_logs,
+            dedupe=dedupe,
+            tail=tail,
+            resolve_identities=format == "text",
+            best_head=best_head
+        ) for chain, client in clients.items()}
+        start_blocks = {chain: watcher.resume(
+            (watcher.client.best_block_number if best_head else watcher.client.last_block_number) - count
+        ) for chain, watcher in watchers.items()}
+
+        def watch(chain: str):
+            if watchers[chain].best_head:
+                watchers[chain].watch_best_head(start_blocks[chain])
+            else:
+                watchers[chain].watch_finalized(start_blocks[chain])
+
+        def run(chain: str):
+            # noinspection PyBroadException
+            try:
+                watch(chain)
+            except Exception:
+                logger.exception(f"{chain} watcher stopped")
+
+        with sink:
+            if len(self.chains) == 1:
+                watch(self.chain)
+                return
+            threads = [Thread(target=run, args=(x,), name=f"watch-{x}", daemon=True) for x in self.chains]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(0.5)
+            finally:
+                stop.set()
+                with lock:
+                    sink.flush()
+
+    def export(self,
+               start: int,
+               end: Optional[int],
+               output: str,
+               format: str,
+               address: Optional[str],
+               method: Optional[str],
+               row_group_size: int,
+               processes: int = 0):
+        """
+        :param int start: first block
+        :param int end: last block, last finalized if not provided
+        :param str output: output file
+        :param str format: parquet or npz
+        :param str address: address to look for
+        :param str method: method to look for
+        :param int row_group_size: rows per row group
+        :param int processes: decode blocks in this many processes, 0 to decode in this one
         """
+        from subclient.export import export_extrinsics
         from subclient.extrinsics import SubstrateExtrinsicFilter
-        from time import sleep
-        client = get_client(chain_id=self.chain, cache_path=self.cache_path)
-        ex_filter = SubstrateExtrinsicFilter()
-        ex_filter.address_pattern = address.strip() if address else None
-        ex_filter.min_amount = min_amount if min_amount else 0
-        ex_filter.method_pattern = method.strip() if method else None
-        start_block = client.last_block_number - count
-        while True:
-            end_block = client.last_block_number
-            for i in range(start_block, end_block):
-                # noinspection PyBroadException
-                try:
-                    extrinsics = client.get_extrinsics(start_block=i, end_block=i)
-                    for extrinsic in extrinsics:
-                        if ex_filter.match(extrinsic):
-                            if format == "json":
-                                from json import dumps
-                                dumps(extrinsic, indent=2)
-                            else:
-                                print(chain_extrinsic_to_text(client, extrinsic))
-                        else:
-                            logger.debug(f"Ex doesnt match filter {extrinsics}")
-                except Exception:
-                    import traceback
-                    traceback.print_exc()
-            # Not tailing
-            if not tail:
-                break
-            # Store where we are an loop
-            start_block = end_block
-            sleep(client.block_duration)
+        client = self._get_client()
+        ex_filter = SubstrateExtrinsicFilter(
+            address_pattern=address.strip() if address else None,
+            method_pattern=method.strip() if method else None
+        )
+        end = end if end else client.last_block_number
+        rows = export_extrinsics(
+            client=client,
+            start_block=start,
+            end_block=end,
+            path=output,
+            format=format,
+            row_group_size=row_group_size,
+            ex_filter=ex_filter,
+            processes=processes
+        )
+        logger.info(f"Exported {rows} extrinsics from blocks {start}-{end} to {output}")
+
+    def archive(self, start: int, end: Optional[int], output: str):
+        """
+        Stores blocks and the node responses needed to decode them in a local archive, usable with --from-archive
+        :param int start: first block
+        :param int end: last block, last finalized if not provided
+        :param str output: archive directory, blocks already archived are skipped
+        """
+        from subclient.archive import SubstrateArchive
+        # No disk cache, every read the decoders need must reach the node and the archive
+        client = get_client(chain_id=self.chain, cache_path=None)
+        end = end if end else client.last_block_number
+        with SubstrateArchive(output) as archive:
+            added = client.archive_blocks(archive=archive, start_block=start, end_block=end)
+            logger.info(f"Archived {added} blocks from {start}-{end} to {output}, {len(archive)} blocks in archive")
+        client.close()
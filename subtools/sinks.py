@@ -0,0 +1,274 @@
+import os
+import sys
+from abc import ABC, abstractmethod
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Set, TextIO
+
+from subclient.extrinsics import SubstrateExtrinsic
+from subtools import get_logger
+
+logger = get_logger("sinks")
+
+sink_formats = ("text", "json", "ndjson", "csv")
+
+
+class OutputSink(ABC):
+    """
+    Buffered line output for extrinsics, lines are written in blocks when the buffer is full or flush_interval elapsed
+    and files are rotated to numbered parts once they reach rotate_size bytes
+    """
+    _buffer: List[str]
+    _buffered: int = 0
+    # Bytes in the current file part, lines are written as UTF-8
+    _written: int = 0
+    _part: int = 0
+    _part_lines: int = 0
+    _file: Optional[TextIO] = None
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 buffer_size: int = 1 << 16,
+                 flush_interval: float = 1.0,
+                 rotate_size: int = 0,
+                 append: bool = False,
+                 on_flush: Callable[[], None] = None,
+                 tag_chain: bool = False,
+                 tag_retracted: bool = False):
+        """
+        :param str path: output file, stdout if not provided or "-"
+        :param int buffer_size: characters buffered before writing
+        :param float flush_interval: seconds after which a write flushes the buffer anyway
+        :param int rotate_size: start a new file part after this many bytes, 0 to never rotate
+        :param bool append: keep existing file content, used when resuming a scan
+        :param on_flush: called after buffered lines have been written
+        :param bool tag_chain: every line starts with the chain it comes from, used when watching several chains
+        :param bool tag_retracted: every line tells if it retracts a previous one, used when following the best head
+        """
+        self._path = path if path and path != "-" else None
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._rotate_size = rotate_size if self._path else 0
+        self._append = append
+        self._on_flush = on_flush
+        self._tag_chain = tag_chain
+        self._tag_retracted = tag_retracted
+        self._buffer = []
+        self._last_flush = monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @abstractmethod
+    def _format(self, extrinsic: SubstrateExtrinsic, chain: Optional[str], retracted: bool) -> str:
+        pass
+
+    def _header(self) -> Optional[str]:
+        """First line of every file part"""
+        return None
+
+    def _part_path(self, part: int) -> str:
+        root, ext = os.path.splitext(self._path)
+        return f"{root}.{part:05d}{ext}"
+
+    @property
+    def current_path(self) -> Optional[str]:
+        if not self._path or not self._rotate_size:
+            return self._path
+        return self._part_path(self._part)
+
+    def _open(self) -> TextIO:
+        if not self._file:
+            existing = 0
+            if self._path:
+                if self._append:
+                    # Resume on the last part
+                    while self._rotate_size and os.path.exists(self._part_path(self._part + 1)):
+                        self._part += 1
+                    existing = os.path.getsize(self.current_path) if os.path.exists(self.current_path) else 0
+                self._file = open(self.current_path, "a" if self._append else "w", encoding="utf-8", newline="")
+                logger.debug(f"Writing to {self.current_path}")
+            else:
+                self._file = sys.stdout
+            self._part_lines = 1 if existing else 0
+            self._written = existing
+            header = self._header()
+            if header is not None and not existing:
+                self._file.write(header + "\n")
+                self._written += len(header.encode("utf-8")) + 1
+        return self._file
+
+    def _rotate(self):
+        self._close_file()
+        self._part += 1
+        self._written = 0
+
+    def _close_file(self):
+        if self._file and self._file is not sys.stdout:
+            self._file.close()
+        elif self._file:
+            self._file.flush()
+        self._file = None
+
+    def write(self, extrinsic: SubstrateExtrinsic, chain: Optional[str] = None, retracted: bool = False):
+        """
+        :param SubstrateExtrinsic extrinsic: extrinsic to write
+        :param str chain: chain the extrinsic comes from, only written with tag_chain
+        :param bool retracted: the extrinsic was written before from a block a reorg removed
+        """
+        line = self._format(extrinsic, chain, retracted) + "\n"
+        self._buffer.append(line)
+        self._buffered += len(line)
+        if self._buffered >= self._buffer_size or monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            output = self._open()
+            if self._rotate_size:
+                # Rotation is checked per line so parts never exceed the limit by more than one line
+                for line in self._buffer:
+                    size = len(line.encode("utf-8"))
+                    if self._written + size > self._rotate_size and self._part_lines:
+                        self._rotate()
+                        output = self._open()
+                    output.write(line)
+                    self._written += size
+                    self._part_lines += 1
+            else:
+                output.write("".join(self._buffer))
+            output.flush()
+            if self._on_flush:
+                self._on_flush()
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = monotonic()
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+
+class TextOutputSink(OutputSink):
+    """
+    Human readable lines, formatted by the given callable with the extrinsic and its chain
+    """
+
+    def __init__(self, formatter: Callable[[SubstrateExtrinsic, Optional[str]], str], **kwargs):
+        super().__init__(**kwargs)
+        self._formatter = formatter
+
+    def _format(self, extrinsic: SubstrateExtrinsic, chain: Optional[str], retracted: bool) -> str:
+        text = self._formatter(extrinsic, chain)
+        text = f"[{chain}] {text}" if self._tag_chain else text
+        return f"RETRACTED:{text}" if retracted else text
+
+
+class NDJSONOutputSink(OutputSink):
+    """
+    One JSON object per line, always with the same keys
+    """
+
+    def __init__(self, **kwargs):
+        from json import JSONEncoder
+        super().__init__(**kwargs)
+        self._encoder = JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def _format(self, extrinsic: SubstrateExtrinsic, chain: Optional[str], retracted: bool) -> str:
+        from subclient.export import extrinsic_to_dict
+        data = extrinsic_to_dict(extrinsic)
+        if self._tag_chain:
+            data = {"chain": chain, **data}
+        if self._tag_retracted:
+            data["retracted"] = retracted
+        return self._encoder.encode(data)
+
+
+class CSVOutputSink(OutputSink):
+    """
+    Rows with the columnar export columns, params as a JSON object, every file part starts with the header
+    """
+
+    def __init__(self, **kwargs):
+        import csv
+        import io
+        super().__init__(**kwargs)
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line, lineterminator="")
+
+    def _row_to_text(self, row) -> str:
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(row)
+        return self._line.getvalue()
+
+    def _header(self) -> Optional[str]:
+        from subclient.export import export_columns
+        columns = ("chain",) + export_columns if self._tag_chain else export_columns
+        return self._row_to_text(columns + ("retracted",) if self._tag_retracted else columns)
+
+    def _format(self, extrinsic: SubstrateExtrinsic, chain: Optional[str], retracted: bool) -> str:
+        from subclient.export import extrinsic_to_row
+        row = extrinsic_to_row(extrinsic)
+        row = (chain,) + row if self._tag_chain else row
+        return self._row_to_text(row + (retracted,) if self._tag_retracted else row)
+
+
+class RoutedOutputSink:
+    """
+    Writes every extrinsic to the sinks it is routed to, None being the default one. Flushing writes all of them
+    before on_flush, so a checkpoint never moves past lines still buffered in one of them
+    """
+    _sinks: Dict[Optional[str], OutputSink]
+
+    def __init__(self,
+                 sinks: Dict[Optional[str], OutputSink],
+                 route: Callable[[SubstrateExtrinsic], Set[Optional[str]]],
+                 on_flush: Callable[[], None] = None):
+        """
+        :param sinks: sink of every output
+        :param route: outputs an extrinsic goes to
+        :param on_flush: called after all the sinks have been flushed
+        """
+        self._sinks = sinks
+        self._route = route
+        self._on_flush = on_flush
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, extrinsic: SubstrateExtrinsic, chain: Optional[str] = None, retracted: bool = False):
+        for output in self._route(extrinsic):
+            self._sinks[output].write(extrinsic, chain=chain, retracted=retracted)
+
+    def flush(self):
+        for sink in self._sinks.values():
+            sink.flush()
+        if self._on_flush:
+            self._on_flush()
+
+    def close(self):
+        self.flush()
+        for sink in self._sinks.values():
+            sink.close()
+
+
+def get_sink(format: str,
+             formatter: Callable[[SubstrateExtrinsic, Optional[str]], str] = None,
+             **kwargs) -> OutputSink:
+    """
+    :param str format: one of sink_formats, json is written as NDJSON
+    :param formatter: text formatter, only used by the text format
+    """
+    if format == "text":
+        return TextOutputSink(formatter=formatter, **kwargs)
+    elif format in ("json", "ndjson"):
+        return NDJSONOutputSink(**kwargs)
+    elif format == "csv":
+        return CSVOutputSink(**kwargs)
+    raise NameError(f"Output format {format} not supported")
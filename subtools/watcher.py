@@ -0,0 +1,237 @@
+from subtools import get_logger
+from threading import Event, Lock
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from subclient.checkpoint import SubstrateCheckpoint
+    from subclient.core import SubstrateClient, SubstrateExtrinsic
+    from subclient.extrinsics import SubstrateExtrinsicFilter
+    from subtools.sinks import OutputSink
+
+logger = get_logger("watcher")
+
+
+class ChainWatcher:
+    """
+    event-watch pipeline of one chain: decodes blocks from the finalized or the best head, writes the matches to the
+    sink shared by every chain and moves the chain checkpoint once a block is written. A failed block is logged and
+    retried on the next round when there is a checkpoint, skipped otherwise
+    """
+    chain: str
+    tag: Optional[str] = None
+    evm_logs: bool = False
+    dedupe: bool = False
+    tail: bool = False
+    resolve_identities: bool = False
+    best_head: bool = False
+
+    def __init__(self,
+                 chain: str,
+                 client: "SubstrateClient",
+                 sink: "OutputSink",
+                 ex_filter: "SubstrateExtrinsicFilter",
+                 checkpoint: "SubstrateCheckpoint" = None,
+                 lock: Lock = None,
+                 stop: Event = None,
+                 tag: Optional[str] = None,
+                 evm_logs: bool = False,
+                 dedupe: bool = False,
+                 tail: bool = False,
+                 resolve_identities: bool = False,
+                 best_head: bool = False) -> None:
+        """
+        :param str chain: chain name, used in logs
+        :param SubstrateClient client: chain client
+        :param OutputSink sink: output, shared with the other chains
+        :param SubstrateExtrinsicFilter ex_filter: extrinsics to write
+        :param SubstrateCheckpoint checkpoint: checkpoint of the chain, None to write without one
+        :param Lock lock: held while writing to the sink, shared with the other chains
+        :param Event stop: set to stop watching
+        :param str tag: chain tag of the written lines, None when watching a single chain
+        :param bool evm_logs: also scan the whole range for EVM logs
+        :param bool dedupe: skip extrinsics already written before a restart
+        :param bool tail: keep watching new blocks
+        :param bool resolve_identities: resolve the identities of a block at once before writing it
+        :param bool best_head: follow the best head, written blocks can be retracted
+        """
+        super().__init__()
+        self.chain = chain
+        self.client = client
+        self.sink = sink
+        self.ex_filter = ex_filter
+        self.checkpoint = checkpoint
+        self.lock = lock if lock else Lock()
+        self.stop = stop if stop else Event()
+        self.tag = tag
+        self.evm_logs = evm_logs
+        self.dedupe = dedupe
+        self.tail = tail
+        self.resolve_identities = resolve_identities
+        self.best_head = best_head
+
+    def resume(self, start_block: int) -> int:
+        """
+        First block to process, right after the checkpoint when there is one. Following the best head, a checkpoint
+        block retracted while stopped is written again as retracted and processed again from the new branch
+        :param int start_block: first block without checkpoint
+        """
+        saved = self.checkpoint
+        if saved and saved.load():
+            if saved.hash and self.client.get_block_hash(saved.block) != saved.hash:
+                if self.best_head:
+                    return self._retract_checkpoint()
+                logger.warning(f"{self.chain} checkpoint block #{saved.block} hash changed, resuming anyway")
+            logger.info(f"Resuming {self.chain} from checkpoint {saved}")
+            return saved.block + 1
+        return start_block
+
+    def _retract_checkpoint(self) -> int:
+        """
+        Retracts the checkpoint block, decoded by its saved hash, returns the block to resume from
+        """
+        from subclient.core import SubstrateBlockHeader
+        saved = self.checkpoint
+        logger.warning(f"{self.chain} checkpoint block #{saved.block} was retracted, resuming from it")
+        # noinspection PyBroadException
+        try:
+            header = SubstrateBlockHeader(number=saved.block, hash=saved.hash)
+            self.write(self.client.get_block_extrinsics(header, ex_filter=self.ex_filter), retracted=True)
+        except Exception:
+            logger.exception(f"{self.chain} retracted block #{saved.block} failed")
+        return saved.block
+
+    def write(self, extrinsics: List["SubstrateExtrinsic"], retracted: bool = False) -> List["SubstrateExtrinsic"]:
+        """
+        Writes the extrinsics of a block, returns the ones written
+        :param list extrinsics: extrinsics of one block
+        :param bool retracted: flag them as retracted by a reorg
+        """
+        from subclient.profiler import profiler
+        saved = self.checkpoint
+        # Rows are only tracked when deduplicating, the block checkpoint is enough otherwise
+        dedupe = self.dedupe and saved and not retracted
+        keys = saved.row_keys(extrinsics) if dedupe else [None] * len(extrinsics)
+        if dedupe:
+            rows = [(x, key) for x, key in zip(extrinsics, keys) if not saved.is_emitted(key)]
+            extrinsics, keys = [x[0] for x in rows], [x[1] for x in rows]
+        # Resolve all the block identities at once, outside the lock as it might ask the node
+        if self.resolve_identities:
+            with profiler.stage("identities"):
+                self.client.resolve_identities(extrinsics)
+        with self.lock, profiler.stage("output"):
+            for extrinsic, key in zip(extrinsics, keys):
+                # Marked before writing so a flush in the middle of a block saves it as emitted
+                if key:
+                    saved.mark_emitted(key)
+                self.sink.write(extrinsic, chain=self.tag, retracted=retracted)
+        return extrinsics
+
+    def mark(self, block_nr: int, block_hash: str = None):
+        """
+        Moves the checkpoint to a written block, lines are flushed before so a crash only means writing them again.
+        The sink saves the checkpoint after writing buffered lines, it is only saved here when there were none
+        """
+        saved = self.checkpoint
+        if saved:
+            block_hash = block_hash if block_hash else self.client.get_block_hash(block_nr)
+            with self.lock:
+                saved.mark_block(block_nr, block_hash)
+                self.sink.flush()
+                saved.save()
+
+    def flush(self):
+        with self.lock:
+            self.sink.flush()
+
+    def watch_finalized(self, start_block: int):
+        """
+        Processes finalized blocks from start_block, until the last finalized one or forever when tailing
+        """
+        from subclient.core import SubstrateBlockHeader
+        client = self.client
+        while not self.stop.is_set():
+            end_block = client.last_block_number
+            for i in range(start_block, end_block):
+                if self.stop.is_set():
+                    return
+                # noinspection PyBroadException
+                try:
+                    # Block hash is read once, for decoding and for the checkpoint
+                    header = SubstrateBlockHeader(number=i, hash=client.get_block_hash(i))
+                    self.write(client.get_block_extrinsics(header, ex_filter=self.ex_filter, last_nr=end_block))
+                except Exception:
+                    logger.exception(f"{self.chain} block #{i} failed")
+                    # Never move a checkpoint past a failed block, retry it on next round
+                    if self.checkpoint:
+                        end_block = i
+                        break
+                    continue
+                # EVM logs come at the end of the range so only the range end can be marked
+                if not self.evm_logs:
+                    self.mark(i, header.hash)
+            if self.evm_logs and end_block > start_block:
+                end_block = self._write_evm_logs(start_block, end_block)
+            self.flush()
+            if not self.tail:
+                break
+            start_block = end_block
+            self.stop.wait(client.block_duration)
+
+    def _write_evm_logs(self, start_block: int, end_block: int) -> int:
+        """
+        EVM logs of a whole range at once, returns where the next range starts
+        """
+        from subclient.profiler import profiler
+        # noinspection PyBroadException
+        try:
+            with profiler.stage("evm_logs"):
+                logs = self.client.get_evm_logs(start_block=start_block, end_block=end_block - 1)
+            self.write([x for x in logs if self.ex_filter.match(x)])
+            self.mark(end_block - 1)
+        except Exception:
+            logger.exception(f"{self.chain} EVM logs #{start_block}-{end_block - 1} failed")
+            if self.checkpoint:
+                return start_block
+        return end_block
+
+    def watch_best_head(self, start_block: int):
+        """
+        Processes blocks as soon as they are imported, blocks retracted by a reorg are written again flagged as
+        retracted before the new branch
+        """
+        from subclient.reorg import SubstrateReorgTracker
+        client = self.client
+        tracker = SubstrateReorgTracker()
+        block_nr = start_block
+        while not self.stop.is_set():
+            best_nr = client.best_block_number
+            while block_nr <= best_nr and not self.stop.is_set():
+                # noinspection PyBroadException
+                try:
+                    block_nr = self._follow_block(block_nr, tracker)
+                except Exception:
+                    logger.exception(f"{self.chain} best block #{block_nr} failed")
+                    break
+            self.flush()
+            if not self.tail:
+                break
+            # New blocks are imported before they are final, poll more often than the finalized head
+            self.stop.wait(client.block_duration / 4)
+
+    def _follow_block(self, block_nr: int, tracker) -> int:
+        """
+        Processes a best chain block, returns the next block to process
+        """
+        client = self.client
+        header = client.get_block_header(block_nr)
+        orphaned = tracker.orphaned(header, client.get_block_hash)
+        if orphaned:
+            # Retract newest first, then process the new branch from the fork point
+            for block in reversed(orphaned):
+                self.write(block.extrinsics, retracted=True)
+            self.mark(orphaned[0].number - 1)
+            return orphaned[0].number
+        extrinsics = self.write(client.get_block_extrinsics(header, ex_filter=self.ex_filter))
+        tracker.add(header, extrinsics)
+        self.mark(block_nr, header.hash)
+        return block_nr + 1
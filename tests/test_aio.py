@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from benchmarks.mock_node import MockRecording, MockSubstrateNode
+from subclient.aio import AsyncJsonRpcConnection, AsyncMoonbeamClient
+from subclient.endpoint import SubstrateEndpoint
+
+
+def get_recording() -> MockRecording:
+    recording = MockRecording()
+    recording.add("system_chain", [], "Moonbeam")
+    for block in range(20):
+        recording.add("chain_getBlockHash", [block], f"0x{block:064x}")
+    return recording
+
+
+def test_connection_pipelining():
+    from substrateinterface.exceptions import SubstrateRequestException
+
+    async def run(url: str):
+        connection = AsyncJsonRpcConnection(url)
+        responses = await asyncio.gather(*[connection.request("chain_getBlockHash", [x]) for x in range(20)])
+        await connection.close()
+        return responses
+
+    with MockSubstrateNode(get_recording(), latency=0.2) as node:
+        responses = asyncio.run(run(node.ws_url))
+    assert [x['result'] for x in responses] == [f"0x{x:064x}" for x in range(20)]
+    # All requests were in flight together
+    assert node.peak_in_flight == 20
+
+    async def run_client(endpoint: SubstrateEndpoint):
+        async with AsyncMoonbeamClient(endpoint, cache_path=None, workers=8) as client:
+            with pytest.raises(SubstrateRequestException):
+                await client.rpc_request("chain_getBlockHash", [50])
+            return await asyncio.gather(*[client.run(lambda x, nr=nr: x.get_block_hash(nr)) for nr in range(8)])
+
+    with MockSubstrateNode(get_recording(), latency=0.2) as node:
+        endpoint = SubstrateEndpoint(chain_id="moonbeam", wss_endpoints=[node.ws_url],
+                                     client_type="subclient.moonbeam.MoonbeamClient")
+        hashes = asyncio.run(run_client(endpoint))
+    assert hashes == [f"0x{x:064x}" for x in range(8)]
+    # Worker clients connect (system_chain) and read at the same time over one websocket
+    assert node.peak_in_flight == 8
+
+
+def test_async_get_extrinsics():
+    from benchmarks.mock_chain import get_mock_recording
+    from substrateinterface.exceptions import SubstrateRequestException
+    from subclient.aio import PipelinedSubstrateInterface
+
+    async def run(endpoint: SubstrateEndpoint):
+        async with AsyncMoonbeamClient(endpoint, cache_path=None, workers=2) as client:
+            result = await client.get_extrinsics(start_block=100, end_block=109, prefetch_blocks=3)
+            api = await client.run(lambda x: x._api)
+            with pytest.raises(SubstrateRequestException):
+                api.rpc_request("chain_subscribeNewHeads", [], result_handler=lambda *args: None)
+            return result, isinstance(api, PipelinedSubstrateInterface)
+
+    with MockSubstrateNode(get_mock_recording(start_block=100, count=10, block_size=2, candidates=0),
+                           latency=0.05) as node:
+        endpoint = SubstrateEndpoint(chain_id="moonbeam", wss_endpoints=[node.ws_url],
+                                     client_type="subclient.moonbeam.MoonbeamClient")
+        client = endpoint.get_client(cache_path=None)
+        expected = [str(x) for x in client.get_extrinsics(start_block=100, end_block=109)]
+        client.close()
+        requests = node.request_count
+        node.peak_in_flight = 0
+        result, pipelined = asyncio.run(run(endpoint))
+        async_requests = node.request_count - requests
+    assert [str(x) for x in result] == expected and len(expected) == 20 and pipelined
+    # Every block read once, only the parent hash of the first block is added
+    assert async_requests <= requests + 1
+    # Reads of the next blocks overlap, never more than the prefetched blocks: 4 requests each and the decoder
+    assert 4 < node.peak_in_flight <= 3 * 4 + 1
@@ -0,0 +1,102 @@
+import pytest
+from subclient.archive import SubstrateArchive, SubstrateArchiveCapture, SubstrateArchiveInterface, \
+    SubstrateArchiveMiss
+
+
+def get_hash(block: int) -> str:
+    return "0x" + block.to_bytes(32, "big").hex()
+
+
+def get_responses(block: int) -> list:
+    return [
+        ("system_chain", [], "Moonbeam"),
+        ("chain_getFinalizedHead", [], get_hash(100)),
+        ("chain_getBlockHash", [block], get_hash(block)),
+        ("chain_getBlock", [get_hash(block)], {'block': {'extrinsics': [f"0x{block:02x}"]}}),
+        ("state_getStorageAt", ["0x26aa", get_hash(block)], f"0x{block:04x}"),
+    ]
+
+
+def test_archive_segments(tmp_path):
+    path = str(tmp_path / "archive")
+    with SubstrateArchive(path, segment_size=256) as archive:
+        for block in range(10, 20):
+            archive.write_block(block, get_hash(block), get_responses(block))
+    # Torn write after a crash, the entry points past the segment end
+    with open(f"{path}/index.jsonl", "a") as f:
+        f.write('{"block": 20, "hash": "0x20", "segment": 0, "offset": 100000, "length": 10}\n{"blo')
+    archive = SubstrateArchive(path, segment_size=256, loaded_blocks=2)
+    assert len(list(tmp_path.joinpath("archive").glob("segment_*.bin"))) > 1
+    assert (archive.first_block, archive.last_block, len(archive)) == (10, 19, 10)
+    assert not archive.has_block(20)
+    assert archive.get("chain_getBlockHash", [12]) == (True, get_hash(12))
+    assert archive.get("state_getStorageAt", ["0x26aa", get_hash(15)]) == (True, "0x000f")
+    assert archive.get("chain_getFinalizedHead", []) == (True, get_hash(100))
+    assert archive.get("state_getStorageAt", ["0x26aa", get_hash(25)]) == (False, None)
+    archive.close()
+
+
+def test_archive_interface(tmp_path):
+    from benchmarks.mock_node import MockRecording, MockSubstrateNode
+    archive = SubstrateArchive(str(tmp_path / "archive"))
+    archive.write_block(10, get_hash(10), get_responses(10))
+    api = SubstrateArchiveInterface(archive)
+    assert api.rpc_request("chain_getBlock", [get_hash(10)])['result']['block']['extrinsics'] == ["0x0a"]
+    with pytest.raises(SubstrateArchiveMiss):
+        api.rpc_request("chain_getBlockHash", [11])
+    # Misses go to the node when there is a fallback
+    recording = MockRecording()
+    recording.add("system_chain", [], "Moonbeam")
+    recording.add("chain_getBlockHash", [11], get_hash(11))
+    with MockSubstrateNode(recording) as node:
+        api = SubstrateArchiveInterface(archive, fallback_url=node.ws_url)
+        assert api.rpc_request("chain_getBlockHash", [11])['result'] == get_hash(11)
+        assert api.rpc_request("chain_getBlockHash", [10])['result'] == get_hash(10)
+        # system_chain sent by the fallback connection and the missing block hash
+        assert node.request_count == 2
+        api.close()
+    archive.close()
+
+
+class CaptureTestApi:
+
+    # noinspection PyUnusedLocal,PyMethodMayBeStatic
+    def rpc_request(self, method, params, result_handler=None):
+        return {'jsonrpc': '2.0', 'id': 1, 'result': [method] + params}
+
+
+def test_archive_capture_reconnect():
+    import gc
+    capture = SubstrateArchiveCapture()
+    # Attached once, then again for the interface replacing it after a reconnect, even if it reuses its id
+    for block in range(20):
+        api = capture.attach(capture.attach(CaptureTestApi()))
+        api.rpc_request("chain_getBlockHash", [block])
+        del api
+        gc.collect()
+    assert capture.responses == [("chain_getBlockHash", [x], ["chain_getBlockHash", x]) for x in range(20)]
+
+
+def test_archive_blocks_decode_offline(tmp_path, monkeypatch):
+    from benchmarks.mock_chain import get_mock_recording
+    from benchmarks.mock_node import MockSubstrateNode
+    from subclient.endpoint import SubstrateEndpoint
+    from subclient.metadata import SubstrateMetadataCache
+    # Metadata decoded by other tests is not served from memory
+    monkeypatch.setattr(SubstrateMetadataCache, "_decoded", {})
+    archive = SubstrateArchive(str(tmp_path / "archive"))
+    with MockSubstrateNode(get_mock_recording(start_block=100, count=5, block_size=3, candidates=0)) as node:
+        endpoint = SubstrateEndpoint(chain_id="moonbeam", wss_endpoints=[node.ws_url],
+                                     client_type="subclient.moonbeam.MoonbeamClient")
+        client = endpoint.get_client(cache_path=None)
+        assert client.archive_blocks(archive, start_block=100, end_block=104) == 5
+        expected = [str(x) for x in client.get_extrinsics(start_block=100, end_block=104)]
+        client.close()
+    archive.close()
+    monkeypatch.setattr(SubstrateMetadataCache, "_decoded", {})
+    # Decoded from the archive alone, a miss would raise without fallback
+    client = endpoint.get_client(cache_path=None)
+    client.use_archive(SubstrateArchive(str(tmp_path / "archive")))
+    assert client.last_block_number == 104
+    assert [str(x) for x in client.get_extrinsics(start_block=100, end_block=104)] == expected and len(expected) == 15
+    client.close()
@@ -0,0 +1,73 @@
+from subclient import backfill
+from subclient.backfill import SubstrateBackfill, SubstratePrefetch
+from subclient.archive import _response_key
+from tests.test_export import get_extrinsics
+
+
+class PrefetchTestApi:
+
+    def __init__(self):
+        self.requests = []
+
+    # noinspection PyUnusedLocal
+    def rpc_request(self, method, params, result_handler=None):
+        self.requests.append(method)
+        return {'jsonrpc': '2.0', 'id': 1, 'result': f"node:{method}"}
+
+
+def test_prefetch_routing():
+    api = PrefetchTestApi()
+    prefetch = SubstratePrefetch()
+    assert prefetch.attach(prefetch.attach(api)) is api
+    prefetch.responses = {_response_key("chain_getBlock", ["0x01"]): {'block': 1}}
+    assert api.rpc_request("chain_getBlock", ["0x01"])['result'] == {'block': 1}
+    # Anything not prefetched still reaches the node, only once even if attached twice
+    assert api.rpc_request("state_getMetadata", ["0x01"])['result'] == "node:state_getMetadata"
+    assert api.requests == ["state_getMetadata"]
+
+
+def test_prefetch_reconnect():
+    import gc
+    prefetch = SubstratePrefetch()
+    prefetch.responses = {_response_key("chain_getBlock", ["0x01"]): {'block': 1}}
+    # Interfaces replaced after a reconnect are attached again, even when they reuse the id of a collected one
+    for _ in range(20):
+        api = prefetch.attach(PrefetchTestApi())
+        assert api.rpc_request("chain_getBlock", ["0x01"])['result'] == {'block': 1}
+        del api
+        gc.collect()
+
+
+class BackfillTestClient:
+    """Worker side, the block size comes from the prefetched block"""
+
+    def __init__(self):
+        self._api = PrefetchTestApi()
+
+    # noinspection PyUnusedLocal
+    def get_block_extrinsics(self, header, ex_filter=None):
+        size = self._api.rpc_request("chain_getBlock", [header.hash])['result']
+        return get_extrinsics(header.number, size)
+
+
+class BackfillParentTestClient:
+
+    # noinspection PyMethodMayBeStatic
+    def get_raw_block(self, block_number: int):
+        block_hash = f"0x{block_number:064x}"
+        return block_hash, {_response_key("chain_getBlock", [block_hash]): block_number % 3}
+
+
+def _init_test_worker():
+    backfill._worker_client = BackfillTestClient()
+    backfill._worker_prefetch = SubstratePrefetch()
+
+
+def test_backfill_order(monkeypatch):
+    monkeypatch.setattr(backfill, "_init_worker", _init_test_worker)
+    monkeypatch.setattr(SubstrateBackfill, "_worker_args", lambda self: ())
+    pool = SubstrateBackfill(BackfillParentTestClient(), processes=3, batch_size=4, pending_batches=1)
+    blocks = list(pool.iter_extrinsics(10, 40))
+    assert [x[0] for x in blocks] == list(range(10, 41))
+    assert [len(x[1]) for x in blocks] == [x % 3 for x in range(10, 41)]
+    assert blocks[-1][1][0].id == "40-0"
@@ -0,0 +1,38 @@
+from subclient.core import SubstrateClient
+
+
+def test_split_batch_by_weight():
+    chunks = SubstrateClient._split_batch(
+        call_lengths=[10] * 10,
+        base_weight=100,
+        item_weight=50,
+        base_length=20,
+        max_weight=300,
+        max_length=1000
+    )
+    assert chunks == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_split_batch_by_length():
+    chunks = SubstrateClient._split_batch(
+        call_lengths=[10, 30, 10, 10, 40],
+        base_weight=0,
+        item_weight=1,
+        base_length=20,
+        max_weight=1000,
+        max_length=60
+    )
+    assert chunks == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_split_batch_oversized_call():
+    chunks = SubstrateClient._split_batch(
+        call_lengths=[100, 10],
+        base_weight=0,
+        item_weight=1,
+        base_length=0,
+        max_weight=1000,
+        max_length=50
+    )
+    assert chunks == [(0, 1), (1, 2)]
+    assert SubstrateClient._split_batch([], 0, 1, 0, 10, 10) == []
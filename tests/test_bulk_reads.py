@@ -0,0 +1,60 @@
+from subclient.endpoint import SubstrateEndpoint
+from subclient.moonbeam import MoonbeamClient
+
+accounts = {
+    "0xaaaa": {'data': {'free': 5 * 10 ** 18, 'misc_frozen': 10 ** 18}},
+    "0xbbbb": {'data': {'free': 2 * 10 ** 18, 'misc_frozen': 0}},
+}
+delegators = {
+    "0xaaaa": {'id': "0xaaaa", 'delegations': [{'owner': "0xc001", 'amount': 10 ** 18},
+                                               {'owner': "0xc002", 'amount': 3 * 10 ** 18}]},
+    "0xbbbb": {'id': "0xbbbb", 'delegations': [{'owner': "0xc001", 'amount': 2 * 10 ** 18}]},
+}
+scheduled_requests = {
+    "0xc002": [{'delegator': "0xaaaa", 'when_executable': 42, 'action': {'Revoke': 3 * 10 ** 18}}],
+}
+
+
+class BulkTestClient(MoonbeamClient):
+    queries: list
+
+    def __init__(self, cache_path: str):
+        super().__init__(SubstrateEndpoint(chain_id="test", wss_endpoints=[], client_type=MoonbeamClient), cache_path)
+        self.queries = []
+
+    def token_humanize(self, value) -> float:
+        return float(value) / 10 ** 18
+
+    def _query_multi(self, module: str, storage_function: str, params: list, block_hash: str = None) -> list:
+        self.queries.append((storage_function, [x[0] for x in params]))
+        storage = {"Account": accounts, "DelegatorState": delegators,
+                   "DelegationScheduledRequests": scheduled_requests}[storage_function]
+        return [storage.get(x[0]) for x in params]
+
+
+def test_free_balances(tmp_path):
+    client = BulkTestClient(str(tmp_path))
+    balances = client.get_free_balances(["0xaaaa", "0xbbbb", "0xdddd", "0xaaaa"])
+    assert balances == {"0xaaaa": 4.0, "0xbbbb": 2.0, "0xdddd": 0.0}
+    assert client.queries == [("Account", ["0xaaaa", "0xbbbb", "0xdddd"])]
+    # Single reads are served by the entries of the bulk one
+    assert client.get_free_balance("0xbbbb") == 2.0
+    assert client.get_free_balances(["0xaaaa", "0xeeee"])["0xaaaa"] == 4.0
+    assert client.queries[-1] == ("Account", ["0xeeee"])
+
+
+def test_delegator_states(tmp_path):
+    client = BulkTestClient(str(tmp_path))
+    states = client.get_delegator_states(["0xaaaa", "0xbbbb", "0xdddd"])
+    # One read for the states, one for the scheduled requests of all their collators
+    assert client.queries == [
+        ("DelegatorState", ["0xaaaa", "0xbbbb", "0xdddd"]),
+        ("DelegationScheduledRequests", ["0xc001", "0xc002"]),
+    ]
+    assert states["0xdddd"] is None
+    revoked = states["0xaaaa"].get_delegation(collator="0xc002")
+    assert revoked.amount == 3.0 and revoked.revoke_round == 42 and revoked.revoke_action == "Revoke"
+    assert states["0xbbbb"].get_delegation(collator="0xc001").amount == 2.0
+    # Cached like get_delegator_state
+    assert client.get_delegator_state("0xbbbb").address == "0xbbbb"
+    assert len(client.queries) == 2
@@ -75,3 +75,14 @@ def test_cache_client_method():
     client.get_candidate_pool()
     d2 = time() - s2
     assert d2 < d1
+
+
+def test_cache_namespaces(tmp_path):
+    moonbeam = CacheWrapper(str(tmp_path), namespace="moonbeam")
+    moonriver = CacheWrapper(str(tmp_path), namespace="moonriver")
+    # Same folder, one handle
+    assert moonbeam._cache is moonriver._cache
+    moonbeam.set(key="identity_0x01", value="Foundation-01")
+    moonriver.set(key="identity_0x01", value="Foundation-02")
+    assert moonbeam.get(key="identity_0x01") == "Foundation-01"
+    assert moonriver.get(key="identity_0x01") == "Foundation-02"
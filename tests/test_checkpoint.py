@@ -0,0 +1,52 @@
+import os
+from subclient.checkpoint import SubstrateCheckpoint
+from subclient.extrinsics import SubstrateExtrinsic
+from tests.test_export import get_extrinsics
+
+checkpoint_path = ".pytest_cache/checkpoint/scan.json"
+
+
+def test_checkpoint_resume():
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = SubstrateCheckpoint(checkpoint_path)
+    assert not checkpoint.load()
+    first, second = checkpoint.row_keys(get_extrinsics(10, 1)), checkpoint.row_keys(get_extrinsics(11, 2))
+    checkpoint.mark_emitted(first[0])
+    checkpoint.mark_block(10, "0x10")
+    # Block 11 was half written when the scan stopped
+    checkpoint.mark_emitted(second[0])
+    checkpoint.save()
+    assert not os.path.exists(f"{checkpoint_path}.tmp")
+    resumed = SubstrateCheckpoint(checkpoint_path)
+    assert resumed.load()
+    assert resumed.block == 10
+    assert resumed.hash == "0x10"
+    assert not resumed.is_emitted(first[0])
+    assert resumed.is_emitted(second[0])
+    assert not resumed.is_emitted(second[1])
+    resumed.mark_block(11, "0x11")
+    assert not resumed.is_emitted(second[0])
+
+
+def get_row(id: str, function: str, ex_type: str, delegator: str) -> SubstrateExtrinsic:
+    ex = SubstrateExtrinsic(id=id, block=12, module="ParachainStaking", function=function, ex_type=ex_type)
+    ex.add_address(name="delegator", value=delegator)
+    return ex
+
+
+def test_checkpoint_row_keys():
+    rows = [
+        # Rewards of an extrinsic share its id
+        get_row("12-3", "Rewarded", "Substrate", "0xaaaa"),
+        get_row("12-3", "Rewarded", "Substrate", "0xbbbb"),
+        # EVM transaction and EVM log of the same block
+        get_row("12-0", "Transfer", "EVM", "0xaaaa"),
+        get_row("12-log0", "Transfer", "EVM", "0xaaaa"),
+        # Identical rows, es: the same call twice in a batch
+        get_row("12-5", "Transfer", "Substrate", "0xcccc"),
+        get_row("12-5", "Transfer", "Substrate", "0xcccc"),
+    ]
+    keys = SubstrateCheckpoint.row_keys(rows)
+    assert len(set(keys)) == len(rows)
+    assert keys == SubstrateCheckpoint.row_keys(list(rows))
@@ -0,0 +1,59 @@
+import json
+from subtools.cli import Cli
+from tests.test_export import get_extrinsics
+
+
+class WatchTestClient:
+    block_duration = 0.01
+    last_block_number = 20
+
+    def __init__(self, chain: str, size: int):
+        self.chain = chain
+        self.size = size
+        self.hashes = []
+
+    # noinspection PyUnusedLocal
+    def get_block_extrinsics(self, header, ex_filter=None, last_nr=None):
+        assert header.hash == f"0x{header.number:x}"
+        return get_extrinsics(header.number, self.size)
+
+    def get_block_hash(self, block_nr: int) -> str:
+        self.hashes.append(block_nr)
+        return f"0x{block_nr:x}"
+
+
+def test_event_watch_chains(tmp_path, monkeypatch):
+    clients = {"moonbeam": WatchTestClient("moonbeam", 1), "moonriver": WatchTestClient("moonriver", 2)}
+    monkeypatch.setattr(Cli, "_get_client", lambda self, chain=None: clients[chain])
+    cli = Cli(chain="moonbeam,moonriver", cache_path=str(tmp_path / "cache"))
+    output = str(tmp_path / "watch.ndjson")
+    cli.event_watch(address=None, method=None, min_amount=0, tail=False, count=5, format="json", output=output,
+                    checkpoint="watch")
+    with open(output) as f:
+        rows = [json.loads(x) for x in f]
+    assert len([x for x in rows if x["chain"] == "moonbeam"]) == 5
+    assert len([x for x in rows if x["chain"] == "moonriver"]) == 10
+    # Blocks of a chain stay in order
+    assert [x["block"] for x in rows if x["chain"] == "moonbeam"] == [15, 16, 17, 18, 19]
+    for chain in clients:
+        with open(tmp_path / "cache" / "checkpoints" / f"{chain}_watch.json") as f:
+            assert json.load(f)["block"] == 19
+        # One hash read per block, shared by decoding and the checkpoint
+        assert clients[chain].hashes == [15, 16, 17, 18, 19]
+
+
+def test_event_watch_rules(tmp_path, monkeypatch):
+    client = WatchTestClient("moonbeam", 2)
+    monkeypatch.setattr(Cli, "_get_client", lambda self, chain=None: client)
+    rules = tmp_path / "rules.json"
+    routed = str(tmp_path / "first.ndjson")
+    rules.write_text(json.dumps([{'name': "first", 'addresses': ["0x0000"], 'output': routed},
+                                 {'name': "second", 'addresses': ["0x0001"]}]))
+    cli = Cli(chain="moonbeam", cache_path=str(tmp_path / "cache"))
+    output = str(tmp_path / "watch.ndjson")
+    cli.event_watch(address=None, method=None, min_amount=0, tail=False, count=3, format="json", output=output,
+                    checkpoint="watch", rules=str(rules))
+    for path, index in ((routed, 0), (output, 1)):
+        with open(path) as f:
+            rows = [json.loads(x) for x in f]
+        assert [x["id"] for x in rows] == [f"{block}-{index}" for block in (17, 18, 19)]
@@ -0,0 +1,49 @@
+from subclient.context import SubstrateBlockContext
+
+
+class RawItem:
+
+    def __init__(self, value: dict):
+        self.value = value
+
+
+def get_context(loads: list) -> SubstrateBlockContext:
+    def events_loader():
+        loads.append(1)
+        return [
+            RawItem({'extrinsic_idx': 1, 'module_id': 'Balances', 'event_id': 'Transfer'}),
+            RawItem({'extrinsic_idx': 1, 'module_id': 'System', 'event_id': 'ExtrinsicSuccess'}),
+            RawItem({'extrinsic_idx': 2, 'module_id': 'System', 'event_id': 'ExtrinsicFailed'}),
+        ]
+
+    return SubstrateBlockContext(
+        number=10,
+        hash="0x01",
+        extrinsics=[
+            RawItem({'call': {'call_module': 'Timestamp', 'call_function': 'set', 'call_args': [{'value': 1000}]}}),
+            RawItem({'call': {'call_module': 'Balances', 'call_function': 'transfer', 'call_args': []}}),
+            RawItem({'call': {'call_module': 'Balances', 'call_function': 'transfer', 'call_args': []}}),
+        ],
+        events_loader=events_loader
+    )
+
+
+def test_context_events_loaded_once():
+    loads = []
+    context = get_context(loads)
+    assert context.timestamp == 1000
+    assert not loads
+    assert len(context.get_extrinsic_events(1)) == 2
+    assert not context.is_extrinsic_failed(1)
+    assert context.is_extrinsic_failed(2)
+    assert context.get_extrinsic_events(0) == []
+    assert len(loads) == 1
+
+
+def test_context_extras():
+    context = get_context([])
+    calls = []
+    assert context.get_extra("pool") is None
+    assert context.get_extra("pool", lambda: calls.append(1) or [1, 2]) == [1, 2]
+    assert context.get_extra("pool", lambda: calls.append(1) or [3]) == [1, 2]
+    assert len(calls) == 1
@@ -0,0 +1,70 @@
+from subclient.decoders.evm_abi import get_selector_table
+
+staking_address = "0x0000000000000000000000000000000000000800"
+candidate = "0xaA795bB2c69B1419c4e0b56706777e9a68bac42b"
+
+
+def encode_call(signature: str, types: list, values: list) -> bytes:
+    from eth_abi import encode_abi
+    from eth_utils import function_signature_to_4byte_selector
+    return function_signature_to_4byte_selector(signature) + encode_abi(types, values)
+
+
+def test_selector_table_decode():
+    data = encode_call("delegator_bond_more(address,uint256)", ["address", "uint256"], [candidate, 177 * 10 ** 18])
+    func, params = get_selector_table().decode(staking_address.upper().replace("X", "x"), "0x" + data.hex())
+    assert func.contract == "ParachainStaking"
+    assert func.name == "delegator_bond_more"
+    assert params["candidate"] == candidate
+    assert params["more"] == 177 * 10 ** 18
+
+
+def test_selector_table_unknown():
+    table = get_selector_table()
+    assert table.get_contract_name("0x0000000000000000000000000000000000000801") is None
+    assert table.decode(staking_address, b"\x00\x00\x00\x00") is None
+    assert table is get_selector_table()
+
+
+def test_selector_table_decode_log():
+    from eth_abi import encode_abi
+    table = get_selector_table()
+    topics = table.get_event_topics(["IERC20.Transfer"])
+    assert len(topics) == 1
+    sender = "0x" + "00" * 12 + candidate[2:].lower()
+    receiver = "0x" + "00" * 31 + "01"
+    event, params = table.decode_log([topics[0], sender, receiver], encode_abi(["uint256"], [5]))
+    assert event.name == "Transfer"
+    assert params["from"] == candidate
+    assert params["to"] == "0x0000000000000000000000000000000000000001"
+    assert params["value"] == 5
+    assert table.decode_log([topics[0]], b"") is None
+
+
+def test_log_scanner_adaptive_chunks():
+    from eth_abi import encode_abi
+    from subclient.decoders.moonbeam_evm_logs import SubstrateMoonbeamEVMLogScanner, EVMLogsRequestError
+    topic = get_selector_table().get_event_topics(["Transfer"])[0]
+    address_topic = "0x" + "00" * 12 + candidate[2:].lower()
+    calls = []
+
+    class FakeScanner(SubstrateMoonbeamEVMLogScanner):
+        def _get_logs(self, start_block, end_block, addresses, topics):
+            calls.append((start_block, end_block))
+            if end_block - start_block >= 50:
+                raise EVMLogsRequestError("query returned more than 10000 results")
+            return [{
+                'blockNumber': hex(start_block), 'logIndex': '0x0', 'transactionIndex': '0x1',
+                'transactionHash': "0x" + "cd" * 32, 'address': "0x0000000000000000000000000000000000000802",
+                'topics': [topic, address_topic, address_topic], 'data': "0x" + encode_abi(["uint256"], [7]).hex()
+            }]
+
+    scanner = FakeScanner("http://localhost", chunk_size=100, max_chunk_size=40)
+    result = list(scanner.scan(1, 120))
+    assert calls[0] == (1, 100)
+    assert calls[1] == (1, 50)
+    assert calls[2:] == [(51, 90), (91, 120)]
+    assert [x.block for x in result] == [1, 51, 91]
+    assert result[0].id == "1-log0"
+    assert result[0].method == "IERC20.Transfer"
+    assert result[0].amount == 7.0
@@ -0,0 +1,110 @@
+from subclient.decoders.evm_transaction import EVMTransaction
+from eth_account import Account
+import rlp
+
+account = Account.from_key("0x" + "11" * 32)
+staking_address = "0x0000000000000000000000000000000000000800"
+
+
+def hex_of(value: bytes) -> str:
+    return "0x" + bytes(value).hex()
+
+
+def test_legacy_transaction_sender():
+    signed = account.sign_transaction({
+        "nonce": 7,
+        "gasPrice": 1000000000,
+        "gas": 21000,
+        "to": staking_address,
+        "value": 10,
+        "data": "0x1234",
+        "chainId": 1284,
+    })
+    nonce, gas_price, gas, to, value, data, v, r, s = rlp.decode(signed.rawTransaction)
+    tx = EVMTransaction.from_call_args({"Legacy": {
+        "nonce": int.from_bytes(nonce, "big"),
+        "gas_price": int.from_bytes(gas_price, "big"),
+        "gas_limit": int.from_bytes(gas, "big"),
+        "action": {"Call": hex_of(to)},
+        "value": int.from_bytes(value, "big"),
+        "input": hex_of(data),
+        "signature": {"v": int.from_bytes(v, "big"), "r": hex_of(r), "s": hex_of(s)}
+    }})
+    assert tx.chain_id == 1284
+    assert tx.to.lower() == staking_address
+    assert tx.input == b"\x12\x34"
+    assert tx.sender == account.address
+
+
+def test_eip1559_transaction_sender():
+    signed = account.sign_transaction({
+        "type": 2,
+        "nonce": 3,
+        "maxPriorityFeePerGas": 1000000000,
+        "maxFeePerGas": 2000000000,
+        "gas": 50000,
+        "to": staking_address,
+        "value": 0,
+        "data": "0xabcdef",
+        "chainId": 1284,
+        "accessList": [],
+    })
+    fields = rlp.decode(bytes(signed.rawTransaction)[1:])
+    chain_id, nonce, priority_fee, max_fee, gas, to, value, data, access_list, y_parity, r, s = fields
+    tx = EVMTransaction.from_call_args({"EIP1559": {
+        "chain_id": int.from_bytes(chain_id, "big"),
+        "nonce": int.from_bytes(nonce, "big"),
+        "max_priority_fee_per_gas": int.from_bytes(priority_fee, "big"),
+        "max_fee_per_gas": int.from_bytes(max_fee, "big"),
+        "gas_limit": int.from_bytes(gas, "big"),
+        "action": {"Call": hex_of(to)},
+        "value": int.from_bytes(value, "big"),
+        "input": hex_of(data),
+        "access_list": [],
+        "odd_y_parity": bool(int.from_bytes(y_parity, "big")),
+        "r": hex_of(r),
+        "s": hex_of(s)
+    }})
+    assert tx.tx_type == "EIP1559"
+    assert tx.sender == account.address
+
+
+def test_decoder_without_rpc():
+    from eth_abi import encode_abi
+    from eth_utils import function_signature_to_4byte_selector
+    from subclient.context import SubstrateBlockContext
+    from subclient.decoders import SubstrateMoonbeamEVMExtrinsicDecoder
+    from tests.test_context import RawItem
+    candidate = "0xaA795bB2c69B1419c4e0b56706777e9a68bac42b"
+    data = function_signature_to_4byte_selector("delegator_bond_more(address,uint256)") + \
+        encode_abi(["address", "uint256"], [candidate, 21 * 10 ** 18])
+    signed = account.sign_transaction({
+        "nonce": 1, "gasPrice": 1000000000, "gas": 50000, "to": staking_address, "value": 0, "data": data,
+        "chainId": 1284,
+    })
+    nonce, gas_price, gas, to, value, data, v, r, s = rlp.decode(signed.rawTransaction)
+    transaction = {"Legacy": {
+        "nonce": 1, "gas_price": 1000000000, "gas_limit": 50000, "action": {"Call": hex_of(to)}, "value": 0,
+        "input": hex_of(data), "signature": {"v": int.from_bytes(v, "big"), "r": hex_of(r), "s": hex_of(s)}
+    }}
+    call = {"call_module": "Ethereum", "call_function": "transact", "call_args": [
+        {"name": "transaction", "type": "TransactionV2", "value": transaction}
+    ]}
+    executed = RawItem({'extrinsic_idx': 1, 'module_id': 'Ethereum', 'event_id': 'Executed',
+                        'attributes': [account.address, staking_address, "0x" + "ab" * 32, {'Succeed': 'Returned'}]})
+    context = SubstrateBlockContext(
+        number=5,
+        hash="0x05",
+        extrinsics=[RawItem({"call": call}), RawItem({"call": call})],
+        events_loader=lambda: [executed]
+    )
+    result = SubstrateMoonbeamEVMExtrinsicDecoder().decode(context=context, index=1)
+    assert len(result) == 1
+    ex = result[0]
+    assert ex.method == "ParachainStaking.DelegatorBondMore"
+    assert ex.get_param("from") == account.address
+    assert ex.get_param("candidate") == candidate
+    assert ex.get_param("evmTransactionIndex") == "1"
+    assert ex.get_param("evmTransactionHash") == "0x" + "ab" * 32
+    assert ex.get_param("transaction") is None
+    assert ex.amount == 21 * 10 ** 18
@@ -0,0 +1,74 @@
+import pytest
+from subclient.export import SubstrateExtrinsicExporter, read_npz_export, export_extrinsics
+from subclient.extrinsics import SubstrateExtrinsic
+
+export_path = ".pytest_cache/export"
+
+
+def get_extrinsics(block: int, count: int):
+    result = []
+    for index in range(count):
+        ex = SubstrateExtrinsic(id=f"{block}-{index}", block=block, module="Balances", function="Transfer",
+                                ex_type="Substrate")
+        ex.add_address(name="from", value=f"0x{index:04x}")
+        ex.add_amount(name="value", value=1.5 * index)
+        result.append(ex)
+    return result
+
+
+class ExportTestClient:
+
+    # noinspection PyUnusedLocal
+    def iter_extrinsics(self, start_block: int, end_block: int, ex_filter=None, processes: int = 0):
+        for block_nr in range(start_block, end_block + 1):
+            yield block_nr, get_extrinsics(block_nr, 3)
+
+
+def test_export_npz():
+    pytest.importorskip("numpy")
+    import os
+    os.makedirs(".pytest_cache", exist_ok=True)
+    path = f"{export_path}.npz"
+    rows = export_extrinsics(ExportTestClient(), 10, 14, path, format="npz", row_group_size=4)
+    assert rows == 15
+    data = read_npz_export(path)
+    assert list(data["block"]) == [b for b in range(10, 15) for _ in range(3)]
+    assert list(data["index"][:3]) == [0, 1, 2]
+    assert data["from"][1] == "0x0001"
+    assert data["amount"][2] == 3.0
+    assert data["params"][2] == '{"from":"0x0002","value":"3.0"}'
+
+
+def test_export_parquet():
+    pytest.importorskip("pyarrow")
+    import os
+    import pyarrow.parquet as pq
+    os.makedirs(".pytest_cache", exist_ok=True)
+    path = f"{export_path}.parquet"
+    with SubstrateExtrinsicExporter(path, format="parquet", row_group_size=5) as exporter:
+        for block in range(3):
+            exporter.write(get_extrinsics(block, 3))
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == 9
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.column("module").to_pylist() == ["Balances"] * 9
+    assert table.column("amount").to_pylist()[:3] == [0.0, 1.5, 3.0]
+
+
+def test_iter_extrinsics_skips_head(monkeypatch):
+    from subclient.core import SubstrateClient
+    from tests.test_filter import FilterTestClient, get_context
+    client = FilterTestClient()
+    monkeypatch.setattr(SubstrateClient, "last_block_number", property(lambda self: pytest.fail("head read")))
+    monkeypatch.setattr(FilterTestClient, "_get_block_context", lambda self, block_nr, block_hash=None: get_context([]))
+    blocks = list(client.iter_extrinsics(1, 2))
+    assert [(nr, len(extrinsics)) for nr, extrinsics in blocks] == [(1, 3), (2, 3)]
+
+
+def test_export_missing_requirement(monkeypatch):
+    import importlib.util
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None if name == "pyarrow" else find_spec(name))
+    with pytest.raises(ImportError, match=r"substrate-cli-tools\[export\]"):
+        SubstrateExtrinsicExporter(f"{export_path}.parquet", format="parquet")
@@ -0,0 +1,50 @@
+from subclient.extrinsics import SubstrateExtrinsic, SubstrateExtrinsicParam, SubstrateExtrinsicParamType
+
+
+def get_extrinsic() -> SubstrateExtrinsic:
+    ex = SubstrateExtrinsic(id="10-1", block=10, module="Balances", function="Transfer", ex_type="Substrate")
+    ex.add_address(name="from", value="0xAbC")
+    ex.add_amount(name="value", value=2500000000000000000)
+    ex.add_generic(name="memo", value={"a": 1})
+    return ex
+
+
+def test_extrinsic_typed_params():
+    ex = get_extrinsic()
+    assert ex.get_param("VALUE") == 2500000000000000000
+    assert ex.amount == 2.5e18
+    assert ex.get_param("memo") == {"a": 1}
+    assert ex.params[2].text == "{'a': 1}"
+    assert str(ex) == "#10-1:Substrate:Balances.Transfer(from:ADDRESS=0xAbC,value:AMOUNT=2500000000000000000," \
+                      "memo:GENERIC={'a': 1})"
+
+
+def test_extrinsic_param_index():
+    ex = get_extrinsic()
+    assert ex.get_param("from") == "0xAbC"
+    # Direct appends and duplicates keep first match semantics
+    ex.params.append(SubstrateExtrinsicParam(name="extra", value=1))
+    ex.add_address(name="from", value="0xdef")
+    assert ex.get_param("extra") == 1
+    assert ex.get_param("from") == "0xAbC"
+    ex.rm_param("FROM")
+    assert ex.get_param("from") is None
+    assert [x.name for x in ex.params] == ["value", "memo", "extra"]
+
+
+def test_extrinsic_param_value_update():
+    ex = get_extrinsic()
+    param = ex.params[1]
+    assert param.text == "2500000000000000000"
+    param.value = 2.5
+    assert param.text == "2.5"
+    assert param.param_type == SubstrateExtrinsicParamType.AMOUNT
+    assert ex.amount == 2.5
+
+
+def test_extrinsic_pickle():
+    import pickle
+    ex = pickle.loads(pickle.dumps(get_extrinsic()))
+    assert ex.method == "Balances.Transfer"
+    assert ex.get_param("from") == "0xAbC"
+    assert ex.amount == 2.5e18
@@ -0,0 +1,80 @@
+from subclient.context import SubstrateBlockContext
+from subclient.core import SubstrateClient, SubstrateEndpoint
+from subclient.extrinsics import SubstrateExtrinsicFilter
+from tests.test_context import RawItem
+
+
+class FilterTestClient(SubstrateClient):
+    enriched: list
+
+    def __init__(self):
+        super().__init__(SubstrateEndpoint(chain_id="test", wss_endpoints=[], client_type=SubstrateClient), None)
+        self.enriched = []
+
+    @property
+    def total_inflation(self) -> float:
+        return 0.0
+
+    def _should_decode_extrinsic(self, pallet: str, method: str) -> bool:
+        return pallet in ("Balances", "ParachainStaking")
+
+    def _on_extrinsic_decoded(self, ex, context):
+        self.enriched.append(ex.id)
+
+
+def call(module: str, function: str, dest: str) -> RawItem:
+    return RawItem({'call': {'call_module': module, 'call_function': function, 'call_args': [
+        {'name': 'dest', 'type': 'LookupSource', 'value': dest},
+        {'name': 'value', 'type': 'Balance', 'value': 100},
+    ]}})
+
+
+def get_context(loads: list) -> SubstrateBlockContext:
+    return SubstrateBlockContext(
+        number=1,
+        hash="0x01",
+        extrinsics=[
+            call("Balances", "transfer", "0xaaaa"),
+            call("ParachainStaking", "delegator_bond_more", "0xbbbb"),
+            call("Balances", "transfer", "0xcccc"),
+        ],
+        events_loader=lambda: loads.append(1) or []
+    )
+
+
+def test_filter_compiled_patterns():
+    ex_filter = SubstrateExtrinsicFilter(method_pattern="balances")
+    assert ex_filter.match_method("Balances.Transfer")
+    assert not ex_filter.match_method("ParachainStaking.DelegatorBondMore")
+    ex_filter.method_pattern = None
+    assert ex_filter.match_method("ParachainStaking.DelegatorBondMore")
+
+
+def test_filter_push_down_method():
+    loads = []
+    client = FilterTestClient()
+    result = client._decode_block(get_context(loads), SubstrateExtrinsicFilter(method_pattern="DelegatorBond"))
+    assert [x.id for x in result] == ["1-1"]
+    assert client.enriched == ["1-1"]
+
+
+def test_filter_push_down_address():
+    client = FilterTestClient()
+    result = client._decode_block(get_context([]), SubstrateExtrinsicFilter(address_pattern="0xCC"))
+    assert [x.id for x in result] == ["1-2"]
+    assert client.enriched == ["1-2"]
+
+
+def test_filter_push_down_skips_events():
+    loads = []
+    client = FilterTestClient()
+    assert client._decode_block(get_context(loads), SubstrateExtrinsicFilter(method_pattern="Utility")) == []
+    assert not loads
+
+
+def test_filter_no_push_down_on_any():
+    client = FilterTestClient()
+    ex_filter = SubstrateExtrinsicFilter(address_pattern="0xcc", method_pattern="DelegatorBond", match_all=False)
+    result = client._decode_block(get_context([]), ex_filter)
+    assert [x.id for x in result] == ["1-0", "1-1", "1-2"]
+    assert len(client.enriched) == 3
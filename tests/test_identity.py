@@ -0,0 +1,78 @@
+from subclient import identity
+from subclient.cache import CacheWrapper
+from subclient.core import SubstrateClient, SubstrateEndpoint
+from subclient.extrinsics import SubstrateExtrinsic
+from subclient.identity import SubstrateIdentity, SubstrateIdentityCache
+
+identities = {
+    "0xaaaa": {'info': {'display': {'Raw': 'Alice'}}},
+    "0xbbbb": {'info': {'display': {'None': None}}},
+}
+supers = {
+    "0xcccc": ("0xaaaa", {'Raw': 'collator-1'}),
+}
+
+
+class IdentityTestClient(SubstrateClient):
+    queries: list
+
+    def __init__(self):
+        super().__init__(SubstrateEndpoint(chain_id="test", wss_endpoints=[], client_type=SubstrateClient), None)
+        self.queries = []
+
+    @property
+    def total_inflation(self) -> float:
+        return 0.0
+
+    def _query_multi(self, module: str, storage_function: str, params: list, block_hash: str = None) -> list:
+        self.queries.append((storage_function, [x[0] for x in params]))
+        storage = identities if storage_function == "IdentityOf" else supers
+        return [storage.get(x[0]) for x in params]
+
+
+def test_resolve_identities():
+    client = IdentityTestClient()
+    ex = SubstrateExtrinsic(id="1-0", block=1, module="Balances", function="Transfer", ex_type="Substrate")
+    ex.add_address(name="from", value="0xaaaa")
+    ex.add_address(name="to", value="0xcccc")
+    other = SubstrateExtrinsic(id="1-1", block=1, module="Balances", function="Transfer", ex_type="Substrate")
+    other.add_address(name="from", value="0xbbbb")
+    other.add_address(name="to", value="0xaaaa")
+    result = client.resolve_identities([ex, other])
+    # One read per storage, parent already resolved in the same batch
+    assert client.queries == [
+        ("IdentityOf", ["0xaaaa", "0xcccc", "0xbbbb"]),
+        ("SuperOf", ["0xcccc", "0xbbbb"]),
+    ]
+    assert str(result["0xaaaa"]) == "Alice"
+    assert str(result["0xbbbb"]) == "0xbbbb"
+    assert str(result["0xcccc"]) == "Alice/collator-1"
+    # Formatting only hits the identity cache
+    assert str(client.get_identity("0xcccc")) == "Alice/collator-1"
+    assert len(client.queries) == 2
+
+
+def test_identity_cache_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(identity, "monotonic", lambda: now[0])
+    cache = SubstrateIdentityCache(CacheWrapper(None), expire=60, max_size=2)
+    cache.set(SubstrateIdentity("0xaaaa", "Alice"))
+    now[0] += 30
+    cache.set(SubstrateIdentity("0xbbbb", "Bob"))
+    assert cache.missing(["0xaaaa", "0xcccc", "0xbbbb", "0xcccc"]) == ["0xcccc"]
+    # Expired in memory like on disk
+    now[0] += 40
+    assert cache.get("0xaaaa") is None and str(cache.get("0xbbbb")) == "Bob"
+    # The oldest is dropped past the size
+    cache.set(SubstrateIdentity("0xaaaa", "Alice"))
+    cache.set(SubstrateIdentity("0xcccc", "Carol"))
+    assert cache.missing(["0xaaaa", "0xbbbb", "0xcccc"]) == ["0xbbbb"]
+
+
+def test_identity_cache_missing_many():
+    from time import perf_counter
+    cache = SubstrateIdentityCache(CacheWrapper(None))
+    addresses = [f"0x{x:040x}" for x in range(20000)]
+    start = perf_counter()
+    assert cache.missing(addresses + addresses) == addresses
+    assert perf_counter() - start < 1
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+# Modules only needed once a client connects or decodes
+heavy_modules = ("substrateinterface", "scalecodec", "diskcache", "websocket", "web3", "eth_utils", "eth_abi",
+                 "eth_keys", "requests", "pyarrow", "numpy")
+# Cumulative microseconds for our own top level imports, generous so slow machines do not fail it
+import_budget_us = 150000
+
+
+def get_import_times(*args: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_help_import_time():
+    times = get_import_times("-m", "subtools", "--help")
+    loaded = [x for x in times if x.split(".")[0] in heavy_modules]
+    assert not loaded, f"heavy modules imported by --help: {loaded}"
+    total = sum(v for k, v in times.items() if k.split(".")[0] in ("subclient", "subtools") and "." not in k)
+    assert total < import_budget_us
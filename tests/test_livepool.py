@@ -0,0 +1,131 @@
+from random import Random
+from subclient.endpoint import SubstrateEndpoint
+from subclient.livepool import SubstrateLiveCandidatePool
+from subclient.moonbeam import MoonbeamClient, rank_candidates
+
+
+class LivePoolTestClient(MoonbeamClient):
+
+    def __init__(self):
+        super().__init__(SubstrateEndpoint(chain_id="test", wss_endpoints=[], client_type=MoonbeamClient), None)
+
+    def token_humanize(self, value) -> float:
+        return float(value) / 10 ** 18
+
+
+def get_info(total: int, status: str = "Active") -> dict:
+    return {'total_counted': total * 10 ** 18, 'status': status}
+
+
+def get_expected(info: dict, selected: list) -> list:
+    pool = sorted([dict(v, id=k) for k, v in info.items()], key=lambda x: x['total_counted'], reverse=True)
+    return [vars(x) for x in rank_candidates(pool, selected, lambda x: float(x) / 10 ** 18)]
+
+
+def test_live_pool_incremental_ranks():
+    random = Random(7)
+    client = LivePoolTestClient()
+    live_pool = SubstrateLiveCandidatePool(client, url="ws://unused")
+    totals = random.sample(range(1000, 100000), 400)
+    info = {f"0x{i:040x}": get_info(totals.pop()) for i in range(60)}
+    selected = list(info)[:20]
+    live_pool.apply(dict(info), selected=selected)
+    assert [vars(x) for x in live_pool.snapshot] == get_expected(info, selected)
+    for step in range(200):
+        address = random.choice(list(info))
+        if step % 50 == 49:
+            # Candidate leaving, one joining
+            del info[address]
+            new = f"0x{1000 + step:040x}"
+            info[new] = get_info(totals.pop())
+            live_pool.apply({address: None, new: info[new]})
+        elif step % 40 == 39:
+            selected = random.sample(list(info), 20)
+            live_pool.apply({}, selected=selected)
+        else:
+            info[address] = get_info(totals.pop(), status=random.choice(["Active", "Idle"]))
+            live_pool.apply({address: info[address]})
+        assert [vars(x) for x in live_pool.snapshot] == get_expected(info, selected)
+    address = list(info)[3]
+    assert live_pool.get(address.upper().replace("0X", "0x")).address == address
+
+
+def test_live_pool_serves_client():
+    client = LivePoolTestClient()
+    live_pool = SubstrateLiveCandidatePool(client, url="ws://unused")
+    live_pool.apply({"0xaaaa": get_info(10), "0xbbbb": get_info(20)}, selected=["0xbbbb"])
+    # Marked as running without a subscription
+    live_pool._ready.set()
+    client._live_candidate_pool = live_pool
+    # Nothing is read from the node
+    assert [x.address for x in client.get_candidate_pool(skip_cache=True)] == ["0xbbbb", "0xaaaa"]
+    candidate = client.get_candidate("0xAAAA")
+    assert candidate.rank == 2 and not candidate.selected and candidate.rank_last_selected_at == -10.0
+
+
+class FakeRecord:
+
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeLivePoolApi:
+    """Node with the candidate pool storage, values are passed through undecoded"""
+
+    def __init__(self, info: dict, pool: list, selected: list):
+        self.info = info
+        self.pool = pool
+        self.selected = selected
+
+    @staticmethod
+    def get_chain_head():
+        return "0x01"
+
+    def query_map(self, module, storage_function, params, block_hash):
+        records = [(FakeRecord(k), FakeRecord(v)) for k, v in self.info.items()]
+        return type("QueryMapResult", (), {'records': records})
+
+    def rpc_request(self, method, params, result_handler=None):
+        if method == "state_getStorageAt":
+            return {'result': [{'owner': x} for x in self.pool]}
+        if method == "state_subscribeStorage":
+            changes = [["CandidatePool", [{'owner': x} for x in self.pool]], ["SelectedCandidates", self.selected]]
+            changes += [[f"CandidateInfo:{k}", v] for k, v in self.info.items()]
+            assert sorted(params[0]) == sorted(x[0].lower() for x in changes)
+            result_handler({'params': {'result': {'changes': changes}}}, 0, "sub")
+            return "sub"
+        assert method == "state_unsubscribeStorage"
+
+
+def test_live_pool_subscribe(monkeypatch):
+    from subclient import core
+    monkeypatch.setattr(core, "_storage_keys",
+                        lambda api, module, name, params, block_hash: ([":".join([name] + x) for x in params], name))
+    monkeypatch.setattr(core, "_decode_storage", lambda api, item, data: data)
+    client = LivePoolTestClient()
+    live_pool = SubstrateLiveCandidatePool(client, url="ws://unused")
+    live_pool.apply({"0xaaaa": get_info(10), "0xbbbb": get_info(20)}, selected=["0xbbbb"])
+    # 0xaaaa left while disconnected, 0xcccc is offline and only in CandidateInfo
+    live_pool._api = FakeLivePoolApi({"0xbbbb": get_info(20), "0xcccc": get_info(30, "Idle")}, ["0xbbbb"],
+                                     ["0xbbbb"])
+    live_pool._subscribe()
+    assert [x.address for x in live_pool.snapshot] == ["0xcccc", "0xbbbb"]
+    assert live_pool.get("0xaaaa") is None and live_pool.running
+
+
+def test_live_pool_not_running_after_disconnect():
+    client = LivePoolTestClient()
+    live_pool = SubstrateLiveCandidatePool(client, url="ws://unused", retry_delay=0)
+    live_pool._ready.set()
+    calls = []
+
+    def subscribe():
+        calls.append(live_pool.running)
+        if len(calls) == 1:
+            raise ConnectionError("closed")
+        live_pool._stop.set()
+
+    live_pool._subscribe = subscribe
+    live_pool._run()
+    # Stale pool is no longer served once the subscription dropped
+    assert calls == [True, False]
@@ -0,0 +1,66 @@
+from subclient.cache import CacheWrapper
+from subclient.metadata import SubstrateMetadataCache
+
+
+class FakeMetadata:
+
+    def __init__(self, data: bytes):
+        from scalecodec.base import ScaleBytes
+        self.data = ScaleBytes(bytearray(data))
+        self.decoded = False
+
+    def decode(self):
+        self.decoded = True
+
+
+class FakeRuntimeConfig:
+
+    # noinspection PyUnusedLocal
+    def create_scale_object(self, type_string: str, data=None):
+        return FakeMetadata(bytes(data.data))
+
+
+class FakeApi:
+    cache_region = None
+    runtime_config = FakeRuntimeConfig()
+
+
+def test_metadata_cache(tmp_path):
+    disk = CacheWrapper(str(tmp_path))
+    cache = SubstrateMetadataCache("metadata-test", disk)
+    api = cache.attach(FakeApi())
+    assert api.cache_region.cache is cache and api.cache_region.api is api
+    assert cache.get("METADATA_1200") is None
+    metadata = FakeMetadata(b"\x0e\x01\x02")
+    cache.set("METADATA_1200", metadata)
+    # Same process reuses the decoded object
+    assert cache.get("METADATA_1200") is metadata
+    # A new process decodes the raw metadata from disk, other chains do not share it
+    SubstrateMetadataCache._decoded.clear()
+    restored = SubstrateMetadataCache("metadata-test", disk)
+    decoded = restored.attach(FakeApi()).cache_region.get("METADATA_1200")
+    assert decoded.decoded and bytes(decoded.data.data) == b"\x0e\x01\x02"
+    other = SubstrateMetadataCache("other", disk)
+    assert other.attach(FakeApi()).cache_region.get("METADATA_1200") is None
+
+
+class OtherRuntimeConfig:
+
+    # noinspection PyUnusedLocal
+    def create_scale_object(self, type_string: str, data=None):
+        raise ValueError("decoded with the wrong connection")
+
+
+def test_metadata_cache_shared(tmp_path):
+    disk = CacheWrapper(str(tmp_path))
+    SubstrateMetadataCache("metadata-shared", disk).set("METADATA_1300", FakeMetadata(b"\x0e\x03"))
+    SubstrateMetadataCache._decoded.clear()
+    # Connections sharing the cache decode with their own runtime config, not the last attached one
+    cache = SubstrateMetadataCache("metadata-shared", disk)
+    client = cache.attach(FakeApi())
+    tracker = cache.attach(FakeApi())
+    tracker.runtime_config = OtherRuntimeConfig()
+    decoded = client.cache_region.get("METADATA_1300")
+    assert decoded.decoded and bytes(decoded.data.data) == b"\x0e\x03"
+    SubstrateMetadataCache._decoded.clear()
+    assert tracker.cache_region.get("METADATA_1300") is None
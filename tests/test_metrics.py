@@ -0,0 +1,38 @@
+from subclient.metrics import SubstrateMetrics
+
+
+def test_metrics_render():
+    metrics = SubstrateMetrics(buckets=(0.1, 1.0))
+    metrics.inc("subclient_blocks_total", chain="moonbeam")
+    metrics.inc("subclient_blocks_total", 2, chain="moonbeam")
+    metrics.set("subclient_head_lag_blocks", 7, chain="moonbeam")
+    for value in (0.05, 0.5, 5.0):
+        metrics.observe("subclient_rpc_seconds", value, method="chain_getBlock", endpoint="wss://node")
+    assert metrics.get("subclient_blocks_total", chain="moonbeam") == 3
+    lines = metrics.render().splitlines()
+    assert 'subclient_blocks_total{chain="moonbeam"} 3' in lines
+    assert 'subclient_head_lag_blocks{chain="moonbeam"} 7' in lines
+    assert "# TYPE subclient_rpc_seconds histogram" in lines
+    labels = 'endpoint="wss://node",method="chain_getBlock"'
+    assert f'subclient_rpc_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'subclient_rpc_seconds_bucket{{{labels},le="1.0"}} 2' in lines
+    assert f'subclient_rpc_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f'subclient_rpc_seconds_count{{{labels}}} 3' in lines
+    # Unused metrics are not rendered
+    assert not [x for x in lines if "reconnects" in x]
+
+
+def test_metrics_endpoint():
+    import urllib.request
+    from subclient.metrics import metrics
+    from subtools.cli import serve_metrics
+    server = serve_metrics(0)
+    try:
+        metrics.inc("subclient_reconnects_total", function="get_extrinsics")
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode()
+        assert 'subclient_reconnects_total{function="get_extrinsics"}' in body
+    finally:
+        server.shutdown()
+        metrics.enabled = False
+        metrics.clear()
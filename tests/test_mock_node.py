@@ -0,0 +1,60 @@
+from benchmarks import fixtures
+from benchmarks.mock_node import MockRecording, MockSubstrateNode
+
+
+def test_mock_node_websocket(tmp_path):
+    from time import perf_counter
+    import pytest
+    from substrateinterface import SubstrateInterface
+    from substrateinterface.exceptions import SubstrateRequestException
+    recording = MockRecording(meta={'chain': "moonbeam"})
+    recording.add("system_chain", [], "Moonbeam")
+    recording.add("chain_getBlockHash", [10], "0x10")
+    path = str(tmp_path / "recording.jsonl.gz")
+    recording.save(path)
+    loaded = MockRecording.load(path)
+    assert loaded.meta == {'chain': "moonbeam"}
+    with MockSubstrateNode(loaded, latency=0.01) as node:
+        api = SubstrateInterface(url=node.ws_url)
+        start = perf_counter()
+        assert api.rpc_request("chain_getBlockHash", [10])['result'] == "0x10"
+        assert perf_counter() - start >= 0.01
+        with pytest.raises(SubstrateRequestException):
+            api.rpc_request("chain_getBlockHash", [11])
+        api.close()
+        assert node.request_count == 3
+
+
+def test_mock_node_http_logs():
+    from subclient.decoders import SubstrateMoonbeamEVMLogScanner
+
+    def get_logs(params):
+        return fixtures.get_transfer_logs(int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16), 2)
+
+    with MockSubstrateNode(handlers={"eth_getLogs": get_logs}) as node:
+        scanner = SubstrateMoonbeamEVMLogScanner(node.http_url, chunk_size=10)
+        logs = list(scanner.scan(1, 25, events=["Transfer"]))
+    assert len(logs) == 50
+    assert logs[0].block == 1
+    assert logs[-1].block == 25
+
+
+def test_mock_chain_replay():
+    import pytest
+    from benchmarks.mock_chain import get_candidate_total, get_mock_recording
+    from subclient.endpoint import SubstrateEndpoint
+    recording = get_mock_recording(start_block=100, count=3, block_size=4, candidates=10, selected=4)
+    with MockSubstrateNode(recording) as node:
+        endpoint = SubstrateEndpoint(chain_id="moonbeam", wss_endpoints=[node.ws_url],
+                                     client_type="subclient.moonbeam.MoonbeamClient")
+        client = endpoint.get_client(cache_path=None)
+        result = client.get_extrinsics(start_block=100, end_block=102)
+        pool = client.get_candidate_pool(skip_cache=True)
+        client.close()
+    assert [x.id for x in result[:5]] == ["100-0", "100-1", "100-2", "100-3", "101-0"] and len(result) == 12
+    assert [x.method for x in result] == ["Balances.Transfer"] * 12
+    assert result[0].amount == 21.0
+    # Every CandidateInfo entry ranked, every fifth one idle
+    assert [x.rank for x in pool] == list(range(1, 11))
+    assert pool[0].total_counted == pytest.approx(get_candidate_total(0) / 10 ** 18)
+    assert [x.active for x in pool[3:5]] == [True, False] and [x.selected for x in pool[3:5]] == [True, False]
@@ -0,0 +1,57 @@
+import json
+from subclient.profiler import SubstrateProfiler
+
+
+class FakeApi:
+
+    # noinspection PyUnusedLocal
+    def rpc_request(self, method, params, result_handler=None):
+        return {'result': method}
+
+
+def test_profiler_stages(tmp_path):
+    profiler = SubstrateProfiler()
+    records = []
+    profiler.add_hook(records.append)
+    # Disabled profiler hands out the same no op context
+    assert profiler.stage("decode") is profiler.stage("enrich")
+    profiler.enabled = True
+    profiler.trace = True
+    for block in (10, 11):
+        with profiler.block(block, chain="moonbeam"):
+            with profiler.stage("get_block"):
+                with profiler.stage("rpc:chain_getBlock"):
+                    pass
+            for _ in range(3):
+                with profiler.stage("decode:SubstrateExtrinsicDecoder"):
+                    pass
+    with profiler.stage("output"):
+        pass
+    assert profiler.blocks == 2
+    assert [x.block for x in records[:3]] == [10, 10, 10]
+    assert records[-1].stage == "output" and records[-1].block is None
+    summary = {x[0]: x for x in profiler.summary()}
+    assert summary["decode:SubstrateExtrinsicDecoder"][1] == 6
+    assert summary["block"][1] == 2
+    assert summary["block"][2] >= summary["get_block"][2] >= summary["rpc:chain_getBlock"][2]
+    assert "2 blocks" in profiler.render_summary()
+    path = str(tmp_path / "trace.json")
+    profiler.write_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == len(records)
+    assert events[0]["ph"] == "X" and events[0]["args"]["block"] == 10
+
+
+def test_profiler_rpc():
+    from subclient.metrics import instrument_api
+    from subclient.profiler import profiler
+    api = instrument_api(FakeApi(), "wss://node")
+    profiler.enabled = True
+    try:
+        with profiler.block(5):
+            api.rpc_request("chain_getHeader", [])
+        assert dict((x[0], x[1]) for x in profiler.summary())["rpc:chain_getHeader"] == 1
+    finally:
+        profiler.enabled = False
+        profiler.clear()
@@ -0,0 +1,65 @@
+import json
+from subclient.core import SubstrateBlockHeader
+from subclient.reorg import SubstrateReorgTracker
+from subtools.cli import Cli
+from tests.test_export import get_extrinsics
+
+
+def get_header(number: int, branch: str = "a", fork: int = 0) -> SubstrateBlockHeader:
+    # Blocks from the fork height on are different on every branch
+    def block_hash(nr: int):
+        return f"0x{branch if nr >= fork else 'a'}{nr}"
+    return SubstrateBlockHeader(number=number, hash=block_hash(number), parent_hash=block_hash(number - 1))
+
+
+def test_reorg_tracker():
+    tracker = SubstrateReorgTracker(window=4)
+    for nr in range(10, 16):
+        header = get_header(nr)
+        assert tracker.orphaned(header, lambda x: get_header(x).hash) == []
+        tracker.add(header, get_extrinsics(nr, 1))
+    assert len(tracker) == 4
+    # Branch b replaced blocks 14 and 15
+    header = get_header(16, branch="b", fork=14)
+    orphaned = tracker.orphaned(header, lambda x: get_header(x, branch="b", fork=14).hash)
+    assert [x.number for x in orphaned] == [14, 15]
+    assert [x.hash for x in orphaned] == ["0xa14", "0xa15"]
+    assert len(tracker) == 2
+    # Processing goes on from the fork point
+    assert tracker.orphaned(get_header(14, branch="b", fork=14), lambda x: x) == []
+
+
+class BestHeadTestClient:
+    block_duration = 0.01
+    best_block_number = 19
+
+    def __init__(self):
+        self.branch = "a"
+
+    def get_block_hash(self, block_nr: int) -> str:
+        return get_header(block_nr, self.branch, fork=17).hash
+
+    def get_block_header(self, block_nr: int) -> SubstrateBlockHeader:
+        # Block 19 is imported on a branch that replaces 17 and 18
+        if block_nr == 19:
+            self.branch = "b"
+        return get_header(block_nr, self.branch, fork=17)
+
+    # noinspection PyUnusedLocal
+    def get_block_extrinsics(self, header: SubstrateBlockHeader, ex_filter=None):
+        return get_extrinsics(header.number, 1)
+
+
+def test_event_watch_best_head(tmp_path, monkeypatch):
+    client = BestHeadTestClient()
+    monkeypatch.setattr(Cli, "_get_client", lambda self, chain=None: client)
+    cli = Cli(chain="moonbeam", cache_path=str(tmp_path / "cache"))
+    output = str(tmp_path / "watch.ndjson")
+    cli.event_watch(address=None, method=None, min_amount=0, tail=False, count=4, format="json", output=output,
+                    checkpoint="watch", best_head=True)
+    with open(output) as f:
+        rows = [(x["block"], x["retracted"]) for x in map(json.loads, f)]
+    assert rows == [(15, False), (16, False), (17, False), (18, False), (18, True), (17, True),
+                    (17, False), (18, False), (19, False)]
+    with open(tmp_path / "cache" / "checkpoints" / "moonbeam_watch.json") as f:
+        assert json.load(f)["hash"] == "0xb19"
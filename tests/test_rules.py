@@ -0,0 +1,108 @@
+from subclient.extrinsics import SubstrateExtrinsic
+from subclient.rules import SubstrateWatchRule, SubstrateWatchRuleSet, load_rules
+from tests.test_filter import FilterTestClient, get_context
+
+
+def get_extrinsic(function: str, dest: str, value: float) -> SubstrateExtrinsic:
+    ex = SubstrateExtrinsic(id="1-0", block=1, module="Balances", function=function, ex_type="Substrate")
+    ex.add_address(name="from", value="0xffff")
+    ex.add_address(name="dest", value=dest)
+    ex.add_amount(name="value", value=value)
+    return ex
+
+
+def get_rules() -> SubstrateWatchRuleSet:
+    return SubstrateWatchRuleSet([
+        SubstrateWatchRule("delegators", addresses=[f"0x{x:04x}" for x in range(3000)], output="delegators.ndjson"),
+        SubstrateWatchRule("whales", addresses=["0x0AAA"], method_pattern="transfer", min_amount=1000),
+        SubstrateWatchRule("staking", method_pattern="^ParachainStaking"),
+        SubstrateWatchRule("cc", address_pattern="0xCC", method_pattern="transfer|bond"),
+    ])
+
+
+def test_rules_matching():
+    rules = get_rules()
+    assert [x.name for x in rules.matching(get_extrinsic("Transfer", "0x0aaa", 5000))] == ["delegators", "whales"]
+    assert [x.name for x in rules.matching(get_extrinsic("Transfer", "0x0aaa", 10))] == ["delegators"]
+    assert [x.name for x in rules.matching(get_extrinsic("Transfer", "0xcccc", 10))] == ["cc"]
+    assert rules.matching(get_extrinsic("Remark", "0xcccc", 10)) == []
+    assert rules.route(get_extrinsic("Transfer", "0x0aaa", 5000)) == {"delegators.ndjson", None}
+    # Rules without method pattern match any method
+    assert rules.match_method("Utility.Batch")
+    rules = SubstrateWatchRuleSet(rules.rules[1:])
+    assert rules.match_method("ParachainStaking.DelegatorBondMore")
+    assert not rules.match_method("Utility.Batch")
+
+
+def test_rules_push_down():
+    client = FilterTestClient()
+    rules = SubstrateWatchRuleSet([
+        SubstrateWatchRule("a", addresses=["0xAAAA"]),
+        SubstrateWatchRule("bond", method_pattern="DelegatorBond"),
+    ])
+    result = client._decode_block(get_context([]), rules)
+    assert [x.id for x in result] == ["1-0", "1-1"]
+    assert client.enriched == ["1-0", "1-1"]
+
+
+def test_load_rules(tmp_path):
+    import json
+    import pytest
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({'rules': [{'name': "a", 'addresses': ["0xaaaa"], 'output': "a.csv"},
+                                          {'name': "b", 'method': "transfer", 'min_amount': 10}]}))
+    rules = load_rules(str(path))
+    assert rules.outputs == {"a.csv", None}
+    assert rules.rules[1].min_amount == 10
+    path.write_text(json.dumps([{'name': "a"}, {'name': "a"}]))
+    with pytest.raises(ValueError, match="'a'"):
+        load_rules(str(path))
+
+
+def test_rules_patterns():
+    import pytest
+    # Groups, backreferences and duplicated group names are matched apart from the joined patterns
+    rules = SubstrateWatchRuleSet([
+        SubstrateWatchRule("repeat", address_pattern=r"0x(cc)\1"),
+        SubstrateWatchRule("named", method_pattern="(?P<m>bond)"),
+        SubstrateWatchRule("named2", method_pattern="(?P<m>transfer)"),
+        SubstrateWatchRule("plain", method_pattern="remark"),
+    ])
+    assert [x.name for x in rules.matching(get_extrinsic("Transfer", "0xcccc", 10))] == ["repeat", "named2"]
+    assert [x.name for x in rules.matching(get_extrinsic("Remark", "0xcc", 10))] == ["plain"]
+    rules = SubstrateWatchRuleSet(rules.rules[1:])
+    assert rules.match_method("Staking.BondExtra") and not rules.match_method("Utility.Batch")
+    with pytest.raises(ValueError, match="rule broken"):
+        SubstrateWatchRuleSet([SubstrateWatchRule("ok", method_pattern="a"),
+                               SubstrateWatchRule("broken", method_pattern="(")])
+
+
+def test_rules_many_patterns():
+    from random import Random
+    from time import perf_counter
+    random = Random(3)
+    patterns = set()
+    while len(patterns) < 3000:
+        patterns.add(f"0x{random.getrandbits(32):08x}")
+    rules = SubstrateWatchRuleSet([SubstrateWatchRule(f"r{i}", address_pattern=x) for i, x in enumerate(patterns)] +
+                                  [SubstrateWatchRule("regex", address_pattern="^0x00ff")])
+    pattern = sorted(patterns)[7]
+    ex = get_extrinsic("Transfer", f"{pattern}{'ab' * 16}", 10)
+    start = perf_counter()
+    for _ in range(100):
+        matching = rules.matching(ex)
+    # Literal patterns are looked up, a regex per pattern or a lookahead chain takes far longer
+    assert perf_counter() - start < 0.5
+    assert [x.address_pattern for x in matching] == [pattern]
+    assert [x.name for x in rules.matching(get_extrinsic("Transfer", "0x00ff01", 10))] == ["regex"]
+
+
+def test_rules_empty(tmp_path):
+    import pytest
+    rules = SubstrateWatchRuleSet([])
+    assert not rules.match_method("Balances.Transfer")
+    assert not rules.match(get_extrinsic("Transfer", "0xcccc", 10))
+    path = tmp_path / "rules.json"
+    path.write_text("[]")
+    with pytest.raises(ValueError):
+        load_rules(str(path))
@@ -0,0 +1,93 @@
+import json
+import os
+from subtools.sinks import get_sink
+from tests.test_export import get_extrinsics
+
+sink_path = ".pytest_cache/sink"
+
+
+def test_ndjson_sink_schema():
+    os.makedirs(".pytest_cache", exist_ok=True)
+    path = f"{sink_path}.ndjson"
+    with get_sink("json", path=path) as sink:
+        for ex in get_extrinsics(7, 2):
+            sink.write(ex)
+    with open(path) as f:
+        rows = [json.loads(x) for x in f]
+    assert len(rows) == 2
+    assert list(rows[0].keys()) == ["id", "block", "index", "ex_type", "module", "function", "from", "amount",
+                                    "params"]
+    assert rows[1]["params"] == {"from": "0x0001", "value": 1.5}
+    assert rows[1]["index"] == 1
+
+
+def test_csv_sink_rotation():
+    import csv
+    from glob import glob
+    os.makedirs(".pytest_cache", exist_ok=True)
+    for old in glob(f"{sink_path}.*.csv"):
+        os.remove(old)
+    path = f"{sink_path}.csv"
+    with get_sink("csv", path=path, buffer_size=1, rotate_size=200) as sink:
+        for ex in get_extrinsics(7, 6):
+            sink.write(ex)
+    rows = []
+    part = 0
+    while os.path.exists(f"{sink_path}.{part:05d}.csv"):
+        with open(f"{sink_path}.{part:05d}.csv", newline="") as f:
+            part_rows = list(csv.reader(f))
+        # Every part is a standalone file
+        assert part_rows[0][0] == "block"
+        rows += part_rows[1:]
+        part += 1
+    assert part > 1
+    assert [x[1] for x in rows] == ["0", "1", "2", "3", "4", "5"]
+
+
+def test_csv_sink_append():
+    os.makedirs(".pytest_cache", exist_ok=True)
+    path = f"{sink_path}-append.csv"
+    if os.path.exists(path):
+        os.remove(path)
+    flushes = []
+    for block in (1, 2):
+        with get_sink("csv", path=path, append=True, on_flush=lambda: flushes.append(1)) as sink:
+            for ex in get_extrinsics(block, 2):
+                sink.write(ex)
+    with open(path) as f:
+        lines = f.read().splitlines()
+    # Header only once
+    assert len(lines) == 5
+    assert lines[0].startswith("block,")
+    assert len(flushes) == 2
+
+
+def test_sink_chain_tags():
+    import csv
+    os.makedirs(".pytest_cache", exist_ok=True)
+    path = f"{sink_path}-chains.csv"
+    with get_sink("csv", path=path, tag_chain=True) as sink:
+        sink.write(get_extrinsics(7, 1)[0], chain="moonbeam")
+        sink.write(get_extrinsics(8, 1)[0], chain="moonriver")
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][:2] == ["chain", "block"]
+    assert [x[:2] for x in rows[1:]] == [["moonbeam", "7"], ["moonriver", "8"]]
+    path = f"{sink_path}-chains.txt"
+    with get_sink("text", formatter=lambda x, chain: f"#{x.id}", path=path, tag_chain=True) as sink:
+        sink.write(get_extrinsics(7, 1)[0], chain="moonbeam")
+    with open(path) as f:
+        assert f.read() == "[moonbeam] #7-0\n"
+
+
+def test_sink_rotation_counts_bytes():
+    from glob import glob
+    os.makedirs(".pytest_cache", exist_ok=True)
+    for old in glob(f"{sink_path}-bytes.*.txt"):
+        os.remove(old)
+    path = f"{sink_path}-bytes.txt"
+    with get_sink("text", formatter=lambda ex, chain: "é" * 50, path=path, buffer_size=1, rotate_size=250) as sink:
+        for ex in get_extrinsics(7, 6):
+            sink.write(ex)
+    sizes = [os.path.getsize(x) for x in sorted(glob(f"{sink_path}-bytes.*.txt"))]
+    assert sizes == [202, 202, 202]
@@ -0,0 +1,179 @@
+import pytest
+from subclient import submission as submission_module
+from subclient.submission import SubstrateSubmissionQueue
+
+
+class FakeBlockExtrinsic:
+
+    def __init__(self, extrinsic_hash: str):
+        self.value = {'extrinsic_hash': extrinsic_hash}
+
+
+class FakeSubmitResult:
+
+    def __init__(self, extrinsic_hash: str):
+        self.extrinsic_hash = extrinsic_hash
+
+
+class FakeReceipt:
+    is_success = True
+    error_message = None
+    total_fee_amount = 10
+
+    def __init__(self, **kwargs):
+        pass
+
+
+class FakeKeypair:
+    ss58_address = "alice"
+
+
+class FakeApi:
+    """Chain of blocks by hash, canonical hashes by number"""
+
+    def __init__(self):
+        self.head = 10
+        self.finalized = 0
+        self.canonical = {}
+        self.blocks = {}
+        self.next_index = 5
+        self.submitted = []
+
+    def rpc_request(self, method, params):
+        assert method == 'system_accountNextIndex'
+        return {'result': self.next_index}
+
+    def create_signed_extrinsic(self, call, keypair, nonce, era):
+        return f"{call}:{nonce}"
+
+    def submit_extrinsic(self, extrinsic, wait_for_inclusion):
+        self.submitted.append(extrinsic)
+        return FakeSubmitResult(f"0x{extrinsic}")
+
+    def get_block_header(self):
+        return {'header': {'number': self.head}}
+
+    def get_block_hash(self, block_nr):
+        return self.canonical.get(block_nr, f"0x{block_nr}")
+
+    def get_block(self, block_hash):
+        return {'extrinsics': [FakeBlockExtrinsic(x) for x in self.blocks.get(block_hash, [])]}
+
+    def get_chain_finalised_head(self):
+        return self.finalized
+
+    @staticmethod
+    def get_block_number(block_hash):
+        return block_hash
+
+    def include(self, block_nr, extrinsic_hashes, fork: str = ""):
+        block_hash = f"0x{block_nr}{fork}"
+        self.canonical[block_nr] = block_hash
+        self.blocks[block_hash] = extrinsic_hashes
+
+
+class FakeSubmissionQueue(SubstrateSubmissionQueue):
+    """Tracking is driven by the tests instead of the tracker thread"""
+
+    def __init__(self, api: FakeApi):
+        super().__init__(endpoint=None, mortality=4)
+        self._api_instance = api
+        self._tracker_api = api
+
+    def _connect(self):
+        return self._tracker_api
+
+    def _track(self):
+        pass
+
+    def track(self):
+        self._track_inclusion()
+        self._track_finality()
+
+
+@pytest.fixture(autouse=True)
+def fake_receipt(monkeypatch):
+    monkeypatch.setattr(submission_module, "ExtrinsicReceipt", FakeReceipt)
+
+
+def test_submission_nonces():
+    api = FakeApi()
+    queue = FakeSubmissionQueue(api)
+    first = queue.submit("a", FakeKeypair())
+    second = queue.submit("b", FakeKeypair())
+    assert (first.nonce, second.nonce) == (5, 6)
+    assert first.submitted_at == 10 and queue.pending_count == 2
+    # Read again from the node after a reset
+    api.next_index = 9
+    queue.reset_nonce("alice")
+    assert queue.submit("c", FakeKeypair()).nonce == 9
+
+
+def test_submission_included_and_finalized():
+    api = FakeApi()
+    queue = FakeSubmissionQueue(api)
+    included, finalized = [], []
+    submission = queue.submit("a", FakeKeypair(), on_included=included.append, on_finalized=finalized.append)
+    api.head = 11
+    api.include(11, ["0xother", submission.extrinsic_hash])
+    queue.track()
+    assert submission.included.result(0) is submission and included == [submission]
+    assert submission.block_number == 11 and submission.extrinsic_idx == 1 and submission.fee == 10
+    assert not submission.finalized.done()
+    api.finalized = 11
+    queue.track()
+    assert submission.finalized.result(0) is submission and finalized == [submission]
+    assert queue.wait(0) == [] and queue.pending_count == 0
+
+
+def test_submission_dropped():
+    api = FakeApi()
+    queue = FakeSubmissionQueue(api)
+    included, finalized = [], []
+    submission = queue.submit("a", FakeKeypair(), on_included=included.append, on_finalized=finalized.append)
+    api.head = 15
+    queue.track()
+    assert isinstance(submission.included.exception(0), TimeoutError)
+    assert isinstance(submission.finalized.exception(0), TimeoutError)
+    # Not reported as included, the nonce is read again
+    assert included == [] and finalized == []
+    api.next_index = 5
+    assert queue.submit("b", FakeKeypair()).nonce == 5
+
+
+def test_submission_retracted():
+    api = FakeApi()
+    queue = FakeSubmissionQueue(api)
+    submission = queue.submit("a", FakeKeypair())
+    api.head = 11
+    api.include(11, [submission.extrinsic_hash], fork="a")
+    queue.track()
+    assert submission.included.result(0).block_hash == "0x11a"
+    # Block 11 replaced by a fork without the extrinsic, then included again in 12
+    api.include(11, [], fork="b")
+    api.finalized = 11
+    queue.track()
+    assert not submission.finalized.done() and queue.pending_count == 1
+    api.head = 12
+    api.include(12, [submission.extrinsic_hash])
+    api.finalized = 12
+    queue.track()
+    queue.track()
+    assert submission.finalized.result(0).block_number == 12
+
+
+def test_submission_retracted_and_dropped():
+    api = FakeApi()
+    queue = FakeSubmissionQueue(api)
+    submission = queue.submit("a", FakeKeypair())
+    api.head = 11
+    api.include(11, [submission.extrinsic_hash], fork="a")
+    queue.track()
+    api.include(11, [], fork="b")
+    api.finalized = 11
+    queue.track()
+    # Dropped after being included once, finalized still resolves
+    api.head = 20
+    queue.track()
+    assert submission.included.result(0).block_hash == "0x11a"
+    assert isinstance(submission.finalized.exception(0), TimeoutError)
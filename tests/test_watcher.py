@@ -0,0 +1,122 @@
+from subclient.checkpoint import SubstrateCheckpoint
+from subclient.extrinsics import SubstrateExtrinsicFilter
+from subtools.watcher import ChainWatcher
+from tests.test_export import get_extrinsics
+
+
+class ListSink:
+
+    def __init__(self):
+        self.rows = []
+        self.flushes = 0
+
+    def write(self, extrinsic, chain=None, retracted=False):
+        self.rows.append((extrinsic.id, retracted))
+
+    def flush(self):
+        self.flushes += 1
+
+
+class FinalizedTestClient:
+    block_duration = 0.01
+    last_block_number = 15
+
+    def __init__(self, failing=(), logs_failing: bool = False):
+        self.failing = set(failing)
+        self.logs_failing = logs_failing
+        self.logs = []
+
+    def get_block_hash(self, block_nr: int) -> str:
+        return f"0x{block_nr:x}"
+
+    # noinspection PyUnusedLocal
+    def get_block_extrinsics(self, header, ex_filter=None, last_nr=None):
+        if header.number in self.failing:
+            raise ConnectionError(f"block {header.number}")
+        return get_extrinsics(header.number, 1)
+
+    def get_evm_logs(self, start_block: int, end_block: int):
+        self.logs.append((start_block, end_block))
+        if self.logs_failing:
+            raise ConnectionError("logs")
+        return []
+
+
+def get_watcher(client, checkpoint: SubstrateCheckpoint = None, **kwargs) -> ChainWatcher:
+    return ChainWatcher(chain="moonbeam", client=client, sink=ListSink(), ex_filter=SubstrateExtrinsicFilter(),
+                        checkpoint=checkpoint, **kwargs)
+
+
+def test_watcher_failed_block(tmp_path):
+    # Skipped without a checkpoint
+    watcher = get_watcher(FinalizedTestClient(failing=[12]))
+    watcher.watch_finalized(10)
+    assert [x[0] for x in watcher.sink.rows] == ["10-0", "11-0", "13-0", "14-0"]
+    # The checkpoint never moves past it, the range stops there
+    checkpoint = SubstrateCheckpoint(str(tmp_path / "watch.json"))
+    watcher = get_watcher(FinalizedTestClient(failing=[12]), checkpoint)
+    watcher.watch_finalized(10)
+    assert [x[0] for x in watcher.sink.rows] == ["10-0", "11-0"]
+    assert checkpoint.block == 11
+    # Resumed after it once the block can be read
+    watcher = get_watcher(FinalizedTestClient(), SubstrateCheckpoint(str(tmp_path / "watch.json")))
+    watcher.watch_finalized(watcher.resume(0))
+    assert [x[0] for x in watcher.sink.rows] == ["12-0", "13-0", "14-0"]
+
+
+def test_watcher_evm_logs(tmp_path):
+    checkpoint = SubstrateCheckpoint(str(tmp_path / "watch.json"))
+    client = FinalizedTestClient(logs_failing=True)
+    watcher = get_watcher(client, checkpoint, evm_logs=True)
+    watcher.watch_finalized(10)
+    # Blocks are written but only the range end is marked, after its logs
+    assert len(watcher.sink.rows) == 5 and client.logs == [(10, 14)]
+    assert checkpoint.block is None
+    client.logs_failing = False
+    watcher.watch_finalized(10)
+    assert checkpoint.block == 14
+
+
+def test_watcher_dedupe(tmp_path):
+    checkpoint = SubstrateCheckpoint(str(tmp_path / "watch.json"))
+    watcher = get_watcher(FinalizedTestClient(), checkpoint, dedupe=True)
+    extrinsics = get_extrinsics(20, 3)
+    assert len(watcher.write(extrinsics[:2])) == 2
+    # Rows written before a restart are skipped
+    assert [x.id for x in watcher.write(extrinsics)] == ["20-2"]
+    assert len(watcher.write(extrinsics, retracted=True)) == 3
+
+
+def test_watcher_single_save(tmp_path, monkeypatch):
+    import os
+    replaced = []
+    monkeypatch.setattr(os, "replace", lambda src, dst: replaced.append(dst) or os.rename(src, dst))
+    checkpoint = SubstrateCheckpoint(str(tmp_path / "watch.json"))
+    watcher = get_watcher(FinalizedTestClient(), checkpoint)
+    # The sink saves the checkpoints on flush, like event-watch does
+    watcher.sink.flush = lambda: checkpoint.save()
+    watcher.write(get_extrinsics(10, 3))
+    watcher.mark(10)
+    assert len(replaced) == 1
+    # Saving again without a change writes nothing
+    watcher.flush()
+    assert len(replaced) == 1
+    # Rows are only tracked when deduplicating
+    assert not checkpoint.is_emitted(checkpoint.row_keys(get_extrinsics(10, 1))[0])
+
+
+def test_watcher_resume_retracted(tmp_path):
+    client = FinalizedTestClient()
+    headers = []
+    client.get_block_extrinsics = lambda header, ex_filter=None: headers.append(header) or get_extrinsics(12, 2)
+    checkpoint = SubstrateCheckpoint(str(tmp_path / "watch.json"))
+    checkpoint.mark_block(12, "0xorphan")
+    checkpoint.save()
+    # Finalized blocks never change, resumed after the checkpoint
+    assert get_watcher(client, SubstrateCheckpoint(checkpoint.path)).resume(0) == 13
+    assert not headers
+    # The best head retracts the checkpoint block decoded by its saved hash, then processes the new one
+    watcher = get_watcher(client, SubstrateCheckpoint(checkpoint.path), best_head=True)
+    assert watcher.resume(0) == 12
+    assert [(x.number, x.hash) for x in headers] == [(12, "0xorphan")]
+    assert watcher.sink.rows == [("12-0", True), ("12-1", True)]